@@ -4,8 +4,22 @@
 import json
 import hashlib
 import hmac
+import random
+import time
 import frappe
 from frappe import _
+from frappe.utils import flt
+
+from frappe_whatsapp.utils.flow_session import (
+    complete_session,
+    get_flow_definition,
+    get_session,
+    update_session,
+)
+
+# Decrypted app secrets are kept in process memory, never in Redis
+SECRET_CACHE_SECONDS = 300
+_app_secrets = {}
 
 
 @frappe.whitelist(allow_guest=True)
@@ -20,7 +34,12 @@ def handle_flow_request():
     https://your-site.com/api/method/frappe_whatsapp.frappe_whatsapp.api.flow_endpoint.handle_flow_request
     
     Security: Signature verification is performed for POST requests when
-    app_secret is configured in WhatsApp Settings.
+    an active WhatsApp Account has an app_secret configured.
+
+    Nothing is written to the database while the user moves through the
+    flow; session state lives in Redis and is persisted in the background.
+    Set `whatsapp_flow_debug_sample_rate` (0 to 1) in site config to log a
+    sample of requests.
     """
     try:
         # Get request data
@@ -39,11 +58,8 @@ def handle_flow_request():
         if not data:
             frappe.throw(_("No data received"))
 
-        # Log the request for debugging
-        frappe.log_error(
-            f"WhatsApp Flow Request:\n{json.dumps(data, indent=2)}",
-            "WhatsApp Flow Endpoint"
-        )
+        # Log a sample of requests for debugging
+        _log_sampled_request(data)
 
         # Get action type
         action = data.get("action")
@@ -89,6 +105,11 @@ def handle_init(flow_token, screen_id, data):
     """Handle initial flow request."""
     # Return initial data for the first screen
     # This can be customized based on flow_token or other parameters
+    if not screen_id and flow_token:
+        session = get_session(flow_token)
+        definition = get_flow_definition(session and session.get("flow"))
+        if definition:
+            screen_id = definition["screens"][0]
 
     return {
         "screen": screen_id or "INIT",
@@ -123,24 +144,18 @@ def handle_back(data):
 
 
 def save_flow_data(flow_token, screen, form_data):
-    """Save flow data for later processing."""
+    """Save flow data for later processing.
+
+    Values are merged into the Redis session; once a terminal screen is
+    submitted (or the flow completion webhook arrives) the session is
+    written to WhatsApp Flow Data by a background job.
+    """
     try:
-        # Create or update a record to store flow data
-        existing = frappe.db.exists("WhatsApp Flow Data", {"flow_token": flow_token})
-
-        if existing:
-            doc = frappe.get_doc("WhatsApp Flow Data", existing)
-            current_data = json.loads(doc.data or "{}")
-            current_data.update(form_data)
-            doc.data = json.dumps(current_data)
-            doc.last_screen = screen
-            doc.save(ignore_permissions=True)
-        else:
-            # If WhatsApp Flow Data doctype doesn't exist, just log
-            frappe.log_error(
-                f"Flow Token: {flow_token}\nScreen: {screen}\nData: {json.dumps(form_data)}",
-                "WhatsApp Flow Data"
-            )
+        session = update_session(flow_token, screen, form_data)
+
+        definition = get_flow_definition(session.get("flow"))
+        if definition and screen in definition["terminal"]:
+            complete_session(flow_token)
     except Exception as e:
         frappe.log_error(f"save_flow_data error: {str(e)}")
 
@@ -157,20 +172,12 @@ def _verify_flow_signature():
     - Signature is invalid
     """
     try:
-        # Get app secret from WhatsApp Settings
-        settings = frappe.get_single("WhatsApp Settings")
-        app_secret = settings.get_password("app_secret") if settings else None
-        
-        if not app_secret:
+        app_secrets = get_app_secrets()
+
+        if not app_secrets:
             # No secret configured, skip verification
-            # Log warning for security awareness
-            frappe.log_error(
-                "WhatsApp Flow endpoint: No app_secret configured. "
-                "Consider configuring app_secret for enhanced security.",
-                "WhatsApp Flow Security Warning"
-            )
             return True
-        
+
         # Get signature from header
         signature_header = frappe.request.headers.get("X-Hub-Signature-256", "")
         if not signature_header:
@@ -179,24 +186,66 @@ def _verify_flow_signature():
                 "WhatsApp Flow Signature Error"
             )
             return False
-        
+
         # Extract signature value (format: sha256=<signature>)
         if signature_header.startswith("sha256="):
             signature = signature_header[7:]
         else:
             signature = signature_header
-        
+
         # Get raw payload
         payload = frappe.request.get_data(as_text=True)
-        
+
         # Verify signature
-        return verify_signature(payload, signature, app_secret)
-        
+        return any(verify_signature(payload, signature, app_secret) for app_secret in app_secrets)
+
     except Exception as e:
         frappe.log_error(f"Flow signature verification error: {str(e)}")
         return False
 
 
+def get_app_secrets():
+    """App secrets of active accounts, cached per site for SECRET_CACHE_SECONDS."""
+    site = frappe.local.site
+    cached = _app_secrets.get(site)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    app_secrets = []
+    for account in frappe.get_all(
+        "WhatsApp Account",
+        filters={"status": "Active", "app_secret": ["is", "set"]},
+        pluck="name"
+    ):
+        app_secret = frappe.get_doc("WhatsApp Account", account).get_password("app_secret", raise_exception=False)
+        if app_secret:
+            app_secrets.append(app_secret)
+
+    if not app_secrets:
+        # Logged once per cache period rather than on every request
+        frappe.log_error(
+            "WhatsApp Flow endpoint: No app_secret configured. "
+            "Consider configuring app_secret for enhanced security.",
+            "WhatsApp Flow Security Warning"
+        )
+
+    _app_secrets[site] = (time.monotonic() + SECRET_CACHE_SECONDS, app_secrets)
+    return app_secrets
+
+
+def clear_app_secret_cache():
+    _app_secrets.pop(frappe.local.site, None)
+
+
+def _log_sampled_request(data):
+    sample_rate = flt(frappe.conf.get("whatsapp_flow_debug_sample_rate"))
+    if sample_rate and random.random() < sample_rate:
+        frappe.log_error(
+            f"WhatsApp Flow Request:\n{json.dumps(data, indent=2)}",
+            "WhatsApp Flow Endpoint"
+        )
+
+
 def verify_signature(payload, signature, app_secret):
     """Verify the request signature from WhatsApp."""
     expected_signature = hmac.new(
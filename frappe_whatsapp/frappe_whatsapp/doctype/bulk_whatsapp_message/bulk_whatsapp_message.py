@@ -8,6 +8,10 @@ from frappe.utils import cint, get_datetime, now
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 
+from frappe_whatsapp.utils import format_number
+from frappe_whatsapp.utils.phone import get_default_country_code, is_valid_number
+from frappe_whatsapp.utils.recipient_import import count_list_recipients, iter_list_recipients
+
 # Add these files to your frappe_whatsapp app
 
 # 1. First, create a new DocType for Bulk WhatsApp Messaging
@@ -39,7 +43,7 @@ class BulkWhatsAppMessage(Document):
         
         # If recipient list is provided, count recipients
         if self.recipient_type == 'Recipient List' and self.recipient_list:
-            recipient_count = frappe.db.count("WhatsApp Recipient", {"parent": self.recipient_list})
+            recipient_count = count_list_recipients(self.recipient_list)
             if recipient_count == 0:
                 frappe.throw(_("Selected recipient list has no recipients"))
             self.recipient_count = recipient_count
@@ -54,14 +58,8 @@ class BulkWhatsAppMessage(Document):
     def queue_messages(self):
         """Queue messages for sending"""
         if self.recipient_type == 'Recipient List' and self.recipient_list:
-            # Fetch recipients from the recipient list
-            recipients = frappe.get_all(
-                "WhatsApp Recipient", 
-                filters={"parent": self.recipient_list},
-                fields=["mobile_number", "name", "recipient_name", "recipient_data"]
-            )
-            
-            for recipient in recipients:
+            # Stream recipients from the recipient list in keyset pages
+            for recipient in iter_list_recipients(self.recipient_list):
                 frappe.enqueue_doc(
                     self.doctype, self.name,
                     "create_single_message",
@@ -92,10 +90,20 @@ class BulkWhatsAppMessage(Document):
             except Exception as e:
                 frappe.log_error(f"Error parsing recipient data: {str(e)}", "WhatsApp Bulk Messaging")
         
+        to = format_number(recipient.get("mobile_number"), get_default_country_code(self.whatsapp_account))
+        if not is_valid_number(to):
+            # Reject without calling the API, but count it so the bulk message completes
+            frappe.log_error(
+                f"Invalid mobile number {recipient.get('mobile_number')!r} in {self.name}", "WhatsApp Bulk Messaging"
+            )
+            self.db_set("status", "Partially Failed")
+            self.db_set("sent_count", cint(self.sent_count) + 1)
+            return
+
         # Create WhatsApp message
         wa_message = frappe.new_doc("WhatsApp Message")
         # wa_message.from_number = self.from_number
-        wa_message.to = recipient.get("mobile_number")
+        wa_message.to = to
         wa_message.message_type = "Text"
         # wa_message.message = message_content
         wa_message.flags.custom_ref_doc = json.loads(recipient.get("recipient_data", "{}"))
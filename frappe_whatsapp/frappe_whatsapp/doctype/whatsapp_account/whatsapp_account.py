@@ -4,6 +4,8 @@
 import frappe
 from frappe.model.document import Document
 
+from frappe_whatsapp.frappe_whatsapp.api.flow_endpoint import clear_app_secret_cache
+
 
 class WhatsAppAccount(Document):
 	"""
@@ -16,6 +18,7 @@ class WhatsAppAccount(Document):
 	def on_update(self):
 		"""Check there is only one default of each type."""
 		self.there_must_be_only_one_default()
+		clear_app_secret_cache()
 
 	def there_must_be_only_one_default(self):
 		"""If current WhatsApp Account is default, un-default all other accounts."""
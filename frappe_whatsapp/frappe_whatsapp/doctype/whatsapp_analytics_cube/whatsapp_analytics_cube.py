@@ -0,0 +1,28 @@
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+
+
+class WhatsAppAnalyticsCube(Document):
+    """
+    WhatsApp Analytics Cube for pre-aggregated delivery metrics.
+
+    One row per (date, hour, account, template, campaign) with status
+    counters and mergeable latency sketches, filled by the analytics
+    rollup flush. Messages are attributed to the hour they were sent in.
+    """
+
+    def autoname(self):
+        self.name = get_cube_name(self.date, self.hour, self.whatsapp_account, self.template, self.campaign)
+
+
+def get_cube_name(date, hour, whatsapp_account, template=None, campaign=None):
+    key = "|".join(str(part or "") for part in (date, frappe.utils.cint(hour), whatsapp_account, template, campaign))
+    return hashlib.md5(key.encode()).hexdigest()[:20]
+
+
+def on_doctype_update():
+    frappe.db.add_index("WhatsApp Analytics Cube", ["whatsapp_account", "date"])
+    frappe.db.add_index("WhatsApp Analytics Cube", ["campaign", "date"])
+    frappe.db.add_index("WhatsApp Analytics Cube", ["template", "date"])
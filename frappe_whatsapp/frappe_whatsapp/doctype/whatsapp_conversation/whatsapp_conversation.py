@@ -0,0 +1,26 @@
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+
+
+class WhatsAppConversation(Document):
+    """
+    WhatsApp Conversation with one contact on one account.
+
+    Maintained incrementally as messages are inserted: the last message,
+    unread count and the customer service window, so inboxes never have
+    to scan WhatsApp Message.
+    """
+
+    def autoname(self):
+        self.name = get_conversation_name(self.whatsapp_account, self.contact)
+
+
+def get_conversation_name(whatsapp_account, contact):
+    return hashlib.md5(f"{whatsapp_account}|{contact}".encode()).hexdigest()[:20]
+
+
+def on_doctype_update():
+    frappe.db.add_index("WhatsApp Conversation", ["whatsapp_account", "last_activity"])
+    frappe.db.add_index("WhatsApp Conversation", ["contact"])
@@ -7,6 +7,14 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.integrations.utils import make_post_request, make_request
 
+from frappe_whatsapp.utils.flow_session import clear_flow_definition
+
+# Display components; every other field type is an input passed in payloads
+DISPLAY_FIELD_TYPES = (
+    "TextHeading", "TextSubheading", "TextBody",
+    "TextCaption", "Image", "EmbeddedLink", "Footer"
+)
+
 
 class WhatsAppFlow(Document):
     """
@@ -24,6 +32,12 @@ class WhatsAppFlow(Document):
         """Validate flow configuration."""
         self.validate_screens()
 
+    def on_update(self):
+        clear_flow_definition(self.name)
+
+    def on_trash(self):
+        clear_flow_definition(self.name)
+
     def validate_screens(self):
         """Ensure at least one screen exists and has valid configuration."""
         if not self.screens:
@@ -54,6 +68,9 @@ class WhatsAppFlow(Document):
             "screens": []
         }
 
+        # One pass over screens and fields, shared by all builders below
+        self._flow_index = None
+
         # Build a map of which fields are passed to each screen from previous screens
         screen_incoming_data = self.build_screen_data_map()
 
@@ -65,39 +82,62 @@ class WhatsAppFlow(Document):
         # This creates a client-only flow that doesn't require an endpoint
         # Data is returned via webhook (nfm_reply) when the flow completes
 
+        self._flow_index = None
         return flow
 
-    def build_screen_data_map(self):
-        """Build a map of fields passed to each screen from previous screens.
+    def get_flow_index(self):
+        """Index screens and fields once for the generator.
 
         Returns:
-            dict: {screen_id: {field_name: {"type": "string", "__example__": ""}}}
+            _dict with
+                fields: {screen_id: [enabled fields in table order]}
+                position: {screen_id: index of its first screen}
+                incoming: {screen_id: fields passed from previous screens}
+                prefixes: [data references of previous screens, per screen index]
         """
-        screen_data_map = {}
+        if getattr(self, "_flow_index", None):
+            return self._flow_index
+
+        fields = {}
+        for field in self.fields:
+            if field.enabled:
+                fields.setdefault(field.screen, []).append(field)
+
+        position = {}
+        incoming = {}
+        prefixes = []
         accumulated_fields = {}  # Fields accumulated from all previous screens
+        data_references = {}
 
         for i, screen in enumerate(self.screens):
+            position.setdefault(screen.screen_id, i)
+
             # Current screen receives all accumulated fields from previous screens
             if accumulated_fields:
-                screen_data_map[screen.screen_id] = accumulated_fields.copy()
-
-            # Add this screen's input fields to accumulated fields for next screens
-            for field in self.fields:
-                if field.screen != screen.screen_id:
-                    continue
-                if not field.enabled:
-                    continue
-                # Only input fields (not display components) are passed in payload
-                if field.field_type not in [
-                    "TextHeading", "TextSubheading", "TextBody",
-                    "TextCaption", "Image", "EmbeddedLink", "Footer"
-                ]:
+                incoming[screen.screen_id] = accumulated_fields.copy()
+            prefixes.append(data_references.copy())
+
+            # Only input fields (not display components) are passed in payload
+            for field in fields.get(screen.screen_id, []):
+                if field.field_type not in DISPLAY_FIELD_TYPES:
                     accumulated_fields[field.field_name] = {
                         "type": "string",
                         "__example__": ""
                     }
+                    data_references[field.field_name] = "${data." + field.field_name + "}"
+
+        self._flow_index = frappe._dict(
+            fields=fields, position=position, incoming=incoming, prefixes=prefixes
+        )
+        return self._flow_index
+
+    def build_screen_data_map(self):
+        """Build a map of fields passed to each screen from previous screens.
 
-        return screen_data_map
+        Returns:
+            dict: {screen_id: {field_name: {"type": "string", "__example__": ""}}}
+        """
+        return self.get_flow_index().incoming
 
     def build_screen(self, screen, incoming_data=None):
         """Build a single screen definition."""
@@ -130,12 +170,7 @@ class WhatsAppFlow(Document):
         has_footer = False
 
         # Get fields that belong to this screen from the fields table
-        for field in self.fields:
-            if field.screen != screen.screen_id:
-                continue
-            if not field.enabled:
-                continue
-
+        for field in self.get_flow_index().fields.get(screen.screen_id, []):
             component = self.build_field_component(field, screen)
             if component:
                 children.append(component)
@@ -261,44 +296,23 @@ class WhatsAppFlow(Document):
 
     def build_payload(self, screen):
         """Build payload with all field values up to and including this screen."""
-        payload = {}
-
-        # Include all fields from previous screens (passed via data) as data references
-        found_current = False
-        for s in self.screens:
-            if s.screen_id == screen.screen_id:
-                found_current = True
-                # For current screen, use form references
-                for field in self.fields:
-                    if field.screen != s.screen_id:
-                        continue
-                    if field.enabled and field.field_type not in [
-                        "TextHeading", "TextSubheading", "TextBody",
-                        "TextCaption", "Image", "EmbeddedLink", "Footer"
-                    ]:
-                        payload[field.field_name] = "${form." + field.field_name + "}"
-                break
-            else:
-                # For previous screens, use data references (already passed in)
-                for field in self.fields:
-                    if field.screen != s.screen_id:
-                        continue
-                    if field.enabled and field.field_type not in [
-                        "TextHeading", "TextSubheading", "TextBody",
-                        "TextCaption", "Image", "EmbeddedLink", "Footer"
-                    ]:
-                        payload[field.field_name] = "${data." + field.field_name + "}"
+        index = self.get_flow_index()
+
+        # Fields from previous screens (passed via data) as data references
+        payload = index.prefixes[index.position[screen.screen_id]].copy()
+
+        # For current screen, use form references
+        for field in index.fields.get(screen.screen_id, []):
+            if field.field_type not in DISPLAY_FIELD_TYPES:
+                payload[field.field_name] = "${form." + field.field_name + "}"
 
         return payload
 
     def get_next_screen(self, current_screen):
         """Get the next screen in sequence."""
-        found_current = False
-        for screen in self.screens:
-            if found_current:
-                return screen
-            if screen.screen_id == current_screen.screen_id:
-                found_current = True
+        next_position = self.get_flow_index().position[current_screen.screen_id] + 1
+        if next_position < len(self.screens):
+            return self.screens[next_position]
         return None
 
     def parse_options(self, options_json):
@@ -789,33 +803,15 @@ def import_flow_from_whatsapp(whatsapp_account, flow_id, flow_name=None):
 
 def fetch_flow_json_by_id(whatsapp_account, flow_id):
     """Fetch flow JSON by flow ID."""
-    account = frappe.get_doc("WhatsApp Account", whatsapp_account)
-    token = account.get_password("token")
-
-    url = f"{account.url}/{account.version}/{flow_id}/assets"
+    from frappe_whatsapp.utils.sync_jobs import fetch_flow_json
 
+    account = frappe.get_doc("WhatsApp Account", whatsapp_account)
     headers = {
-        "Authorization": f"Bearer {token}"
+        "Authorization": f"Bearer {account.get_password('token')}"
     }
 
     try:
-        import requests
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-
-        data = response.json()
-        assets = data.get("data", [])
-
-        for asset in assets:
-            if asset.get("name") == "flow.json":
-                download_url = asset.get("download_url")
-                if download_url:
-                    asset_response = requests.get(download_url, headers=headers)
-                    if asset_response.status_code == 200:
-                        return asset_response.json()
-
-        return None
-
+        return fetch_flow_json(f"{account.url}/{account.version}", headers, flow_id)
     except Exception as e:
         frappe.log_error(f"Failed to fetch flow JSON: {str(e)}")
         return None
@@ -825,7 +821,8 @@ def fetch_flow_json_by_id(whatsapp_account, flow_id):
 def sync_all_flows(whatsapp_account):
     """Sync all flows from WhatsApp Business Account.
 
-    Imports new flows and updates existing ones.
+    Imports new flows and updates existing ones. Large accounts should use
+    `frappe_whatsapp.utils.sync_jobs.enqueue_flow_sync` instead.
 
     Args:
         whatsapp_account: Name of WhatsApp Account document
@@ -833,86 +830,10 @@ def sync_all_flows(whatsapp_account):
     Returns:
         Dict with counts: imported, updated, skipped
     """
-    account = frappe.get_doc("WhatsApp Account", whatsapp_account)
-    token = account.get_password("token")
-
-    url = f"{account.url}/{account.version}/{account.business_id}/flows?fields=id,name,status,categories"
-
-    headers = {
-        "Authorization": f"Bearer {token}"
-    }
-
-    result = {"imported": 0, "updated": 0, "skipped": 0}
+    from frappe_whatsapp.utils.sync_jobs import sync_account_flows
 
     try:
-        import requests
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-
-        data = response.json()
-        flows = data.get("data", [])
-
-        for flow in flows:
-            flow_id = flow.get("id")
-            flow_name = flow.get("name")
-
-            # Check if flow exists locally
-            existing = frappe.db.exists("WhatsApp Flow", {"flow_id": flow_id})
-
-            if existing:
-                # Update existing flow
-                try:
-                    flow_doc = frappe.get_doc("WhatsApp Flow", existing)
-                    flow_doc.status = flow.get("status", "Draft").title()
-                    if flow.get("categories"):
-                        flow_doc.category = flow["categories"][0]
-
-                    # Try to fetch flow JSON and update screens/fields
-                    flow_json = fetch_flow_json_by_id(whatsapp_account, flow_id)
-                    if flow_json:
-                        flow_doc.flow_json = json.dumps(flow_json, indent=2)
-                        flow_doc.data_api_version = flow_json.get("version", "6.0")
-
-                        # Clear existing screens and fields, then re-parse
-                        flow_doc.screens = []
-                        flow_doc.fields = []
-                        parse_flow_json_to_screens(flow_doc, flow_json)
-
-                    flow_doc.flags.ignore_validate = True
-                    flow_doc.save(ignore_permissions=True)
-                    result["updated"] += 1
-                except Exception as e:
-                    frappe.log_error(f"Failed to update flow {flow_id}: {str(e)}")
-                    result["skipped"] += 1
-            else:
-                # Import new flow
-                try:
-                    flow_doc = frappe.get_doc({
-                        "doctype": "WhatsApp Flow",
-                        "flow_name": flow_name or f"Flow {flow_id}",
-                        "whatsapp_account": whatsapp_account,
-                        "flow_id": flow_id,
-                        "status": flow.get("status", "Draft").title(),
-                        "category": flow["categories"][0] if flow.get("categories") else "OTHER"
-                    })
-
-                    # Try to fetch and parse flow JSON
-                    flow_json = fetch_flow_json_by_id(whatsapp_account, flow_id)
-                    if flow_json:
-                        flow_doc.flow_json = json.dumps(flow_json, indent=2)
-                        flow_doc.data_api_version = flow_json.get("version", "6.0")
-                        parse_flow_json_to_screens(flow_doc, flow_json)
-
-                    flow_doc.flags.ignore_validate = True
-                    flow_doc.insert(ignore_permissions=True)
-                    result["imported"] += 1
-                except Exception as e:
-                    frappe.log_error(f"Failed to import flow {flow_id}: {str(e)}")
-                    result["skipped"] += 1
-
-        frappe.db.commit()
-        return result
-
+        return sync_account_flows(whatsapp_account)
     except Exception as e:
         frappe.throw(_("Failed to sync flows: {0}").format(str(e)))
 
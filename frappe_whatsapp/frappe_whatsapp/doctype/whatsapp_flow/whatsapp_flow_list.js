@@ -3,6 +3,32 @@
 
 frappe.listview_settings["WhatsApp Flow"] = {
     onload: function(listview) {
+        frappe.realtime.on("whatsapp_sync_progress", function(data) {
+            if (data.kind !== "flows") return;
+
+            let counts = data.counts || {};
+            if (data.error) {
+                frappe.hide_progress();
+                frappe.msgprint({
+                    title: __("Sync Failed"),
+                    message: __("{0}: {1}", [data.whatsapp_account, data.error]),
+                    indicator: "red"
+                });
+            } else if (data.done) {
+                frappe.hide_progress();
+                frappe.show_alert({
+                    message: __("{0}: Imported {1}, Updated {2}, Skipped {3}",
+                        [data.whatsapp_account, counts.imported, counts.updated, counts.skipped]),
+                    indicator: "green"
+                });
+                listview.refresh();
+            } else {
+                let processed = counts.imported + counts.updated + counts.skipped;
+                frappe.show_progress(__("Syncing flows of {0}", [data.whatsapp_account]),
+                    processed, counts.total);
+            }
+        });
+
         listview.page.add_inner_button(__("Sync from Meta"), function() {
             frappe.prompt([
                 {
@@ -10,27 +36,22 @@ frappe.listview_settings["WhatsApp Flow"] = {
                     fieldtype: "Link",
                     label: __("WhatsApp Account"),
                     options: "WhatsApp Account",
-                    reqd: 1
+                    description: __("Leave empty to sync all active accounts")
                 }
             ],
             function(values) {
                 frappe.call({
-                    method: "frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_flow.whatsapp_flow.sync_all_flows",
+                    method: "frappe_whatsapp.utils.sync_jobs.enqueue_flow_sync",
                     args: {
                         whatsapp_account: values.whatsapp_account
                     },
-                    freeze: true,
-                    freeze_message: __("Syncing all flows from Meta..."),
                     callback: function(r) {
-                        if (r.message) {
-                            frappe.msgprint({
-                                title: __("Sync Complete"),
-                                message: __("Imported: {0}<br>Updated: {1}<br>Skipped: {2}",
-                                    [r.message.imported, r.message.updated, r.message.skipped]),
-                                indicator: "green"
-                            });
-                            listview.refresh();
-                        }
+                        frappe.show_alert({
+                            message: r.message && r.message.length
+                                ? __("Flow sync started for {0}", [r.message.join(", ")])
+                                : __("A flow sync is already running"),
+                            indicator: "blue"
+                        });
                     }
                 });
             },
@@ -0,0 +1,12 @@
+from frappe.model.document import Document
+
+
+class WhatsAppFlowData(Document):
+    """
+    WhatsApp Flow Data collected by the flow endpoint.
+
+    One row per flow token, written in the background from the session
+    state kept in Redis while the user moves through the flow.
+    """
+
+    pass
@@ -0,0 +1,18 @@
+import frappe
+from frappe.model.document import Document
+
+
+class WhatsAppHourlyAnalytics(Document):
+    """
+    WhatsApp Hourly Analytics for intraday message tracking.
+    
+    Stores per-hour message counters for each account, filled
+    continuously by the analytics rollup flush.
+    """
+
+    def autoname(self):
+        self.name = get_hourly_analytics_name(self.date, self.hour, self.whatsapp_account)
+
+
+def get_hourly_analytics_name(date, hour, whatsapp_account):
+    return f"{date}-{frappe.utils.cint(hour):02d}-{whatsapp_account}"
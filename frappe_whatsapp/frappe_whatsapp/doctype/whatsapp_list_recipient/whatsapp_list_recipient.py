@@ -0,0 +1,17 @@
+import frappe
+from frappe.model.document import Document
+
+
+class WhatsAppListRecipient(Document):
+    """
+    WhatsApp List Recipient, one imported member of a recipient list.
+
+    Imported lists are stored here instead of the list's child table, so
+    large lists are written in bulk and read in keyset pages.
+    """
+
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("WhatsApp List Recipient", ["recipient_list", "name"])
@@ -0,0 +1,18 @@
+import frappe
+from frappe.model.document import Document
+
+
+class WhatsAppMediaHandle(Document):
+    """
+    WhatsApp Media Handle for Meta identifiers of stored media.
+
+    Maps a media object to the media ids and upload handles Meta issued
+    for it per account, so uploads are reused until they expire.
+    """
+
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("WhatsApp Media Handle", ["media_object", "whatsapp_account", "handle_type"])
+    frappe.db.add_index("WhatsApp Media Handle", ["handle(100)"])
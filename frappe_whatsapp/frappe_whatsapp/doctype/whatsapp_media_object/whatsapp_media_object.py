@@ -0,0 +1,12 @@
+from frappe.model.document import Document
+
+
+class WhatsAppMediaObject(Document):
+    """
+    WhatsApp Media Object for content-addressed media storage.
+
+    One row per distinct file content, keyed by SHA-256. Messages carrying
+    the same media share the stored file; `ref_count` tracks how many do.
+    """
+
+    pass
@@ -5,8 +5,24 @@ import frappe
 from frappe import _, throw
 from frappe.model.document import Document
 from frappe.integrations.utils import make_post_request
+from frappe.utils import cint
 
 from frappe_whatsapp.utils import get_whatsapp_account, format_number
+from frappe_whatsapp.utils.analytics_cube import track_message_sent, track_reply
+from frappe_whatsapp.utils.analytics_rollup import track_event
+from frappe_whatsapp.utils.conversation import update_conversation
+from frappe_whatsapp.utils.dispatcher import (
+    ERROR_TRANSIENT,
+    classify_exception,
+    get_next_retry_time,
+)
+from frappe_whatsapp.utils.flow_session import start_session
+from frappe_whatsapp.utils.media_store import release_media
+from frappe_whatsapp.utils.metrics import increment, timer
+from frappe_whatsapp.utils.phone import get_default_country_code
+from frappe_whatsapp.utils.profile_resolver import resolve_profile
+from frappe_whatsapp.utils.service_window import ServiceWindowClosed, is_window_open
+from frappe_whatsapp.utils.media_upload import MediaMissing, get_media_reference
 
 class WhatsAppMessage(Document):
     """
@@ -18,34 +34,59 @@ class WhatsAppMessage(Document):
 
     def validate(self):
         self.set_whatsapp_account()
+        self.set_contact()
+
+    def after_insert(self):
+        track_event(
+            "messages_sent" if self.type == "Outgoing" else "messages_received",
+            self.whatsapp_account,
+            at=self.creation,
+        )
+        if self.type == "Outgoing":
+            track_message_sent(self)
+        elif self.is_reply:
+            track_reply(self)
+        update_conversation(self)
+        if self.flags.start_flow_session:
+            start_session(self.flow_token, self.flow, self.name)
 
     def on_update(self):
         self.update_profile_name()
+        self.queue_scheduled_send()
+
+    def on_trash(self):
+        if self.type == "Incoming" and self.attach:
+            release_media(self.attach)
+
+    def queue_scheduled_send(self):
+        """Put pending scheduled messages on the delay queue once committed."""
+        if not (self.is_scheduled and self.scheduled_time and self.scheduling_status == "Pending"):
+            return
+
+        if not (self.has_value_changed("scheduled_time") or self.has_value_changed("scheduling_status")):
+            return
+
+        from frappe_whatsapp.utils.scheduler import add_to_schedule_queue
+
+        name, scheduled_time = self.name, self.scheduled_time
+        frappe.db.after_commit.add(lambda: add_to_schedule_queue(name, scheduled_time))
+
+    def set_contact(self):
+        """Normalised number of the other party, the conversation key."""
+        number = self.get("from") if self.type == "Incoming" else self.to
+        self.contact = self.format_number(number) if number else None
 
     def update_profile_name(self):
         number = self.get("from")
         if not number:
             return
-        from_number = format_number(number)
 
-        if (
-            self.has_value_changed("profile_name")
-            and self.profile_name
-            and from_number
-            and frappe.db.exists("WhatsApp Profiles", {"number": from_number})
-        ):
-            profile_id = frappe.get_value("WhatsApp Profiles", {"number": from_number}, "name")
-            frappe.db.set_value("WhatsApp Profiles", profile_id, "profile_name", self.profile_name)
+        if self.has_value_changed("profile_name") and self.profile_name:
+            resolve_profile(self.format_number(number), self.profile_name, self.whatsapp_account)
 
     def create_whatsapp_profile(self):
-        number = format_number(self.get("from") or self.to)
-        if not frappe.db.exists("WhatsApp Profiles", {"number": number}):
-            frappe.get_doc({
-                "doctype": "WhatsApp Profiles",
-                "profile_name": self.profile_name,
-                "number": number,
-                "whatsapp_account": self.whatsapp_account
-            }).insert(ignore_permissions=True)
+        number = self.format_number(self.get("from") or self.to)
+        resolve_profile(number, self.profile_name, self.whatsapp_account)
 
     def set_whatsapp_account(self):
         """Set whatsapp account to default if missing"""
@@ -84,35 +125,105 @@ class WhatsAppMessage(Document):
             self.status = "Success" # Mark as success so it doesn't get retried
             return
 
+        frappe.flags.integration_request = None
         try:
-            if self.message_type == "Template":
-                self._send_template()
-            else:
-                self._send_text_or_media()
-            
-            self.status = "Success"
-            self.retry_count = 0
-            self.next_retry_time = None
-            self.last_error = None
+            self.notify(self.get_send_payload())
+            self.mark_sent()
+            self.after_send()
         except Exception as e:
-            self.status = "Failed"
-            self.last_error = str(e)
-            self.schedule_retry()
+            self.mark_failed(str(e), classify_exception(e))
             # We don't throw here any more to prevent blocking the transaction
             # but we log it.
             frappe.log_error(f"WhatsApp Send Failed: {str(e)}", "WhatsApp Send Error")
 
-    def schedule_retry(self):
-        """Schedule next retry using exponential backoff."""
-        from frappe.utils import add_to_date, now_datetime
-        
-        MAX_RETRIES = 5
-        BACKOFF_MINUTES = [5, 15, 60, 240, 720] # 5m, 15m, 1h, 4h, 12h
+    def get_send_payload(self):
+        """Build the Graph API payload for this message, None if nothing is sent."""
+        if self.type != "Outgoing" or self.is_internal_note:
+            return None
+
+        if self.message_type != "Template":
+            # Keep message_type so a retry inside a reopened window sends the original
+            self.service_window_fallback = self.get_service_window_fallback()
+            if self.service_window_fallback:
+                return self._build_template_payload(self.service_window_fallback)
+
+        if self.message_type == "Template":
+            return self._build_template_payload()
+
+        return self._build_text_or_media_payload()
+
+    def get_service_window_fallback(self):
+        """
+        Outside the 24-hour window, return the account's fallback template,
+        or fail before calling the API if it has none that can be sent
+        without body parameters.
+        """
+        if not self.whatsapp_account:
+            return None
+
+        enforce, fallback_template = frappe.get_cached_value(
+            "WhatsApp Account", self.whatsapp_account, ["enforce_service_window", "service_window_template"]
+        )
+        if not cint(enforce) or is_window_open(self.whatsapp_account, self.format_number(self.to)):
+            return None
+
+        if not fallback_template:
+            raise ServiceWindowClosed(
+                _("Customer service window for {0} is closed, only templates can be sent").format(self.to)
+            )
 
-        if self.retry_count < MAX_RETRIES:
-            wait_time = BACKOFF_MINUTES[self.retry_count]
-            self.retry_count += 1
-            self.next_retry_time = add_to_date(now_datetime(), minutes=wait_time)
+        # Body parameters are filled from the message's own data, which a free-form message lacks
+        if frappe.db.get_value("WhatsApp Templates", fallback_template, "sample_values"):
+            raise ServiceWindowClosed(
+                _("Customer service window for {0} is closed and fallback template {1} needs body parameters").format(
+                    self.to, fallback_template
+                )
+            )
+
+        return fallback_template
+
+    def after_send(self):
+        """Bookkeeping after a successful send."""
+        if self.message_type == "Template" or self.service_window_fallback:
+            self.create_whatsapp_profile()
+        elif self.content_type == "flow" and self.flow_token:
+            if self.name:
+                start_session(self.flow_token, self.flow, self.name)
+            else:
+                # Sent from before_insert, the session starts once the name is set
+                self.flags.start_flow_session = True
+
+    def mark_sent(self, message_id=None):
+        """Mark message as sent and clear retry state."""
+        if message_id:
+            self.message_id = message_id
+        self.status = "Success"
+        self.retry_count = 0
+        self.next_retry_time = None
+        self.last_error = None
+        self.retry_lease_token = None
+        self.retry_lease_until = None
+
+    def mark_failed(self, error, error_class=None):
+        """Record a failed send and schedule a retry if the error allows one."""
+        self.status = "Failed"
+        self.last_error = error
+        self.retry_lease_token = None
+        self.retry_lease_until = None
+        self.schedule_retry(error_class)
+
+    def schedule_retry(self, error_class=None):
+        """Schedule next retry using jittered exponential backoff."""
+        next_retry_time = get_next_retry_time(error_class or ERROR_TRANSIENT, cint(self.retry_count))
+
+        if next_retry_time:
+            increment(
+                "whatsapp_retries_scheduled_total",
+                account=self.whatsapp_account,
+                error_class=error_class or ERROR_TRANSIENT,
+            )
+            self.retry_count = cint(self.retry_count) + 1
+            self.next_retry_time = next_retry_time
             self.status = "Retrying"
         else:
             self.status = "Failed"
@@ -126,14 +237,16 @@ class WhatsAppMessage(Document):
 
     def _send_text_or_media(self):
         """Handle sending text, media, interactive, and flow messages."""
-        if self.attach and not self.attach.startswith("http"):
-            link = frappe.utils.get_url() + "/" + self.attach
-        else:
-            link = self.attach
+        self.notify(self.get_send_payload())
+
+    def _build_text_or_media_payload(self):
+        """Build payload for text, media, interactive, and flow messages."""
+        if self.content_type in ("document", "image", "video", "audio") and not self.attach:
+            raise MediaMissing(_("Attach a file to send a {0} message").format(self.content_type))
 
         data = {
             "messaging_product": "whatsapp",
-            "to": format_number(self.to),
+            "to": self.format_number(self.to),
             "type": self.content_type,
         }
         if self.is_reply and self.reply_to_message_id:
@@ -141,7 +254,7 @@ class WhatsAppMessage(Document):
             
         if self.content_type in ["document", "image", "video"]:
             data[self.content_type.lower()] = {
-                "link": link,
+                **get_media_reference(self.whatsapp_account, self.attach),
                 "caption": self.message,
             }
         elif self.content_type == "reaction":
@@ -153,7 +266,7 @@ class WhatsAppMessage(Document):
             data["text"] = {"preview_url": True, "body": self.message}
 
         elif self.content_type == "audio":
-            data["audio"] = {"link": link}
+            data["audio"] = get_media_reference(self.whatsapp_account, self.attach)
 
         elif self.content_type == "interactive":
             # Interactive message (buttons or list)
@@ -219,17 +332,22 @@ class WhatsAppMessage(Document):
             if flow_mode:
                 data["interactive"]["action"]["parameters"]["mode"] = flow_mode
             
-            flow_token = self.flow_token or frappe.generate_hash(length=16)
-            data["interactive"]["action"]["parameters"]["flow_token"] = flow_token
+            self.flow_token = self.flow_token or frappe.generate_hash(length=16)
+            data["interactive"]["action"]["parameters"]["flow_token"] = self.flow_token
 
-        self.notify(data)
+        return data
 
     def _send_template(self):
         """Logic for sending template messages."""
-        template = frappe.get_doc("WhatsApp Templates", self.template)
+        self.notify(self._build_template_payload())
+        self.create_whatsapp_profile()
+
+    def _build_template_payload(self, template_name=None):
+        """Build payload for template messages, `template_name` overrides the message's template."""
+        template = frappe.get_doc("WhatsApp Templates", template_name or self.template)
         data = {
             "messaging_product": "whatsapp",
-            "to": format_number(self.to),
+            "to": self.format_number(self.to),
             "type": "template",
             "template": {
                 "name": template.actual_name or template.template_name,
@@ -270,21 +388,11 @@ class WhatsAppMessage(Document):
                 }
             )
 
-        if template.header_type:
-            if self.attach:
-                url = self.attach if self.attach.startswith("http") else f'{frappe.utils.get_url()}{self.attach}'
-                if template.header_type == 'IMAGE':
-                    data['template']['components'].append({
-                        "type": "header",
-                        "parameters": [{"type": "image", "image": {"link": url}}]
-                    })
-            elif template.sample:
-                url = template.sample if template.sample.startswith("http") else f'{frappe.utils.get_url()}{template.sample}'
-                if template.header_type == 'IMAGE':
-                    data['template']['components'].append({
-                        "type": "header",
-                        "parameters": [{"type": "image", "image": {"link": url}}]
-                    })
+        if template.header_type == 'IMAGE':
+            data['template']['components'].append({
+                "type": "header",
+                "parameters": [{"type": "image", "image": self._get_header_image(template)}]
+            })
 
         if template.buttons:
             button_parameters = []
@@ -318,16 +426,23 @@ class WhatsAppMessage(Document):
             if button_parameters:
                 data['template']['components'].extend(button_parameters)
 
-        self.notify(data)
+        return data
 
-        self.create_whatsapp_profile()
+    def _get_header_image(self, template):
+        """Media object for an image header: the attachment, else the template sample."""
+        if not (self.attach or template.sample):
+            raise MediaMissing(
+                _("Template {0} has an image header: attach an image or set a sample").format(template.name)
+            )
+
+        return get_media_reference(self.whatsapp_account, self.attach or template.sample)
 
     def send_template(self):
         """Send template."""
         template = frappe.get_doc("WhatsApp Templates", self.template)
         data = {
             "messaging_product": "whatsapp",
-            "to": format_number(self.to),
+            "to": self.format_number(self.to),
             "type": "template",
             "template": {
                 "name": template.actual_name or template.template_name,
@@ -368,39 +483,14 @@ class WhatsAppMessage(Document):
                 }
             )
 
-        if template.header_type:
-            if self.attach:
-                if template.header_type == 'IMAGE':
-
-                    if self.attach.startswith("http"):
-                        url = f'{self.attach}'
-                    else:
-                        url = f'{frappe.utils.get_url()}{self.attach}'
-                    data['template']['components'].append({
-                        "type": "header",
-                        "parameters": [{
-                            "type": "image",
-                            "image": {
-                                "link": url
-                            }
-                        }]
-                    })
-
-            elif template.sample:
-                if template.header_type == 'IMAGE':
-                    if template.sample.startswith("http"):
-                        url = f'{template.sample}'
-                    else:
-                        url = f'{frappe.utils.get_url()}{template.sample}'
-                    data['template']['components'].append({
-                        "type": "header",
-                        "parameters": [{
-                            "type": "image",
-                            "image": {
-                                "link": url
-                            }
-                        }]
-                    })
+        if template.header_type == 'IMAGE':
+            data['template']['components'].append({
+                "type": "header",
+                "parameters": [{
+                    "type": "image",
+                    "image": self._get_header_image(template)
+                }]
+            })
 
         if template.buttons:
             button_parameters = []
@@ -449,32 +539,37 @@ class WhatsAppMessage(Document):
             "content-type": "application/json",
         }
         try:
-            response = make_post_request(
-                f"{whatsapp_account.url}/{whatsapp_account.version}/{whatsapp_account.phone_id}/messages",
-                headers=headers,
-                data=json.dumps(data),
-            )
+            with timer("whatsapp_send_seconds", account=self.whatsapp_account):
+                response = make_post_request(
+                    f"{whatsapp_account.url}/{whatsapp_account.version}/{whatsapp_account.phone_id}/messages",
+                    headers=headers,
+                    data=json.dumps(data),
+                )
             self.message_id = response["messages"][0]["id"]
 
-        except Exception as e:
-            res = frappe.flags.integration_request.json().get("error", {})
+        except Exception:
+            response = frappe.flags.integration_request
+            if response is None or not hasattr(response, "json"):
+                # Timeout or connection error, there is no Graph API response to read
+                increment("whatsapp_send_errors_total", account=self.whatsapp_account, code="network")
+                raise
+
+            res = response.json().get("error", {})
             error_message = res.get("Error", res.get("message"))
+            increment("whatsapp_send_errors_total", account=self.whatsapp_account, code=res.get("code"))
             frappe.get_doc(
                 {
                     "doctype": "WhatsApp Notification Log",
                     "template": "Text Message",
-                    "meta_data": frappe.flags.integration_request.json(),
+                    "meta_data": response.json(),
                 }
             ).insert(ignore_permissions=True)
 
             frappe.throw(msg=error_message, title=res.get("error_user_title", "Error"))
 
     def format_number(self, number):
-        """Format number."""
-        if number.startswith("+"):
-            number = number[1 : len(number)]
-
-        return number
+        """Format number with the account's default country."""
+        return format_number(number, get_default_country_code(self.whatsapp_account))
 
     @frappe.whitelist()
     def send_read_receipt(self):
@@ -515,6 +610,15 @@ class WhatsAppMessage(Document):
 
 def on_doctype_update():
     frappe.db.add_index("WhatsApp Message", ["reference_doctype", "reference_name"])
+    frappe.db.add_index("WhatsApp Message", ["status", "next_retry_time"])
+    frappe.db.add_index("WhatsApp Message", ["scheduling_status", "scheduled_time"])
+    frappe.db.add_index("WhatsApp Message", ["whatsapp_account", "creation"])
+    frappe.db.add_index("WhatsApp Message", ["contact", "creation"])
+    frappe.db.add_index("WhatsApp Message", ["creation"])
+    # One row per delivered message, see utils.message_dedupe
+    frappe.db.add_unique(
+        "WhatsApp Message", ["whatsapp_account", "message_id"], constraint_name="unique_account_message_id"
+    )
 
 
 @frappe.whitelist()
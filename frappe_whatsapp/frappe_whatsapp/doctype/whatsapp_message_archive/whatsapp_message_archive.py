@@ -0,0 +1,19 @@
+import frappe
+from frappe.model.document import Document
+
+
+class WhatsAppMessageArchive(Document):
+    """
+    WhatsApp Message Archive, a settled message moved out of WhatsApp Message.
+
+    Keeps the original name and creation time; `data` holds every field,
+    see `utils.message_archive` for archival and lookups.
+    """
+
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("WhatsApp Message Archive", ["contact", "creation"])
+    frappe.db.add_index("WhatsApp Message Archive", ["whatsapp_account", "creation"])
+    frappe.db.add_index("WhatsApp Message Archive", ["reference_doctype", "reference_name"])
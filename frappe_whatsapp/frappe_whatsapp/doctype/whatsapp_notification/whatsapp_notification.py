@@ -10,7 +10,9 @@ from frappe.integrations.utils import make_post_request
 from frappe.desk.form.utils import get_pdf_link
 from frappe.utils import add_to_date, nowdate, datetime
 
-from frappe_whatsapp.utils import get_whatsapp_account
+from frappe_whatsapp.utils import get_whatsapp_account, format_number
+from frappe_whatsapp.utils.media_upload import get_media_reference
+from frappe_whatsapp.utils.phone import get_default_country_code
 
 
 class WhatsAppNotification(Document):
@@ -149,6 +151,7 @@ class WhatsAppNotification(Document):
                     "parameters": parameters
                 }]
 
+            media = None
             if self.attach_document_print:
                 # frappe.db.begin()
                 key = doc.get_document_share_key()  # noqa
@@ -188,6 +191,11 @@ class WhatsAppNotification(Document):
                         file_url = f'{frappe.utils.get_url()}{file_url}&key={key}'
                 else:
                     file_url = self.attach
+                    # Static attachments are uploaded once and sent by media id
+                    account = template.whatsapp_account or getattr(
+                        get_whatsapp_account(account_type='outgoing'), "name", None
+                    )
+                    media = get_media_reference(account, file_url)
 
                 if file_url.startswith("http"):
                     url = f'{file_url}'
@@ -200,7 +208,7 @@ class WhatsAppNotification(Document):
                     "parameters": [{
                         "type": "document",
                         "document": {
-                            "link": url,
+                            **(media or {"link": url}),
                             "filename": filename
                         }
                     }]
@@ -210,9 +218,7 @@ class WhatsAppNotification(Document):
                     "type": "header",
                     "parameters": [{
                         "type": "image",
-                        "image": {
-                            "link": url
-                        }
+                        "image": media or {"link": url}
                     }]
                 })
             self.content_type = template.header_type.lower()
@@ -333,11 +339,8 @@ class WhatsAppNotification(Document):
 
 
     def format_number(self, number):
-        """Format number."""
-        if (number.startswith("+")):
-            number = number[1:len(number)]
-
-        return number
+        """Format number with the account's default country."""
+        return format_number(number, get_default_country_code(self.get("whatsapp_account")))
 
     def get_documents_for_today(self):
         """get list of documents that will be triggered today"""
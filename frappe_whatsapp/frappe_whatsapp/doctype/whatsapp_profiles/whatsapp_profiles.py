@@ -4,6 +4,8 @@
 import frappe
 from frappe.model.document import Document
 from frappe_whatsapp.utils import format_number
+from frappe_whatsapp.utils.phone import get_default_country_code
+from frappe_whatsapp.utils.profile_resolver import clear_profile_cache
 
 class WhatsAppProfiles(Document):
     """
@@ -19,7 +21,14 @@ class WhatsAppProfiles(Document):
 
     def format_whatsapp_number(self):
         if self.number:
-            self.number = format_number(self.number)
+            self.number = format_number(self.number, get_default_country_code(self.get("whatsapp_account")))
+
+    def on_update(self):
+        previous = self.get_doc_before_save()
+        clear_profile_cache(self.number, previous and previous.number)
+
+    def on_trash(self):
+        clear_profile_cache(self.number)
 
     def set_title(self):
         self.title = " - ".join(filter(None, [self.profile_name, self.number])) or "Unnamed Profile"
@@ -17,7 +17,7 @@ frappe.ui.form.on('WhatsApp Recipient List', {
             }
             
             frappe.call({
-                method: 'frappe_whatsapp.utils.bulk_messaging.import_recipients',
+                method: 'frappe_whatsapp.utils.recipient_import.enqueue_recipient_import',
                 args: {
                     list_name: frm.doc.name,
                     doctype: frm.doc.doctype_to_import,
@@ -27,14 +27,56 @@ frappe.ui.form.on('WhatsApp Recipient List', {
                     limit: frm.doc.import_limit,
                     data_fields: frm.doc.data_fields
                 },
-                callback: function(r) {
-                    if(r.message) {
-                        frappe.msgprint(__(`${r.message} recipients imported successfully`));
-                        frm.reload_doc();
-                    }
+                callback: function() {
+                    frappe.show_alert({
+                        message: __('Import started, recipients are added in the background'),
+                        indicator: 'blue'
+                    });
                 }
             });
         };
+
+        if(!frm.is_new()) {
+            frm.add_custom_button(__('Import from File'), function() {
+                frappe.prompt([
+                    {label: __('CSV or XLSX File'), fieldname: 'file_url', fieldtype: 'Attach', reqd: 1},
+                    {label: __('Mobile Number Column'), fieldname: 'mobile_field', fieldtype: 'Data', reqd: 1},
+                    {label: __('Name Column'), fieldname: 'name_field', fieldtype: 'Data',
+                        description: __('Other columns are passed on as recipient data')}
+                ], function(values) {
+                    frappe.call({
+                        method: 'frappe_whatsapp.utils.recipient_import.enqueue_recipient_import',
+                        args: Object.assign({list_name: frm.doc.name}, values),
+                        callback: function() {
+                            frappe.show_alert({
+                                message: __('Import started, recipients are added in the background'),
+                                indicator: 'blue'
+                            });
+                        }
+                    });
+                }, __('Import Recipients from File'), __('Import'));
+            });
+        }
+
+        frappe.realtime.off('whatsapp_recipient_import_progress');
+        frappe.realtime.on('whatsapp_recipient_import_progress', function(data) {
+            if(data.list_name !== frm.doc.name) return;
+
+            if(data.done) {
+                frappe.show_alert({
+                    message: data.rejected
+                        ? __('{0} recipients imported, {1} rows with invalid numbers skipped', [data.count, data.rejected])
+                        : __('{0} recipients imported successfully', [data.count]),
+                    indicator: data.rejected ? 'orange' : 'green'
+                });
+                frm.reload_doc();
+            } else {
+                frappe.show_alert({
+                    message: __('{0} recipients imported so far', [data.count]),
+                    indicator: 'blue'
+                }, 3);
+            }
+        });
         
         // Add a button to add a test recipient
         frm.add_custom_button(__('Add Test Recipient'), function() {
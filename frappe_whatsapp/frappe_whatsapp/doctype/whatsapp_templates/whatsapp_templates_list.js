@@ -1,22 +1,43 @@
 frappe.listview_settings['WhatsApp Templates'] = {
 
 	onload: function(listview) {
+		frappe.realtime.on("whatsapp_sync_progress", function(data) {
+			if (data.kind !== "templates") return;
+
+			let counts = data.counts || {};
+			if (data.error) {
+				frappe.msgprint({
+					title: __("Sync Failed"),
+					message: __("{0}: {1}", [data.whatsapp_account, data.error]),
+					indicator: "red"
+				});
+			} else if (data.done) {
+				frappe.show_alert({
+					message: __("{0}: {1} new, {2} updated, {3} unchanged",
+						[data.whatsapp_account, counts.inserted, counts.updated, counts.unchanged]),
+					indicator: "green"
+				});
+				listview.refresh();
+			} else {
+				frappe.show_alert({
+					message: __("{0}: page {1} synced", [data.whatsapp_account, counts.pages]),
+					indicator: "blue"
+				}, 3);
+			}
+		});
+
 		listview.page.add_inner_button(__("Sync from Meta"), function() {
 			frappe.call({
-				method: 'frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_templates.whatsapp_templates.fetch',
-				freeze: true,
-				freeze_message: __("Syncing templates from Meta..."),
+				method: 'frappe_whatsapp.utils.sync_jobs.enqueue_template_sync',
 				callback: function(r) {
-					if (r.message) {
-						frappe.msgprint({
-							title: __("Sync Complete"),
-							message: r.message,
-							indicator: "green"
-						});
-						listview.refresh();
-					}
+					frappe.show_alert({
+						message: r.message && r.message.length
+							? __("Template sync started for {0}", [r.message.join(", ")])
+							: __("A template sync is already running"),
+						indicator: "blue"
+					});
 				}
 			});
 		});
 	}
-};
\ No newline at end of file
+};
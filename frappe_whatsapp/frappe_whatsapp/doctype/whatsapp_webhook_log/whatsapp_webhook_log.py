@@ -1,33 +1,45 @@
 import frappe
 from frappe.model.document import Document
-from frappe_whatsapp.utils import webhook
+from frappe_whatsapp.utils.webhook_log import load_stored_payload
+from frappe_whatsapp.utils.webhook_replay import get_existing_message_ids, get_message_ids, replay_payload
 
 
 class WhatsAppWebhookLog(Document):
     """
     WhatsApp Webhook Log for debugging and replay.
-    
+
     Records incoming webhook requests from WhatsApp Business API
     with replay capability for debugging message processing.
     """
 
+    def get_request_data(self):
+        """Payload as received, decompressed if it was stored compressed."""
+        return load_stored_payload(self)[0]
+
+    def get_headers(self):
+        return load_stored_payload(self)[1]
+
     @frappe.whitelist()
     def replay_webhook(self):
-        """Replay this webhook."""
-        if not self.request_data:
+        """Replay this webhook, skipping messages that were already received."""
+        if not (self.request_data or self.compressed_data):
             frappe.throw("No request data to replay")
-            
+        if self.error == "Invalid Signature":
+            frappe.throw("Webhooks that failed signature verification cannot be replayed")
+
         try:
-            # We call the internal webhook processing function directly
-            # This bypasses signature check usually, which is fine for replay if we trust the log
-            # Or we can verify it again if headers are present
-            
-            data = frappe.parse_json(self.request_data)
-            webhook.webhook(data)
-            
+            data = self.get_request_data()
+            known_ids = get_existing_message_ids(get_message_ids(data))
+            if replay_payload(data, known_ids) is None:
+                return "Replay Failed, see Error Log"
+
             self.is_replayed = 1
             self.save(ignore_permissions=True)
             return "Replay Successful"
         except Exception as e:
             frappe.log_error(f"Replay failed: {e}", "WhatsApp Webhook Replay")
             return f"Replay Failed: {e}"
+
+
+def on_doctype_update():
+    frappe.db.add_index("WhatsApp Webhook Log", ["timestamp"])
@@ -0,0 +1,63 @@
+// Copyright (c) 2026, Shridhar Patil and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["WhatsApp Webhook Log"] = {
+    onload: function(listview) {
+        frappe.realtime.on("whatsapp_webhook_replay_progress", function(data) {
+            if (data.done) {
+                frappe.hide_progress();
+                frappe.show_alert({
+                    message: __("Replayed {0} webhooks, skipped {1} duplicate messages, {2} failed",
+                        [data.replayed, data.duplicates, data.failed]),
+                    indicator: data.failed ? "orange" : "green"
+                });
+                listview.refresh();
+            } else {
+                frappe.show_progress(__("Replaying webhooks ({0}/s)", [data.logs_per_second]),
+                    data.replayed + data.failed, data.total);
+            }
+        });
+
+        listview.page.add_inner_button(__("Replay Webhooks"), function() {
+            frappe.prompt([
+                {
+                    fieldname: "from_time",
+                    fieldtype: "Datetime",
+                    label: __("From")
+                },
+                {
+                    fieldname: "to_time",
+                    fieldtype: "Datetime",
+                    label: __("To")
+                },
+                {
+                    fieldname: "only_failed",
+                    fieldtype: "Check",
+                    label: __("Only Failed Webhooks")
+                },
+                {
+                    fieldname: "include_replayed",
+                    fieldtype: "Check",
+                    label: __("Include Already Replayed")
+                }
+            ],
+            function(values) {
+                frappe.call({
+                    method: "frappe_whatsapp.utils.webhook_replay.enqueue_webhook_replay",
+                    args: values,
+                    callback: function(r) {
+                        frappe.show_alert({
+                            message: r.message
+                                ? __("Webhook replay started")
+                                : __("A webhook replay is already running"),
+                            indicator: "blue"
+                        });
+                    }
+                });
+            },
+            __("Replay Webhooks"),
+            __("Replay")
+            );
+        });
+    }
+};
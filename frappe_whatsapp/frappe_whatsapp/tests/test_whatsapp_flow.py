@@ -358,6 +358,21 @@ class TestFlowEndpoint(FrappeTestCase):
         self.assertIn("screen", response)
         self.assertIn("data", response)
 
+    def test_session_state_merges_in_redis(self):
+        """Test form data is merged into the flow token session."""
+        from frappe_whatsapp.utils.flow_session import get_session, start_session, update_session
+
+        flow_token = frappe.generate_hash(length=16)
+        start_session(flow_token, "Test Flow")
+        update_session(flow_token, "DETAILS", {"name": "John"})
+        session = update_session(flow_token, "CONTACT", {"email": "john@example.com"})
+
+        self.assertEqual(session["flow"], "Test Flow")
+        self.assertEqual(session["last_screen"], "CONTACT")
+        self.assertEqual(session["data"], {"name": "John", "email": "john@example.com"})
+        self.assertEqual(get_session(flow_token), session)
+        self.assertIsNone(get_session(frappe.generate_hash(length=16)))
+
     def test_ping_action(self):
         """Test ping action response."""
         # The endpoint should respond to ping with status: active
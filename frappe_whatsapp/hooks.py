@@ -142,9 +142,15 @@ scheduler_events = {
     "all": [
         "frappe_whatsapp.utils.trigger_whatsapp_notifications_all",
         "frappe_whatsapp.utils.process_retries",
-        "frappe_whatsapp.utils.scheduler.process_scheduled_messages",
         "frappe_whatsapp.utils.campaign_engine.process_campaigns"
     ],
+    "cron": {
+        "* * * * *": [
+            "frappe_whatsapp.utils.scheduler.process_scheduled_messages",
+            "frappe_whatsapp.utils.analytics_rollup.flush_rollups",
+            "frappe_whatsapp.utils.analytics_cube.flush_cube"
+        ]
+    },
     "hourly": [
         "frappe_whatsapp.utils.trigger_whatsapp_notifications_hourly"
     ],
@@ -158,6 +164,9 @@ scheduler_events = {
     ],
     "daily_long": [
         "frappe_whatsapp.utils.trigger_whatsapp_notifications_daily_long",
+        "frappe_whatsapp.utils.sync_jobs.scheduled_sync",
+        "frappe_whatsapp.utils.webhook_log.purge_webhook_logs",
+        "frappe_whatsapp.utils.message_archive.archive_messages",
     ],
     "weekly": [
         "frappe_whatsapp.utils.trigger_whatsapp_notifications_weekly",
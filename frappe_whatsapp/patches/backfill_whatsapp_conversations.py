@@ -0,0 +1,101 @@
+import frappe
+from frappe.utils import add_to_date
+
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_conversation.whatsapp_conversation import (
+    get_conversation_name,
+)
+from frappe_whatsapp.utils.conversation import SERVICE_WINDOW_HOURS, get_excerpt
+from frappe_whatsapp.utils.phone import get_default_country_code, normalize_numbers
+
+CHUNK_SIZE = 10000
+
+
+def execute():
+    backfill_message_contacts()
+    backfill_conversations()
+
+
+def backfill_message_contacts():
+    """
+    Set `contact` on existing messages in chunks, normalised like
+    WhatsAppMessage.set_contact with each account's default country code.
+    """
+    country_codes = {}
+    while True:
+        messages = frappe.db.sql("""
+            SELECT name, whatsapp_account, IF(type = 'Incoming', `from`, `to`) AS number
+            FROM `tabWhatsApp Message`
+            WHERE contact IS NULL
+            LIMIT %s
+        """, CHUNK_SIZE, as_dict=True)
+        if not messages:
+            break
+
+        by_account = {}
+        for message in messages:
+            by_account.setdefault(message.whatsapp_account, []).append(message)
+
+        by_contact = {}
+        for whatsapp_account, account_messages in by_account.items():
+            if whatsapp_account not in country_codes:
+                country_codes[whatsapp_account] = get_default_country_code(whatsapp_account)
+            numbers = normalize_numbers([m.number for m in account_messages], country_codes[whatsapp_account])
+            for message, number in zip(account_messages, numbers):
+                # '' marks messages without a number as done
+                by_contact.setdefault(number or "", []).append(message.name)
+
+        for contact, names in by_contact.items():
+            frappe.db.sql(
+                "UPDATE `tabWhatsApp Message` SET contact = %s WHERE name IN %s", (contact, names)
+            )
+        frappe.db.commit()
+
+        if len(messages) < CHUNK_SIZE:
+            break
+
+
+def backfill_conversations():
+    groups = frappe.db.sql("""
+        SELECT whatsapp_account, contact,
+            MAX(creation) AS last_activity,
+            MAX(IF(type = 'Incoming', creation, NULL)) AS last_incoming_at
+        FROM `tabWhatsApp Message`
+        WHERE contact != '' AND whatsapp_account IS NOT NULL
+        GROUP BY whatsapp_account, contact
+    """, as_dict=True)
+
+    for i, group in enumerate(groups, start=1):
+        name = get_conversation_name(group.whatsapp_account, group.contact)
+        if frappe.db.exists("WhatsApp Conversation", name):
+            continue
+
+        last = frappe.db.get_value(
+            "WhatsApp Message",
+            {"contact": group.contact, "whatsapp_account": group.whatsapp_account, "creation": group.last_activity},
+            ["name", "message", "content_type", "profile_name"],
+            as_dict=True,
+        )
+        frappe.db.sql("""
+            INSERT INTO `tabWhatsApp Conversation`
+                (name, whatsapp_account, contact, profile_name, unread_count, service_window_expires,
+                last_message, last_message_type, last_activity, last_incoming_at, last_whatsapp_message,
+                creation, modified, owner, modified_by)
+            VALUES
+                (%(name)s, %(whatsapp_account)s, %(contact)s, %(profile_name)s, 0, %(window)s,
+                %(excerpt)s, %(content_type)s, %(last_activity)s, %(last_incoming_at)s, %(message)s,
+                %(last_activity)s, %(last_activity)s, 'Administrator', 'Administrator')
+        """, {
+            "name": name,
+            "whatsapp_account": group.whatsapp_account,
+            "contact": group.contact,
+            "profile_name": last.profile_name if last else None,
+            "window": add_to_date(group.last_incoming_at, hours=SERVICE_WINDOW_HOURS) if group.last_incoming_at else None,
+            "excerpt": get_excerpt(last) if last else None,
+            "content_type": last.content_type if last else None,
+            "last_activity": group.last_activity,
+            "last_incoming_at": group.last_incoming_at,
+            "message": last.name if last else None,
+        })
+
+        if i % 1000 == 0:
+            frappe.db.commit()
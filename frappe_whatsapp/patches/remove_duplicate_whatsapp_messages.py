@@ -0,0 +1,41 @@
+import frappe
+
+CHUNK_SIZE = 1000
+# Dropped again at the end; the unique index is added by the model sync that follows
+TEMP_INDEX = "tmp_account_message_id"
+
+
+def execute():
+    """Keep the first copy of messages Meta delivered more than once, before the unique index is added."""
+    if not frappe.db.has_column("WhatsApp Message", "whatsapp_account"):
+        return
+
+    frappe.db.sql("UPDATE `tabWhatsApp Message` SET message_id = NULL WHERE message_id = ''")
+    frappe.db.commit()
+
+    # Without it every chunk would scan the whole table for each duplicate
+    frappe.db.add_index("WhatsApp Message", ["whatsapp_account", "message_id"], TEMP_INDEX)
+
+    # Delete in small chunks so large tables are not locked for the whole run
+    last_name = ""
+    while True:
+        duplicates = frappe.db.sql_list("""
+            SELECT DISTINCT duplicate.name
+            FROM `tabWhatsApp Message` duplicate
+            JOIN `tabWhatsApp Message` original
+                ON original.message_id = duplicate.message_id
+                AND original.whatsapp_account = duplicate.whatsapp_account
+                AND (original.creation < duplicate.creation
+                    OR (original.creation = duplicate.creation AND original.name < duplicate.name))
+            WHERE duplicate.name > %(last_name)s
+            ORDER BY duplicate.name
+            LIMIT %(limit)s
+        """, {"last_name": last_name, "limit": CHUNK_SIZE})
+        if not duplicates:
+            break
+
+        frappe.db.delete("WhatsApp Message", {"name": ["in", duplicates]})
+        frappe.db.commit()
+        last_name = duplicates[-1]
+
+    frappe.db.sql_ddl(f"ALTER TABLE `tabWhatsApp Message` DROP INDEX `{TEMP_INDEX}`")
@@ -0,0 +1,185 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime, today
+from frappe_whatsapp.utils import format_number, latency_sketch
+from frappe_whatsapp.utils.analytics_collector import (
+    calculate_response_time_stats,
+    percentiles_from_histogram,
+)
+from frappe_whatsapp.utils.analytics_cube import (
+    flush_cube,
+    get_cube_metrics,
+    get_latency_percentiles,
+    track_message_sent,
+    track_status_change,
+)
+from frappe_whatsapp.utils.analytics_rollup import (
+    flush_rollups,
+    get_hourly_analytics,
+    get_pending_counters,
+    track_event,
+)
+
+
+class TestAnalyticsRollup(FrappeTestCase):
+    def setUp(self):
+        self.account_name = "Test Analytics Account"
+        if not frappe.db.exists("WhatsApp Account", self.account_name):
+            frappe.get_doc({
+                "doctype": "WhatsApp Account",
+                "account_name": self.account_name,
+                "phone_id": "analytics_phone_id",
+                "webhook_verify_token": "analytics_verify_token",
+            }).insert(ignore_permissions=True)
+
+    def tearDown(self):
+        frappe.db.delete("WhatsApp Analytics", {"whatsapp_account": self.account_name})
+        frappe.db.delete("WhatsApp Hourly Analytics", {"whatsapp_account": self.account_name})
+
+    def test_flush_accumulates_counters(self):
+        track_event("messages_sent", self.account_name)
+        track_event("messages_sent", self.account_name)
+        track_event("messages_received", self.account_name)
+        flush_rollups()
+
+        track_event("messages_sent", self.account_name)
+        flush_rollups()
+
+        daily = frappe.db.get_value(
+            "WhatsApp Analytics",
+            {"whatsapp_account": self.account_name, "date": today()},
+            ["messages_sent", "messages_received"],
+            as_dict=True
+        )
+        self.assertEqual(daily.messages_sent, 3)
+        self.assertEqual(daily.messages_received, 1)
+
+        hours = get_hourly_analytics(self.account_name)
+        self.assertEqual(len(hours), 24)
+        self.assertEqual(sum(h["messages_sent"] for h in hours), 3)
+
+    def test_failed_flush_keeps_counters(self):
+        track_event("messages_sent", self.account_name)
+        with patch(
+            "frappe_whatsapp.utils.analytics_rollup.apply_counters", side_effect=Exception("database down")
+        ):
+            flush_rollups()
+
+        self.assertEqual(get_pending_counters(self.account_name, today()).get("messages_sent"), 1)
+
+        flush_rollups()
+        self.assertEqual(
+            frappe.db.get_value(
+                "WhatsApp Analytics", {"whatsapp_account": self.account_name, "date": today()}, "messages_sent"
+            ),
+            1,
+        )
+
+    def test_unknown_metrics_are_ignored(self):
+        track_event("not_a_field", self.account_name)
+        flush_rollups()
+
+        self.assertFalse(frappe.db.exists("WhatsApp Analytics", {"whatsapp_account": self.account_name}))
+
+
+class TestResponseTimes(FrappeTestCase):
+    def setUp(self):
+        self.account_name = "Test Analytics Account"
+        if not frappe.db.exists("WhatsApp Account", self.account_name):
+            frappe.get_doc({
+                "doctype": "WhatsApp Account",
+                "account_name": self.account_name,
+                "phone_id": "analytics_phone_id",
+                "webhook_verify_token": "analytics_verify_token",
+            }).insert(ignore_permissions=True)
+
+    def tearDown(self):
+        frappe.db.delete("WhatsApp Message", {"whatsapp_account": self.account_name})
+
+    def make_message(self, message_type, contact, at):
+        doc = frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": message_type,
+            "from" if message_type == "Incoming" else "to": contact,
+            # As WhatsAppMessage.set_contact, which db_insert skips
+            "contact": format_number(contact),
+            "message": "response time",
+            "whatsapp_account": self.account_name,
+        })
+        doc.db_insert()
+        frappe.db.set_value("WhatsApp Message", doc.name, "creation", at, update_modified=False)
+
+    def test_percentiles_from_histogram(self):
+        histogram = [0] * 11
+        for value in range(1, 11):
+            histogram[value] = 1
+
+        self.assertEqual(percentiles_from_histogram(histogram, (50, 90, 99)), [5, 9, 10])
+        self.assertEqual(percentiles_from_histogram([0, 0], (50,)), [0])
+
+    def test_interleaved_conversations(self):
+        start = get_datetime(f"{today()} 08:00:00")
+        self.make_message("Incoming", "+911111111111", start)
+        self.make_message("Incoming", "922222222222", add_to_date(start, seconds=5))
+        self.make_message("Outgoing", "922222222222", add_to_date(start, seconds=15))
+        self.make_message("Outgoing", "911111111111", add_to_date(start, seconds=30))
+
+        stats = calculate_response_time_stats(
+            self.account_name, start, add_to_date(start, minutes=1)
+        )
+
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["avg"], 20)
+        self.assertEqual(stats["p50"], 10)
+        self.assertEqual(stats["p99"], 30)
+
+
+class TestAnalyticsCube(FrappeTestCase):
+    def setUp(self):
+        self.account_name = "Test Analytics Account"
+        if not frappe.db.exists("WhatsApp Account", self.account_name):
+            frappe.get_doc({
+                "doctype": "WhatsApp Account",
+                "account_name": self.account_name,
+                "phone_id": "analytics_phone_id",
+                "webhook_verify_token": "analytics_verify_token",
+            }).insert(ignore_permissions=True)
+
+    def tearDown(self):
+        frappe.db.delete("WhatsApp Analytics Cube", {"whatsapp_account": self.account_name})
+
+    def test_sketch_quantiles_are_within_accuracy(self):
+        sketch = latency_sketch.new_sketch()
+        for seconds in range(1, 1001):
+            latency_sketch.add(sketch, seconds)
+
+        merged = latency_sketch.merge(latency_sketch.new_sketch(), latency_sketch.loads(latency_sketch.dumps(sketch)))
+        self.assertEqual(latency_sketch.count(merged), 1000)
+        for q, expected in ((0.5, 500), (0.9, 900), (0.99, 990)):
+            value = latency_sketch.quantile(merged, q)
+            self.assertLessEqual(abs(value - expected) / expected, latency_sketch.RELATIVE_ACCURACY)
+
+    def test_status_updates_land_in_send_hour(self):
+        doc = frappe._dict(
+            type="Outgoing",
+            status="sent",
+            whatsapp_account=self.account_name,
+            template=None,
+            bulk_message_reference="Test Campaign",
+            creation=get_datetime(f"{today()} 09:15:00"),
+        )
+        track_message_sent(doc)
+        track_status_change(doc, "delivered", at=None)
+        flush_cube()
+
+        rows = get_cube_metrics(today(), today(), group_by="hour", campaign="Test Campaign")
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0].hour, 9)
+        self.assertEqual(rows[0].messages_sent, 1)
+        self.assertEqual(rows[0].messages_delivered, 1)
+
+        latency = get_latency_percentiles(today(), today(), campaign="Test Campaign")
+        self.assertEqual(latency["delivery_latency"]["count"], 1)
+        self.assertEqual(latency["read_latency"]["count"], 0)
@@ -0,0 +1,66 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime, now_datetime
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_conversation.whatsapp_conversation import (
+    get_conversation_name,
+)
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.conversation import get_thread, mark_conversation_read, update_conversation
+
+CONTACT = "15550107777"
+
+
+class TestConversation(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+
+    def tearDown(self):
+        frappe.db.delete("WhatsApp Message", {"contact": CONTACT})
+        frappe.db.delete("WhatsApp Conversation", {"contact": CONTACT})
+
+    def make_message(self, message_type, at, text="hello"):
+        doc = frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": message_type,
+            "from" if message_type == "Incoming" else "to": f"+{CONTACT}",
+            "contact": CONTACT,
+            "message": text,
+            "content_type": "text",
+            "profile_name": "Jane" if message_type == "Incoming" else None,
+            "whatsapp_account": "Test Account",
+        })
+        doc.db_insert()
+        frappe.db.set_value("WhatsApp Message", doc.name, "creation", at, update_modified=False)
+        doc.creation = at
+        update_conversation(doc)
+        return doc
+
+    def test_conversation_is_maintained_on_insert(self):
+        start = get_datetime("2026-01-01 10:00:00")
+        self.make_message("Incoming", start, "first")
+        self.make_message("Outgoing", add_to_date(start, minutes=1), "reply")
+        self.make_message("Incoming", add_to_date(start, minutes=2), "second")
+        # Inserted late, must not replace the last message
+        self.make_message("Incoming", add_to_date(start, seconds=30), "late")
+
+        conversation = frappe.get_doc("WhatsApp Conversation", get_conversation_name("Test Account", CONTACT))
+        self.assertEqual(conversation.unread_count, 3)
+        self.assertEqual(conversation.last_message, "second")
+        self.assertEqual(conversation.profile_name, "Jane")
+        self.assertEqual(get_datetime(conversation.service_window_expires), add_to_date(start, hours=24, minutes=2))
+
+        mark_conversation_read(f"+{CONTACT}", "Test Account")
+        self.assertEqual(frappe.db.get_value("WhatsApp Conversation", conversation.name, "unread_count"), 0)
+
+    def test_thread_pages_by_cursor(self):
+        start = add_to_date(now_datetime(), hours=-1)
+        for i in range(5):
+            self.make_message("Incoming", add_to_date(start, minutes=i), f"message {i}")
+
+        first = get_thread(f"+1 555 010 7777", "Test Account", limit=2)
+        second = get_thread(CONTACT, "Test Account", before=first["next_cursor"], limit=2)
+        last = get_thread(CONTACT, "Test Account", before=second["next_cursor"], limit=2)
+
+        messages = [m.message for m in first["messages"] + second["messages"] + last["messages"]]
+        self.assertEqual(messages, [f"message {i}" for i in range(4, -1, -1)])
+        self.assertIsNone(last["next_cursor"])
@@ -0,0 +1,57 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+def make_flow():
+    return frappe.get_doc({
+        "doctype": "WhatsApp Flow",
+        "flow_name": "Flow JSON Test",
+        "screens": [
+            {"screen_id": "DETAILS", "screen_title": "Details"},
+            {"screen_id": "CONTACT", "screen_title": "Contact"},
+            {"screen_id": "DONE", "screen_title": "Done", "terminal": 1},
+        ],
+        "fields": [
+            {"screen": "DETAILS", "field_name": "intro", "field_type": "TextBody", "label": "Hi", "enabled": 1},
+            {"screen": "DETAILS", "field_name": "name", "field_type": "TextInput", "label": "Name", "enabled": 1},
+            {"screen": "CONTACT", "field_name": "email", "field_type": "TextInput", "label": "Email", "enabled": 1},
+            {"screen": "CONTACT", "field_name": "skipped", "field_type": "TextInput", "enabled": 0},
+            {"screen": "DETAILS", "field_name": "city", "field_type": "TextInput", "label": "City", "enabled": 1},
+            {"screen": "DONE", "field_name": "agree", "field_type": "OptIn", "enabled": 1},
+        ],
+    })
+
+
+class TestFlowJson(FrappeTestCase):
+    def test_incoming_data_and_payloads(self):
+        flow = make_flow().generate_flow_json()
+        details, contact, done = flow["screens"]
+
+        self.assertEqual(details["data"], {})
+        self.assertEqual(list(contact["data"]), ["name", "city"])
+        self.assertEqual(list(done["data"]), ["name", "city", "email"])
+
+        self.assertEqual(details["layout"]["children"][-1]["on-click-action"], {
+            "name": "navigate",
+            "next": {"type": "screen", "name": "CONTACT"},
+            "payload": {"name": "${form.name}", "city": "${form.city}"},
+        })
+        self.assertEqual(done["layout"]["children"][-1]["on-click-action"], {
+            "name": "complete",
+            "payload": {
+                "name": "${data.name}",
+                "city": "${data.city}",
+                "email": "${data.email}",
+                "agree": "${form.agree}",
+            },
+        })
+
+    def test_generation_follows_table_changes(self):
+        doc = make_flow()
+        doc.generate_flow_json()
+
+        doc.fields[2].enabled = 0
+        flow = doc.generate_flow_json()
+
+        self.assertNotIn("email", flow["screens"][2]["data"])
+        self.assertNotIn("email", flow["screens"][1]["layout"]["children"][-1]["on-click-action"]["payload"])
@@ -0,0 +1,107 @@
+import os
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from PIL import Image
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.dispatcher import ERROR_PERMANENT, classify_exception
+from frappe_whatsapp.utils.media_handler import generate_image_derivatives, remove_image_derivatives
+from frappe_whatsapp.utils.media_store import (
+    HANDLE_UPLOAD,
+    get_media_handle,
+    get_media_object,
+    hash_file,
+    register_media,
+    release_media,
+    save_media_handle,
+)
+from frappe_whatsapp.utils.media_upload import MediaMissing, get_media_reference
+
+
+class TestMediaStore(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+
+    def write_file(self, content):
+        file_name = f"{frappe.generate_hash(length=10)}.txt"
+        path = frappe.get_site_path("public", "files", file_name)
+        with open(path, "wb") as f:
+            f.write(content)
+
+        sha256, content_hash = hash_file(path)
+        return {
+            "sha256": sha256,
+            "content_hash": content_hash,
+            "file_url": f"/files/{file_name}",
+            "file_size": len(content),
+            "path": path,
+        }
+
+    def test_duplicate_content_is_stored_once(self):
+        first = self.write_file(b"same media content")
+        second = self.write_file(b"same media content")
+
+        media = register_media(first, "text/plain")
+        duplicate = register_media(second, "text/plain")
+
+        self.assertEqual(duplicate.file_url, first["file_url"])
+        self.assertEqual(duplicate.ref_count, 2)
+        self.assertFalse(os.path.exists(second["path"]))
+
+        release_media(media.file_url)
+        self.assertEqual(get_media_object(media.sha256).ref_count, 1)
+        release_media(media.file_url)
+        self.assertFalse(frappe.db.exists("WhatsApp Media Object", media.sha256))
+
+        os.remove(first["path"])
+
+    def test_handles_are_reused_per_account(self):
+        stored = self.write_file(b"template sample")
+        media = register_media(stored, "text/plain", add_ref=False)
+
+        self.assertEqual(get_media_handle(media.sha256, "Test Account", HANDLE_UPLOAD), (None, None))
+        save_media_handle(media.sha256, "Test Account", "4::handle", HANDLE_UPLOAD)
+        handle, expires_on = get_media_handle(media.sha256, "Test Account", HANDLE_UPLOAD)
+        self.assertEqual(handle, "4::handle")
+        self.assertTrue(expires_on)
+
+        release_media(media.file_url)
+        os.remove(stored["path"])
+
+    def test_cached_media_id_replaces_link(self):
+        self.assertEqual(
+            get_media_reference("Test Account", "https://example.com/image.jpg"),
+            {"link": "https://example.com/image.jpg"},
+        )
+
+        frappe.cache.set_value("whatsapp_media_id:Test Account:/files/cached.jpg", "1234567890")
+        self.assertEqual(get_media_reference("Test Account", "/files/cached.jpg"), {"id": "1234567890"})
+        frappe.cache.delete_value("whatsapp_media_id:Test Account:/files/cached.jpg")
+
+    def test_image_derivatives(self):
+        path = frappe.get_site_path("public", "files", f"{frappe.generate_hash(length=10)}.jpg")
+        Image.new("RGB", (4000, 3000), "red").save(path, format="JPEG")
+
+        derivatives = generate_image_derivatives(path)
+
+        with Image.open(derivatives["display"]) as display:
+            self.assertEqual(display.size, (1600, 1200))
+        with Image.open(derivatives["thumbnail"]) as thumbnail:
+            self.assertEqual(thumbnail.size, (320, 240))
+
+        remove_image_derivatives(path)
+        self.assertFalse(os.path.exists(derivatives["thumbnail"]))
+        os.remove(path)
+
+    def test_media_message_without_file_fails_permanently(self):
+        doc = frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": "Outgoing",
+            "to": "15550100000",
+            "content_type": "image",
+            "whatsapp_account": "Test Account",
+        })
+
+        with self.assertRaises(MediaMissing) as context:
+            doc.get_send_payload()
+        self.assertEqual(classify_exception(context.exception), ERROR_PERMANENT)
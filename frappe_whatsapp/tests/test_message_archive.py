@@ -0,0 +1,55 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, now_datetime
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.conversation import get_thread
+from frappe_whatsapp.utils.message_archive import archive_messages_before, get_message
+
+CONTACT = "15550105555"
+
+
+class TestMessageArchive(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+
+    def tearDown(self):
+        frappe.db.delete("WhatsApp Message", {"contact": CONTACT})
+        frappe.db.delete("WhatsApp Message Archive", {"contact": CONTACT})
+        frappe.db.commit()
+
+    def make_message(self, days_ago, status, text):
+        doc = frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": "Outgoing",
+            "to": CONTACT,
+            "contact": CONTACT,
+            "message": text,
+            "content_type": "text",
+            "status": status,
+            "whatsapp_account": "Test Account",
+        })
+        doc.creation = doc.modified = add_days(now_datetime(), -days_ago)
+        doc.db_insert()
+        return doc.name
+
+    def test_only_old_settled_messages_are_archived(self):
+        settled = self.make_message(100, "read", "old")
+        retrying = self.make_message(100, "Retrying", "retrying")
+        recent = self.make_message(1, "read", "new")
+
+        archive_messages_before(add_days(now_datetime(), -90))
+
+        self.assertFalse(frappe.db.exists("WhatsApp Message", settled))
+        self.assertTrue(frappe.db.exists("WhatsApp Message Archive", settled))
+        self.assertTrue(frappe.db.exists("WhatsApp Message", retrying))
+        self.assertTrue(frappe.db.exists("WhatsApp Message", recent))
+        self.assertEqual(get_message(settled).message, "old")
+
+    def test_thread_includes_archived_messages(self):
+        self.make_message(100, "read", "old")
+        self.make_message(1, "read", "new")
+        archive_messages_before(add_days(now_datetime(), -90))
+
+        thread = get_thread(CONTACT, "Test Account")
+
+        self.assertEqual([message.message for message in thread["messages"]], ["new", "old"])
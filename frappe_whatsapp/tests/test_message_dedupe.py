@@ -0,0 +1,51 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.message_dedupe import _get_key, insert_incoming_message, is_message_seen
+from frappe_whatsapp.utils.webhook import process_single_message
+
+MESSAGE_ID = "wamid.dedupe-test"
+
+
+class TestMessageDedupe(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+        self.account = frappe.get_doc("WhatsApp Account", "Test Account")
+        frappe.cache.delete(_get_key(self.account.name, MESSAGE_ID))
+
+    def tearDown(self):
+        frappe.cache.delete(_get_key(self.account.name, MESSAGE_ID))
+        frappe.db.delete("WhatsApp Message", {"message_id": MESSAGE_ID})
+        frappe.db.commit()
+
+    def make_message(self):
+        return {
+            "id": MESSAGE_ID,
+            "from": "15550106666",
+            "type": "text",
+            "text": {"body": "hello"},
+        }
+
+    def test_repeated_delivery_is_stored_once(self):
+        process_single_message(self.make_message(), self.account, "Jane")
+        self.assertTrue(is_message_seen(self.account.name, MESSAGE_ID))
+
+        process_single_message(self.make_message(), self.account, "Jane")
+        self.assertEqual(frappe.db.count("WhatsApp Message", {"message_id": MESSAGE_ID}), 1)
+
+    def test_unique_index_ignores_duplicate_without_cache(self):
+        process_single_message(self.make_message(), self.account, "Jane")
+        frappe.cache.delete(_get_key(self.account.name, MESSAGE_ID))
+
+        duplicate = insert_incoming_message({
+            "doctype": "WhatsApp Message",
+            "type": "Incoming",
+            "from": "15550106666",
+            "message_id": MESSAGE_ID,
+            "whatsapp_account": self.account.name,
+            "content_type": "text",
+            "message": "hello",
+        })
+
+        self.assertIsNone(duplicate)
+        self.assertEqual(frappe.db.count("WhatsApp Message", {"message_id": MESSAGE_ID}), 1)
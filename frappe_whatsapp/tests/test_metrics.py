@@ -0,0 +1,42 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe_whatsapp.utils.metrics import (
+    METRICS_KEY,
+    increment,
+    observe,
+    render_metrics,
+)
+
+
+class TestMetrics(FrappeTestCase):
+    def setUp(self):
+        frappe.cache.delete(frappe.cache.make_key(METRICS_KEY))
+
+    def tearDown(self):
+        frappe.cache.delete(frappe.cache.make_key(METRICS_KEY))
+
+    def test_counter_is_rendered_with_labels(self):
+        increment("whatsapp_send_errors_total", account="Test Account", code=131047)
+        increment("whatsapp_send_errors_total", account="Test Account", code=131047)
+
+        text = render_metrics()
+
+        self.assertIn("# TYPE whatsapp_send_errors_total counter", text)
+        self.assertIn('whatsapp_send_errors_total{account="Test Account",code="131047"} 2', text)
+
+    def test_histogram_buckets_are_cumulative_and_ordered(self):
+        observe("whatsapp_send_seconds", 0.3, account="Test Account")
+        observe("whatsapp_send_seconds", 3, account="Test Account")
+
+        lines = [line for line in render_metrics().splitlines() if line.startswith("whatsapp_send_seconds")]
+
+        self.assertIn('whatsapp_send_seconds_bucket{account="Test Account",le="0.25"} 0', lines)
+        self.assertIn('whatsapp_send_seconds_bucket{account="Test Account",le="0.5"} 1', lines)
+        self.assertIn('whatsapp_send_seconds_bucket{account="Test Account",le="5"} 2', lines)
+        self.assertIn('whatsapp_send_seconds_bucket{account="Test Account",le="+Inf"} 2', lines)
+        self.assertIn('whatsapp_send_seconds_count{account="Test Account"} 2', lines)
+        self.assertEqual(lines[-1], 'whatsapp_send_seconds_count{account="Test Account"} 2')
+        self.assertLess(
+            lines.index('whatsapp_send_seconds_bucket{account="Test Account",le="0.5"} 1'),
+            lines.index('whatsapp_send_seconds_bucket{account="Test Account",le="+Inf"} 2'),
+        )
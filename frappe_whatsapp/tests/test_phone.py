@@ -0,0 +1,24 @@
+from frappe.tests.utils import FrappeTestCase
+from frappe_whatsapp.utils import format_number
+from frappe_whatsapp.utils.phone import is_valid_number, normalize_number, normalize_numbers
+
+
+class TestPhone(FrappeTestCase):
+    def test_formats_collapse_to_one_number(self):
+        for number in ("+62 812-3456-7890", "0062 812 3456 7890", "6281234567890", "0812 3456 7890"):
+            self.assertEqual(normalize_number(number, "62"), "6281234567890")
+
+        # Without a default country the trunk prefix is kept
+        self.assertEqual(normalize_number("0812 3456 7890"), "081234567890")
+        self.assertIsNone(normalize_number("n/a"))
+        self.assertEqual(normalize_number(919000000000.0), "919000000000")
+
+    def test_batch_keeps_order(self):
+        numbers = ["+1 555 0100", "0812 345", "+1 555 0100", None]
+        self.assertEqual(normalize_numbers(numbers, "62"), ["15550100", "62812345", "15550100", None])
+
+    def test_format_number_and_validation(self):
+        self.assertEqual(format_number("+91 90000 00000"), "919000000000")
+        self.assertTrue(is_valid_number("919000000000"))
+        self.assertFalse(is_valid_number("0812"))
+        self.assertFalse(is_valid_number("1234567890123456"))
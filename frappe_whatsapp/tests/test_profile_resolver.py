@@ -0,0 +1,28 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe_whatsapp.utils.profile_resolver import PROFILE_CACHE_KEY, clear_profile_cache, resolve_profile
+
+NUMBER = "15550109999"
+
+
+class TestProfileResolver(FrappeTestCase):
+    def tearDown(self):
+        frappe.db.delete("WhatsApp Profiles", {"number": NUMBER})
+        clear_profile_cache(NUMBER)
+
+    def test_upsert_creates_and_renames(self):
+        resolve_profile(NUMBER)
+        self.assertEqual(frappe.db.count("WhatsApp Profiles", {"number": NUMBER}), 1)
+        self.assertEqual(frappe.db.get_value("WhatsApp Profiles", {"number": NUMBER}, "title"), NUMBER)
+
+        resolve_profile(NUMBER, "Jane")
+        resolve_profile(NUMBER)
+        profile = frappe.db.get_value("WhatsApp Profiles", {"number": NUMBER}, ["profile_name", "title"], as_dict=True)
+        self.assertEqual(profile.profile_name, "Jane")
+        self.assertEqual(profile.title, f"Jane - {NUMBER}")
+        self.assertEqual(frappe.db.count("WhatsApp Profiles", {"number": NUMBER}), 1)
+
+    def test_cache_hit_skips_database(self):
+        frappe.cache.hset(PROFILE_CACHE_KEY, NUMBER, "Jane")
+        resolve_profile(NUMBER, "Jane")
+        self.assertFalse(frappe.db.exists("WhatsApp Profiles", {"number": NUMBER}))
@@ -0,0 +1,92 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.recipient_import import (
+    count_list_recipients,
+    import_recipients,
+    iter_list_recipients,
+    make_recipient,
+)
+
+
+class TestRecipientImport(FrappeTestCase):
+    def setUp(self):
+        if not frappe.db.exists("WhatsApp Recipient List", "Test Import List"):
+            frappe.get_doc({
+                "doctype": "WhatsApp Recipient List",
+                "list_name": "Test Import List",
+            }).insert(ignore_permissions=True)
+
+        make_test_account()
+
+    def tearDown(self):
+        frappe.delete_doc("WhatsApp Recipient List", "Test Import List", force=True)
+        frappe.db.set_value("WhatsApp Account", "Test Account", "default_country_code", None)
+
+    def test_make_recipient(self):
+        row = {"phone": "+1 (555) 010-0001", "full_name": "John", "City": "Pune"}
+
+        values = make_recipient("Test Import List", row, "phone", "full_name")
+        self.assertEqual(values[1], "+1 (555) 010-0001")
+        self.assertEqual(values[2], "John")
+        self.assertEqual(frappe.parse_json(values[3]), {"city": "Pune"})
+
+        self.assertIsNone(make_recipient("Test Import List", {"phone": "n/a"}, "phone"))
+
+    def test_csv_import_is_read_by_keyset(self):
+        content = "Mobile,Name,Order\n" + "".join(f"+91 90000 {i:05d},User {i},SO-{i}\n" for i in range(25))
+        file_doc = frappe.get_doc({
+            "doctype": "File",
+            "file_name": f"{frappe.generate_hash(length=10)}.csv",
+            "content": content,
+        }).insert(ignore_permissions=True)
+
+        count = import_recipients("Test Import List", mobile_field="Mobile", name_field="Name", file_url=file_doc.file_url)
+
+        self.assertEqual(count, 25)
+        self.assertEqual(count_list_recipients("Test Import List"), 25)
+        self.assertEqual(frappe.db.get_value("WhatsApp Recipient List", "Test Import List", "imported_recipients"), 25)
+
+        recipients = list(iter_list_recipients("Test Import List", chunk_size=10))
+        self.assertEqual(recipients[0].mobile_number, "919000000000")
+        self.assertEqual(frappe.parse_json(recipients[-1].recipient_data), {"order": "SO-24"})
+
+        file_doc.delete()
+
+    def test_reimport_replaces_previous_recipients(self):
+        def import_file(numbers):
+            file_doc = frappe.get_doc({
+                "doctype": "File",
+                "file_name": f"{frappe.generate_hash(length=10)}.csv",
+                "content": "Mobile\n" + "".join(f"{number}\n" for number in numbers),
+            }).insert(ignore_permissions=True)
+            count = import_recipients("Test Import List", mobile_field="Mobile", file_url=file_doc.file_url)
+            file_doc.delete()
+            return count
+
+        import_file(["+91 90000 00001", "+91 90000 00002"])
+        self.assertEqual(import_file(["+91 90000 00003"]), 1)
+
+        self.assertEqual(
+            [recipient.mobile_number for recipient in iter_list_recipients("Test Import List")],
+            ["919000000003"],
+        )
+
+    def test_import_uses_list_account_and_rejects_invalid_numbers(self):
+        frappe.db.set_value("WhatsApp Account", "Test Account", "default_country_code", "91")
+        frappe.db.set_value("WhatsApp Recipient List", "Test Import List", "whatsapp_account", "Test Account")
+        file_doc = frappe.get_doc({
+            "doctype": "File",
+            "file_name": f"{frappe.generate_hash(length=10)}.csv",
+            "content": "Mobile\n09000000001\n0812\n1234567890123456\n",
+        }).insert(ignore_permissions=True)
+
+        count = import_recipients("Test Import List", mobile_field="Mobile", file_url=file_doc.file_url)
+
+        self.assertEqual(count, 1)
+        self.assertEqual(
+            [recipient.mobile_number for recipient in iter_list_recipients("Test Import List")],
+            ["919000000001"],
+        )
+
+        file_doc.delete()
@@ -0,0 +1,59 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.dispatcher import (
+    ERROR_PERMANENT,
+    ERROR_THROTTLE,
+    ERROR_TRANSIENT,
+    MAX_RETRIES,
+    classify_error,
+    get_backoff_seconds,
+)
+from frappe_whatsapp.utils.retry_engine import claim_due_messages
+
+
+class TestRetryEngine(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+
+    def tearDown(self):
+        frappe.db.sql("DELETE FROM `tabWhatsApp Message` WHERE last_error = 'retry engine test'")
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error(429, {}), ERROR_THROTTLE)
+        self.assertEqual(classify_error(400, {"code": 130429}), ERROR_THROTTLE)
+        self.assertEqual(classify_error(400, {"code": 131026}), ERROR_PERMANENT)
+        self.assertEqual(classify_error(500, {"code": 131000}), ERROR_TRANSIENT)
+        self.assertEqual(classify_error(None, None), ERROR_TRANSIENT)
+
+    def test_backoff_is_jittered_and_bounded(self):
+        for attempt in range(MAX_RETRIES):
+            wait = get_backoff_seconds(ERROR_TRANSIENT, attempt)
+            self.assertTrue(0 < wait)
+
+        # First transient retry waits between 2.5 and 5 minutes
+        self.assertTrue(150 <= get_backoff_seconds(ERROR_TRANSIENT, 0) <= 300)
+        # Throttles come back sooner than transient errors
+        self.assertTrue(get_backoff_seconds(ERROR_THROTTLE, 0) <= 60)
+
+        self.assertIsNone(get_backoff_seconds(ERROR_PERMANENT, 0))
+        self.assertIsNone(get_backoff_seconds(ERROR_TRANSIENT, MAX_RETRIES))
+
+    def test_claimed_rows_are_not_claimed_twice(self):
+        doc = frappe.new_doc("WhatsApp Message")
+        doc.type = "Incoming"
+        doc.message = "retry claim"
+        doc.whatsapp_account = "Test Account"
+        doc.insert(ignore_permissions=True)
+        frappe.db.set_value("WhatsApp Message", doc.name, {
+            "status": "Retrying",
+            "next_retry_time": add_to_date(now_datetime(), minutes=-1),
+            "last_error": "retry engine test",
+        })
+
+        first = claim_due_messages(limit=1000)
+        second = claim_due_messages(limit=1000)
+
+        self.assertIn(doc.name, first)
+        self.assertNotIn(doc.name, second)
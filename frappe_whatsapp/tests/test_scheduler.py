@@ -1,7 +1,14 @@
 import frappe
 from frappe.tests.utils import FrappeTestCase
 from frappe.utils import add_to_date, now_datetime
-from frappe_whatsapp.utils.scheduler import process_scheduled_messages, schedule_message
+from frappe_whatsapp.utils.scheduler import (
+    add_to_schedule_queue,
+    claim_scheduled_messages,
+    pop_due_messages,
+    process_scheduled_messages,
+    remove_from_schedule_queue,
+    schedule_message,
+)
 
 
 class TestScheduler(FrappeTestCase):
@@ -56,4 +63,35 @@ class TestScheduler(FrappeTestCase):
         # In test environment without proper mock, doc.send() will fail.
         # So we expect it to remain Pending if it fails, or Sent if we mock properly.
         
-        pass 
+        pass
+
+    def test_delay_queue_pops_only_due_messages(self):
+        add_to_schedule_queue("test-due-msg", add_to_date(now_datetime(), seconds=-5))
+        add_to_schedule_queue("test-future-msg", add_to_date(now_datetime(), hours=1))
+
+        try:
+            due = pop_due_messages(limit=1000)
+            self.assertIn("test-due-msg", due)
+            self.assertNotIn("test-future-msg", due)
+
+            # A popped message belongs to the first poller only
+            self.assertNotIn("test-due-msg", pop_due_messages(limit=1000))
+        finally:
+            remove_from_schedule_queue("test-due-msg")
+            remove_from_schedule_queue("test-future-msg")
+
+    def test_claimed_message_is_not_claimed_again(self):
+        doc = frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": "Outgoing",
+            "to": "1234567890",
+            "message": "Due msg",
+            "is_scheduled": 1,
+            "scheduled_time": add_to_date(now_datetime(), minutes=-5),
+            "scheduling_status": "Pending",
+            "status": "Queued"
+        }).insert(ignore_permissions=True)
+
+        self.assertEqual(claim_scheduled_messages([doc.name]), [doc.name])
+        self.assertEqual(frappe.db.get_value("WhatsApp Message", doc.name, "scheduling_status"), "Sent")
+        self.assertEqual(claim_scheduled_messages([doc.name]), [])
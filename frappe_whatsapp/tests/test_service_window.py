@@ -0,0 +1,117 @@
+import time
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_conversation.whatsapp_conversation import (
+    get_conversation_name,
+)
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.dispatcher import ERROR_PERMANENT, classify_exception
+from frappe_whatsapp.utils.service_window import (
+    ServiceWindowClosed,
+    _get_key,
+    is_window_open,
+    record_inbound,
+)
+
+CONTACT = "15550108888"
+FALLBACK = "window_fallback-en"
+FALLBACK_WITH_PARAMS = "window_fallback_params-en"
+
+
+class TestServiceWindow(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+        frappe.cache.delete(_get_key("Test Account", CONTACT))
+
+    def tearDown(self):
+        frappe.cache.delete(_get_key("Test Account", CONTACT))
+        frappe.db.delete("WhatsApp Conversation", {"contact": CONTACT})
+        frappe.db.set_value(
+            "WhatsApp Account", "Test Account", {"enforce_service_window": 0, "service_window_template": None}
+        )
+        frappe.db.delete("WhatsApp Templates", {"name": ["in", [FALLBACK, FALLBACK_WITH_PARAMS]]})
+
+    def test_inbound_message_opens_window(self):
+        self.assertFalse(is_window_open("Test Account", CONTACT))
+
+        frappe.cache.delete(_get_key("Test Account", CONTACT))
+        record_inbound("Test Account", CONTACT, int(time.time()))
+        self.assertTrue(is_window_open("Test Account", CONTACT))
+
+    def test_expired_message_does_not_open_window(self):
+        record_inbound("Test Account", CONTACT, int(time.time()) - 25 * 60 * 60)
+        self.assertFalse(is_window_open("Test Account", CONTACT))
+
+    def test_falls_back_to_conversation(self):
+        frappe.get_doc({
+            "doctype": "WhatsApp Conversation",
+            "name": get_conversation_name("Test Account", CONTACT),
+            "whatsapp_account": "Test Account",
+            "contact": CONTACT,
+            "service_window_expires": add_to_date(now_datetime(), hours=2),
+        }).db_insert()
+
+        self.assertTrue(is_window_open("Test Account", CONTACT))
+
+    def test_closed_window_fails_fast(self):
+        frappe.db.set_value("WhatsApp Account", "Test Account", "enforce_service_window", 1)
+        doc = frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": "Outgoing",
+            "to": CONTACT,
+            "message": "hello",
+            "content_type": "text",
+            "whatsapp_account": "Test Account",
+        })
+
+        with self.assertRaises(ServiceWindowClosed) as context:
+            doc.get_send_payload()
+        self.assertEqual(classify_exception(context.exception), ERROR_PERMANENT)
+
+    def make_template(self, name, sample_values=None):
+        frappe.get_doc({
+            "doctype": "WhatsApp Templates",
+            "name": name,
+            "template_name": name.rsplit("-", 1)[0],
+            "actual_name": name.rsplit("-", 1)[0],
+            "language_code": "en",
+            "sample_values": sample_values,
+        }).db_insert()
+
+    def make_message(self):
+        return frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": "Outgoing",
+            "to": CONTACT,
+            "message": "hello",
+            "content_type": "text",
+            "whatsapp_account": "Test Account",
+        })
+
+    def test_closed_window_sends_fallback_without_changing_message(self):
+        self.make_template(FALLBACK)
+        frappe.db.set_value(
+            "WhatsApp Account", "Test Account", {"enforce_service_window": 1, "service_window_template": FALLBACK}
+        )
+        doc = self.make_message()
+
+        payload = doc.get_send_payload()
+
+        self.assertEqual(payload["type"], "template")
+        self.assertEqual(payload["template"]["name"], "window_fallback")
+        self.assertEqual(doc.service_window_fallback, FALLBACK)
+        self.assertNotEqual(doc.message_type, "Template")
+        self.assertFalse(doc.template)
+
+    def test_fallback_with_body_parameters_is_rejected(self):
+        self.make_template(FALLBACK_WITH_PARAMS, sample_values="Jane")
+        frappe.db.set_value(
+            "WhatsApp Account",
+            "Test Account",
+            {"enforce_service_window": 1, "service_window_template": FALLBACK_WITH_PARAMS},
+        )
+
+        with self.assertRaises(ServiceWindowClosed):
+            self.make_message().get_send_payload()
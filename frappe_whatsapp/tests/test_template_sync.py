@@ -0,0 +1,50 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils.template_sync import apply_template_page, parse_template
+
+
+TEMPLATE = {
+    "id": "template_sync_test_id",
+    "name": "template_sync_test",
+    "status": "APPROVED",
+    "language": "en",
+    "category": "UTILITY",
+    "components": [
+        {"type": "HEADER", "format": "TEXT", "text": "Order update"},
+        {"type": "BODY", "text": "Hi {{1}}", "example": {"body_text": [["John"]]}},
+        {"type": "BUTTONS", "buttons": [
+            {"type": "QUICK_REPLY", "text": "Stop"},
+            {"type": "URL", "text": "Track", "url": "https://example.com/{{1}}", "example": ["https://example.com/1"]},
+        ]},
+    ],
+}
+
+
+class TestTemplateSync(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+
+    def tearDown(self):
+        for name in frappe.get_all("WhatsApp Templates", {"id": TEMPLATE["id"]}, pluck="name"):
+            frappe.db.delete("WhatsApp Button", {"parent": name})
+            frappe.db.delete("WhatsApp Templates", {"name": name})
+
+    def test_parse_template(self):
+        values, buttons = parse_template(TEMPLATE)
+
+        self.assertEqual(values["header_type"], "TEXT")
+        self.assertEqual(values["sample_values"], "John")
+        self.assertEqual([b["button_type"] for b in buttons], ["Quick Reply", "Visit Website"])
+        self.assertEqual(buttons[1]["url_type"], "Dynamic")
+
+    def test_unchanged_templates_are_skipped(self):
+        self.assertEqual(apply_template_page("Test Account", [TEMPLATE])["inserted"], 1)
+        self.assertEqual(apply_template_page("Test Account", [TEMPLATE])["unchanged"], 1)
+
+        changed = dict(TEMPLATE, status="PAUSED")
+        self.assertEqual(apply_template_page("Test Account", [changed])["updated"], 1)
+
+        name = frappe.db.get_value("WhatsApp Templates", {"id": TEMPLATE["id"]})
+        self.assertEqual(frappe.db.get_value("WhatsApp Templates", name, "status"), "PAUSED")
+        self.assertEqual(frappe.db.count("WhatsApp Button", {"parent": name}), 2)
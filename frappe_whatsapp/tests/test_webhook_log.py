@@ -0,0 +1,45 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, now_datetime
+from frappe_whatsapp.utils.webhook_log import (
+    compress_payload,
+    decompress_payload,
+    insert_webhook_log,
+    purge_webhook_logs,
+)
+
+PAYLOAD = {"entry": [{"changes": [{"value": {"statuses": [{"id": "wamid.log-test"}]}}]}]}
+
+
+class TestWebhookLog(FrappeTestCase):
+    def tearDown(self):
+        settings = frappe.get_single("WhatsApp Settings")
+        settings.compress_webhook_logs = 0
+        settings.webhook_log_retention_days = 30
+        settings.save(ignore_permissions=True)
+
+    def test_compression_round_trip(self):
+        algorithm, blob = compress_payload('{"a": 1}')
+        self.assertEqual(decompress_payload(algorithm, blob), '{"a": 1}')
+
+    def test_compressed_log_replays_payload(self):
+        settings = frappe.get_single("WhatsApp Settings")
+        settings.compress_webhook_logs = 1
+        settings.save(ignore_permissions=True)
+
+        log = frappe.get_doc("WhatsApp Webhook Log", insert_webhook_log(PAYLOAD, {"X-Test": "1"}))
+
+        self.assertFalse(log.request_data)
+        self.assertTrue(log.compression)
+        self.assertEqual(log.get_request_data(), PAYLOAD)
+        self.assertEqual(log.get_headers(), {"X-Test": "1"})
+
+    def test_purge_removes_expired_logs(self):
+        old = insert_webhook_log(PAYLOAD)
+        recent = insert_webhook_log(PAYLOAD)
+        frappe.db.set_value("WhatsApp Webhook Log", old, "timestamp", add_days(now_datetime(), -31))
+
+        purge_webhook_logs()
+
+        self.assertFalse(frappe.db.exists("WhatsApp Webhook Log", old))
+        self.assertTrue(frappe.db.exists("WhatsApp Webhook Log", recent))
@@ -0,0 +1,84 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe_whatsapp.tests.utils import make_test_account
+from frappe_whatsapp.utils import message_dedupe
+from frappe_whatsapp.utils.webhook_log import insert_webhook_log
+from frappe_whatsapp.utils.webhook_replay import drop_messages, get_message_ids, replay_webhook_logs
+
+
+def make_payload(*message_ids):
+    return {
+        "entry": [{
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "metadata": {"phone_number_id": "123456789"},
+                    "contacts": [{"profile": {"name": "Replay Test"}}],
+                    "messages": [
+                        {"id": message_id, "from": "15550109999", "type": "text", "text": {"body": "hi"}}
+                        for message_id in message_ids
+                    ],
+                },
+            }],
+        }],
+    }
+
+
+class TestWebhookReplay(FrappeTestCase):
+    def setUp(self):
+        make_test_account()
+
+        self.logs = []
+
+    def tearDown(self):
+        # Replay commits, so the cleanup has to be committed too
+        frappe.db.delete("WhatsApp Message", {"message_id": ["like", "wamid.replay-%"]})
+        frappe.db.delete("WhatsApp Webhook Log", {"name": ["in", self.logs or [""]]})
+        frappe.db.commit()
+        for message_id in ("wamid.replay-1", "wamid.replay-2"):
+            frappe.cache.delete(message_dedupe._get_key("Test Account", message_id))
+
+    def insert_log(self, payload):
+        self.logs.append(insert_webhook_log(payload))
+
+    def test_drop_messages_keeps_payload_intact(self):
+        payload = make_payload("wamid.replay-1", "wamid.replay-2")
+        trimmed = drop_messages(payload, {"wamid.replay-1"})
+
+        self.assertEqual(get_message_ids(trimmed), ["wamid.replay-2"])
+        self.assertEqual(len(get_message_ids(payload)), 2)
+
+    def test_replay_creates_no_duplicates(self):
+        self.insert_log(make_payload("wamid.replay-1"))
+        self.insert_log(make_payload("wamid.replay-1", "wamid.replay-2"))
+
+        counts = replay_webhook_logs()
+
+        self.assertEqual(counts.duplicates, 1)
+        self.assertEqual(frappe.db.count("WhatsApp Message", {"message_id": "wamid.replay-1"}), 1)
+        self.assertEqual(frappe.db.count("WhatsApp Message", {"message_id": "wamid.replay-2"}), 1)
+
+    def test_replay_never_moves_status_backwards(self):
+        doc = frappe.get_doc({
+            "doctype": "WhatsApp Message",
+            "type": "Outgoing",
+            "to": "15550109999",
+            "message": "hello",
+            "content_type": "text",
+            "status": "read",
+            "message_id": "wamid.replay-status",
+            "whatsapp_account": "Test Account",
+        })
+        doc.db_insert()
+        self.insert_log({
+            "entry": [{
+                "changes": [{
+                    "field": "messages",
+                    "value": {"statuses": [{"id": "wamid.replay-status", "status": "delivered"}]},
+                }],
+            }],
+        })
+
+        replay_webhook_logs()
+
+        self.assertEqual(frappe.db.get_value("WhatsApp Message", doc.name, "status"), "read")
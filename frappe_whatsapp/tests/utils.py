@@ -0,0 +1,19 @@
+import frappe
+
+TEST_ACCOUNT = "Test Account"
+
+
+def make_test_account():
+    """Create the WhatsApp Account the tests send from, once per site."""
+    if not frappe.db.exists("WhatsApp Account", TEST_ACCOUNT):
+        frappe.get_doc({
+            "doctype": "WhatsApp Account",
+            "account_name": TEST_ACCOUNT,
+            "url": "https://graph.facebook.com",
+            "version": "v18.0",
+            "phone_id": "123456789",
+            "business_id": "987654321",
+            "token": "test_token"
+        }).insert(ignore_permissions=True)
+
+    return TEST_ACCOUNT
@@ -135,33 +135,15 @@ def get_whatsapp_account(phone_id=None, account_type='incoming'):
 
     return None
 
-def format_number(number):
-    """Format number."""
-    if number.startswith("+"):
-        number = number[1 : len(number)]
+def format_number(number, default_country_code=None):
+    """Format number as E.164 digits, see `phone.normalize_number`."""
+    from frappe_whatsapp.utils.phone import normalize_number
 
-    return number
+    return normalize_number(number, default_country_code) or ""
 
 
 def process_retries():
     """Find and retry failed WhatsApp messages that are due."""
-    from frappe.utils import now_datetime
-    
-    # Find messages with status 'Retrying' and next_retry_time <= now
-    messages_to_retry = frappe.get_all(
-        "WhatsApp Message",
-        filters={
-            "status": "Retrying",
-            "next_retry_time": ["<=", now_datetime()]
-        },
-        fields=["name"]
-    )
+    from frappe_whatsapp.utils.retry_engine import process_retries as run_retry_engine
 
-    for msg in messages_to_retry:
-        try:
-            doc = frappe.get_doc("WhatsApp Message", msg.name)
-            doc.send()
-            doc.save(ignore_permissions=True)
-            frappe.db.commit()
-        except Exception as e:
-            frappe.log_error(f"Retry failed for {msg.name}: {str(e)}", "WhatsApp Retry Error")
\ No newline at end of file
+    run_retry_engine()
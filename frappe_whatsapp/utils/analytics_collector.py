@@ -1,15 +1,34 @@
 """Analytics collector for WhatsApp messages and sessions."""
+import math
+from contextlib import nullcontext
+
 import frappe
-from frappe.utils import today, add_days, now_datetime, get_datetime
+from frappe.utils import today, add_days, cint, get_datetime
+
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_hourly_analytics.whatsapp_hourly_analytics import (
+    get_hourly_analytics_name,
+)
+from frappe_whatsapp.utils import get_whatsapp_account
+from frappe_whatsapp.utils.analytics_rollup import flush_rollups, track_event, upsert_counters
+
+# Responses slower than an hour are not counted
+MAX_RESPONSE_SECONDS = 3600
+# Prune unanswered messages once this many contacts are waiting
+PRUNE_THRESHOLD = 10000
 
 
 def aggregate_daily_analytics():
     """
-    Scheduled job to aggregate daily analytics.
-    Should run once per day (e.g., at midnight or early morning).
+    Scheduled job to reconcile yesterday's analytics.
+    Counters are kept up to date during the day by the analytics rollup;
+    this pass recounts them once from the table and adds the metrics that
+    are only computed daily (sessions, response time).
     """
     yesterday = add_days(today(), -1)
-    
+
+    # Flush first, so pending increments are not added on top of the recount
+    flush_rollups()
+
     # Get all active WhatsApp accounts
     accounts = frappe.get_all(
         "WhatsApp Account",
@@ -27,34 +46,40 @@ def aggregate_daily_analytics():
 
 
 def aggregate_for_account(account_name, date):
-    """Aggregate analytics for a specific account and date."""
-    
-    # Check if already aggregated
-    existing = frappe.db.exists("WhatsApp Analytics", {"date": date, "whatsapp_account": account_name})
-    if existing:
-        return  # Already done
-
+    """Reconcile analytics for a specific account and date."""
     start_datetime = get_datetime(f"{date} 00:00:00")
     end_datetime = get_datetime(f"{date} 23:59:59")
 
-    # Message counts
-    messages_sent = frappe.db.count("WhatsApp Message", {
-        "whatsapp_account": account_name,
-        "type": "Outgoing",
-        "creation": ["between", [start_datetime, end_datetime]]
-    })
-
-    messages_received = frappe.db.count("WhatsApp Message", {
-        "whatsapp_account": account_name,
-        "type": "Incoming",
-        "creation": ["between", [start_datetime, end_datetime]]
-    })
-
-    messages_failed = frappe.db.count("WhatsApp Message", {
-        "whatsapp_account": account_name,
-        "status": "failed",
-        "creation": ["between", [start_datetime, end_datetime]]
-    })
+    # Message counts per hour, in a single indexed scan
+    hourly_counts = frappe.db.sql("""
+        SELECT
+            HOUR(creation) AS hour,
+            SUM(type = 'Outgoing') AS messages_sent,
+            SUM(type = 'Incoming') AS messages_received,
+            SUM(status = 'failed') AS messages_failed
+        FROM `tabWhatsApp Message`
+        WHERE whatsapp_account = %s
+            AND creation BETWEEN %s AND %s
+        GROUP BY HOUR(creation)
+    """, (account_name, start_datetime, end_datetime), as_dict=True)
+
+    messages_sent = messages_received = messages_failed = 0
+    for row in hourly_counts:
+        counts = {
+            "messages_sent": row.messages_sent,
+            "messages_received": row.messages_received,
+            "messages_failed": row.messages_failed,
+        }
+        upsert_counters(
+            "WhatsApp Hourly Analytics",
+            get_hourly_analytics_name(date, row.hour, account_name),
+            {"date": date, "hour": row.hour, "whatsapp_account": account_name},
+            counts,
+            increment=False,
+        )
+        messages_sent += cint(row.messages_sent)
+        messages_received += cint(row.messages_received)
+        messages_failed += cint(row.messages_failed)
 
     # Session counts (if chatbot module is installed)
     sessions_started = 0
@@ -89,26 +114,34 @@ def aggregate_for_account(account_name, date):
     except Exception:
         pass  # Chatbot module might not be installed
 
-    # Calculate average response time (simplified)
-    avg_response_time = calculate_avg_response_time(account_name, start_datetime, end_datetime)
-
-    # Create analytics record
-    analytics = frappe.new_doc("WhatsApp Analytics")
-    analytics.date = date
-    analytics.whatsapp_account = account_name
-    analytics.messages_sent = messages_sent
-    analytics.messages_received = messages_received
-    analytics.messages_failed = messages_failed
-    analytics.avg_response_time_seconds = avg_response_time
-    analytics.sessions_started = sessions_started
-    analytics.sessions_completed = sessions_completed
-    analytics.sessions_transferred = sessions_transferred
-    analytics.sessions_timeout = sessions_timeout
-    analytics.ai_responses = 0  # Will be tracked separately
-    analytics.kb_matches = 0
-    analytics.ai_cache_hits = 0
-    analytics.ai_errors = 0
-    analytics.insert(ignore_permissions=True)
+    response_times = calculate_response_time_stats(account_name, start_datetime, end_datetime)
+
+    upsert_counters(
+        "WhatsApp Analytics",
+        f"{date}-{account_name}",
+        {"date": date, "whatsapp_account": account_name},
+        {
+            "messages_sent": messages_sent,
+            "messages_received": messages_received,
+            "messages_failed": messages_failed,
+            "sessions_started": sessions_started,
+            "sessions_completed": sessions_completed,
+            "sessions_transferred": sessions_transferred,
+            "sessions_timeout": sessions_timeout,
+        },
+        increment=False,
+    )
+    frappe.db.set_value(
+        "WhatsApp Analytics",
+        f"{date}-{account_name}",
+        {
+            "avg_response_time_seconds": response_times["avg"],
+            "response_time_p50_seconds": response_times["p50"],
+            "response_time_p90_seconds": response_times["p90"],
+            "response_time_p99_seconds": response_times["p99"],
+        },
+        update_modified=False,
+    )
 
 
 def calculate_avg_response_time(account_name, start_dt, end_dt):
@@ -116,38 +149,110 @@ def calculate_avg_response_time(account_name, start_dt, end_dt):
     Calculate average response time for the period.
     Simplified: time between incoming message and next outgoing message.
     """
+    return calculate_response_time_stats(account_name, start_dt, end_dt)["avg"]
+
+
+def calculate_response_time_stats(account_name, start_dt, end_dt):
+    """
+    Response time statistics for the period.
+
+    Messages are streamed once in creation order and matched per contact:
+    every incoming message is answered by the next outgoing message to the
+    same contact. Memory is bounded by the unanswered messages of the last
+    hour plus a one-second histogram of response times.
+
+    Returns:
+        dict with avg, p50, p90, p99 (seconds) and count
+    """
+    histogram = [0] * MAX_RESPONSE_SECONDS
+    # contact -> creation times of incoming messages not answered yet
+    unanswered = {}
+
+    # Frappe 14 has no unbuffered cursor, the rows are then fetched at once
+    if hasattr(frappe.db, "unbuffered_cursor"):
+        cursor, sql_options = frappe.db.unbuffered_cursor(), {"as_iterator": True}
+    else:
+        cursor, sql_options = nullcontext(), {}
+
     try:
-        # Get pairs of incoming -> outgoing messages
-        messages = frappe.db.sql("""
-            SELECT type, creation, `from`, `to`
-            FROM `tabWhatsApp Message`
-            WHERE whatsapp_account = %s
-            AND creation BETWEEN %s AND %s
-            ORDER BY creation
-        """, (account_name, start_dt, end_dt), as_dict=True)
-
-        if len(messages) < 2:
-            return 0
-
-        response_times = []
-        for i, msg in enumerate(messages):
-            if msg.type == "Incoming":
-                # Find next outgoing message to same contact
-                for j in range(i + 1, min(i + 10, len(messages))):
-                    next_msg = messages[j]
-                    if next_msg.type == "Outgoing" and next_msg.get("to") == msg.get("from"):
-                        delta = (next_msg.creation - msg.creation).total_seconds()
-                        if delta > 0 and delta < 3600:  # Max 1 hour
-                            response_times.append(delta)
-                        break
-
-        if response_times:
-            return sum(response_times) / len(response_times)
+        with cursor:
+            rows = frappe.db.sql("""
+                SELECT type, creation, contact
+                FROM `tabWhatsApp Message`
+                WHERE whatsapp_account = %s
+                AND creation BETWEEN %s AND %s
+                ORDER BY creation
+            """, (account_name, start_dt, end_dt), **sql_options)
+
+            for message_type, creation, contact in rows:
+                if not contact:
+                    continue
+
+                if message_type == "Incoming":
+                    unanswered.setdefault(contact, []).append(creation)
+                    continue
+
+                pending = unanswered.pop(contact, None)
+                for received_at in pending or []:
+                    delta = int((creation - received_at).total_seconds())
+                    if 0 < delta < MAX_RESPONSE_SECONDS:
+                        histogram[delta] += 1
+
+                if len(unanswered) > PRUNE_THRESHOLD:
+                    prune_unanswered(unanswered, creation)
 
     except Exception as e:
         frappe.log_error(f"Response time calculation error: {e}", "WhatsApp Analytics")
 
-    return 0
+    count = sum(histogram)
+    p50, p90, p99 = percentiles_from_histogram(histogram, (50, 90, 99))
+
+    return {
+        "avg": sum(seconds * n for seconds, n in enumerate(histogram)) / count if count else 0,
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+        "count": count,
+    }
+
+
+def prune_unanswered(unanswered, now):
+    """Drop incoming messages that can no longer get a counted response."""
+    for contact in list(unanswered):
+        recent = [t for t in unanswered[contact] if (now - t).total_seconds() < MAX_RESPONSE_SECONDS]
+        if recent:
+            unanswered[contact] = recent
+        else:
+            del unanswered[contact]
+
+
+def percentiles_from_histogram(histogram, percentiles):
+    """
+    Nearest-rank percentiles from a histogram.
+
+    Args:
+        histogram: list where histogram[value] is the number of samples
+        percentiles: iterable of percentiles (0-100)
+
+    Returns:
+        list of values, 0 for an empty histogram
+    """
+    count = sum(histogram)
+    if not count:
+        return [0 for _ in percentiles]
+
+    ranks = [max(1, math.ceil(p / 100 * count)) for p in percentiles]
+    results = [None] * len(ranks)
+    seen = 0
+    for value, n in enumerate(histogram):
+        seen += n
+        for i, rank in enumerate(ranks):
+            if results[i] is None and seen >= rank:
+                results[i] = value
+        if all(r is not None for r in results):
+            break
+
+    return results
 
 
 def increment_counter(counter_name, account_name=None, date=None):
@@ -155,24 +260,9 @@ def increment_counter(counter_name, account_name=None, date=None):
     Utility to increment a specific counter in real-time.
     Used by other modules to track events.
     """
-    date = date or today()
-    
-    # Get or create today's analytics record
-    filters = {"date": date}
-    if account_name:
-        filters["whatsapp_account"] = account_name
-    
-    existing = frappe.db.get_value("WhatsApp Analytics", filters, "name")
-    
-    if existing:
-        current = frappe.db.get_value("WhatsApp Analytics", existing, counter_name) or 0
-        frappe.db.set_value("WhatsApp Analytics", existing, counter_name, current + 1)
-    else:
-        # Create a new record for today
-        analytics = frappe.new_doc("WhatsApp Analytics")
-        analytics.date = date
-        analytics.whatsapp_account = account_name
-        setattr(analytics, counter_name, 1)
-        analytics.insert(ignore_permissions=True)
-    
-    frappe.db.commit()
+    if not account_name:
+        account = get_whatsapp_account(account_type="outgoing")
+        account_name = account.name if account else None
+
+    # Counted in Redis and upserted by the periodic rollup flush
+    track_event(counter_name, account_name, at=date, hourly=not date)
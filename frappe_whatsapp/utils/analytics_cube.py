@@ -0,0 +1,258 @@
+"""Pre-aggregated delivery analytics per (account, template, campaign, hour)."""
+import json
+from datetime import datetime
+
+import frappe
+from frappe.utils import cint, convert_utc_to_system_timezone, get_datetime, getdate, now_datetime
+
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_analytics_cube.whatsapp_analytics_cube import (
+    get_cube_name,
+)
+from frappe_whatsapp.utils import latency_sketch
+from frappe_whatsapp.utils.analytics_rollup import flush_dirty_counters, upsert_counters
+
+CUBE_KEY_PREFIX = "whatsapp_analytics_cube"
+DIRTY_SET_KEY = "whatsapp_analytics_cube_dirty"
+# A message counts as replied once, however many replies it gets
+REPLIED_KEY_TTL = 7 * 24 * 60 * 60
+
+STATUS_METRICS = {
+    "delivered": "messages_delivered",
+    "read": "messages_read",
+    "failed": "messages_failed",
+}
+# Status metrics that also record send-to-status latency
+LATENCY_SKETCHES = {
+    "messages_delivered": "delivery_latency_sketch",
+    "messages_read": "read_latency_sketch",
+}
+CUBE_FIELDS = ("date", "hour", "whatsapp_account", "template", "campaign")
+
+
+def track_message_sent(doc):
+    """Count an outgoing message in its cube cell."""
+    track_cube_event(doc, "messages_sent")
+
+
+def track_status_change(doc, status, at=None):
+    """
+    Count a status webhook for an outgoing message.
+
+    Args:
+        doc: WhatsApp Message, before the new status is saved
+        status: Status reported by Meta
+        at: Unix timestamp of the status, default now
+    """
+    metric = STATUS_METRICS.get(status)
+    if not metric or doc.type != "Outgoing" or doc.status == status:
+        return
+
+    latency = None
+    if metric in LATENCY_SKETCHES:
+        latency = (_status_time(at) - get_send_time(doc)).total_seconds()
+
+    track_cube_event(doc, metric, latency=latency)
+
+
+def track_reply(doc):
+    """Count the message an incoming reply answers as replied."""
+    if not doc.reply_to_message_id:
+        return
+
+    original = frappe.db.get_value(
+        "WhatsApp Message",
+        {"message_id": doc.reply_to_message_id, "type": "Outgoing"},
+        ["name", "whatsapp_account", "template", "bulk_message_reference",
+         "creation", "is_scheduled", "scheduled_time"],
+        as_dict=True
+    )
+    if not original:
+        return
+
+    try:
+        key = frappe.cache.make_key(f"{CUBE_KEY_PREFIX}:replied:{original.name}")
+        if not frappe.cache.set(key, 1, nx=True, ex=REPLIED_KEY_TTL):
+            return
+    except Exception:
+        return
+
+    track_cube_event(original, "messages_replied")
+
+
+def track_cube_event(doc, metric, latency=None):
+    """
+    Bump a cube counter in Redis, and the latency sketch bucket if given.
+
+    Cells are keyed by the hour the message was sent in, so later status
+    updates land next to the send they belong to.
+    """
+    if not doc.whatsapp_account:
+        return
+
+    sent_at = get_send_time(doc)
+    member = json.dumps([
+        doc.whatsapp_account,
+        str(sent_at.date()),
+        sent_at.hour,
+        doc.template or "",
+        doc.bulk_message_reference or "",
+    ])
+
+    try:
+        pipe = frappe.cache.pipeline()
+        key = _cube_key(member)
+        pipe.hincrby(key, metric, 1)
+        if latency is not None and metric in LATENCY_SKETCHES:
+            bucket = latency_sketch.bucket_index(max(latency, 0))
+            pipe.hincrby(key, f"{LATENCY_SKETCHES[metric]}:{bucket}", 1)
+        pipe.sadd(frappe.cache.make_key(DIRTY_SET_KEY), member)
+        pipe.execute()
+    except Exception:
+        # Analytics must never break sending or webhook processing
+        pass
+
+
+def flush_cube():
+    """Scheduled job to merge pending Redis cube counters into WhatsApp Analytics Cube."""
+    flush_dirty_counters(
+        DIRTY_SET_KEY,
+        _cube_key,
+        lambda member, counters: apply_cube_counters(json.loads(member), counters),
+        "Analytics cube flush",
+    )
+
+
+def apply_cube_counters(cell, counters):
+    """Add flushed counters and sketch buckets onto a cube row."""
+    whatsapp_account, date, hour, template, campaign = cell
+    name = get_cube_name(date, hour, whatsapp_account, template, campaign)
+
+    values = {}
+    sketches = {}
+    for field, value in counters.items():
+        if ":" in field:
+            sketch_field, bucket = field.split(":", 1)
+            sketches.setdefault(sketch_field, {})[int(bucket)] = value
+        else:
+            values[field] = value
+
+    keys = {
+        "date": date,
+        "hour": hour,
+        "whatsapp_account": whatsapp_account,
+        "template": template or None,
+        "campaign": campaign or None,
+    }
+    # Make sure the row exists before merging sketches into it
+    upsert_counters("WhatsApp Analytics Cube", name, keys, values or {"messages_sent": 0})
+
+    if not sketches:
+        return
+
+    stored = frappe.db.sql(f"""
+        SELECT {", ".join(f"`{field}`" for field in sketches)}
+        FROM `tabWhatsApp Analytics Cube`
+        WHERE name = %s
+        FOR UPDATE
+    """, name, as_dict=True)[0]
+
+    frappe.db.set_value(
+        "WhatsApp Analytics Cube",
+        name,
+        {
+            field: latency_sketch.dumps(latency_sketch.merge(latency_sketch.loads(stored[field]), buckets))
+            for field, buckets in sketches.items()
+        },
+        update_modified=False,
+    )
+
+
+def get_send_time(doc):
+    """When an outgoing message went out (scheduled messages leave at their slot)."""
+    if doc.get("is_scheduled") and doc.get("scheduled_time"):
+        return get_datetime(doc.scheduled_time)
+    return get_datetime(doc.creation) if doc.creation else now_datetime()
+
+
+@frappe.whitelist()
+def get_cube_metrics(from_date, to_date, group_by="date", whatsapp_account=None, template=None, campaign=None):
+    """
+    Aggregated counters from the analytics cube.
+
+    Args:
+        from_date, to_date: Date range (inclusive)
+        group_by: Comma separated cube dimensions, e.g. "date,template"
+        whatsapp_account, template, campaign: Optional filters
+
+    Returns:
+        list of dicts with the dimensions and summed counters
+    """
+    dimensions = [d.strip() for d in (group_by or "").split(",") if d.strip()]
+    for dimension in dimensions:
+        if dimension not in CUBE_FIELDS:
+            frappe.throw(f"Cannot group analytics by {dimension}")
+
+    counters = ["messages_sent", "messages_delivered", "messages_read", "messages_failed", "messages_replied"]
+
+    return frappe.get_all(
+        "WhatsApp Analytics Cube",
+        filters=_cube_filters(from_date, to_date, whatsapp_account, template, campaign),
+        fields=dimensions + [f"sum({field}) as {field}" for field in counters],
+        group_by=", ".join(dimensions) or None,
+        order_by=", ".join(dimensions) or None,
+    )
+
+
+@frappe.whitelist()
+def get_latency_percentiles(from_date, to_date, whatsapp_account=None, template=None, campaign=None):
+    """
+    Send-to-delivered and send-to-read latency percentiles (seconds).
+
+    Merges the stored sketches of all matching cube rows, so no message
+    rows are scanned.
+    """
+    rows = frappe.get_all(
+        "WhatsApp Analytics Cube",
+        filters=_cube_filters(from_date, to_date, whatsapp_account, template, campaign),
+        fields=list(LATENCY_SKETCHES.values()),
+    )
+
+    result = {}
+    for metric, field in LATENCY_SKETCHES.items():
+        sketch = latency_sketch.new_sketch()
+        for row in rows:
+            latency_sketch.merge(sketch, latency_sketch.loads(row.get(field)))
+
+        result[field.replace("_sketch", "")] = {
+            "count": latency_sketch.count(sketch),
+            "p50": latency_sketch.quantile(sketch, 0.5),
+            "p90": latency_sketch.quantile(sketch, 0.9),
+            "p99": latency_sketch.quantile(sketch, 0.99),
+        }
+
+    return result
+
+
+def _cube_filters(from_date, to_date, whatsapp_account=None, template=None, campaign=None):
+    filters = {"date": ["between", [getdate(from_date), getdate(to_date)]]}
+    if whatsapp_account:
+        filters["whatsapp_account"] = whatsapp_account
+    if template:
+        filters["template"] = template
+    if campaign:
+        filters["campaign"] = campaign
+    return filters
+
+
+def _status_time(timestamp):
+    if not timestamp:
+        return now_datetime()
+    try:
+        utc = datetime.utcfromtimestamp(cint(timestamp))
+        return convert_utc_to_system_timezone(utc).replace(tzinfo=None)
+    except Exception:
+        return now_datetime()
+
+
+def _cube_key(member):
+    return frappe.cache.make_key(f"{CUBE_KEY_PREFIX}:{member}")
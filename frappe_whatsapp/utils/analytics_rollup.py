@@ -0,0 +1,221 @@
+"""Streaming analytics rollups backed by Redis counters."""
+import frappe
+from frappe.utils import cint, get_datetime, getdate, now, now_datetime, today
+
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_hourly_analytics.whatsapp_hourly_analytics import (
+    get_hourly_analytics_name,
+)
+
+ROLLUP_KEY_PREFIX = "whatsapp_analytics_rollup"
+DIRTY_SET_KEY = "whatsapp_analytics_rollup_dirty"
+
+
+def track_event(metric, whatsapp_account, count=1, at=None, hourly=True):
+    """
+    Bump a rollup counter for an account.
+
+    Counters live in one Redis hash per (account, day): `metric` holds the
+    daily total and `metric@HH` the hourly one. `flush_rollups` moves them
+    into WhatsApp Analytics / WhatsApp Hourly Analytics.
+
+    Args:
+        metric: Int field of WhatsApp Analytics, e.g. "messages_sent"
+        whatsapp_account: WhatsApp Account name
+        count: Amount to add
+        at: Datetime the event is attributed to (default now)
+        hourly: Also bump the hourly counter
+    """
+    if not whatsapp_account:
+        return
+
+    at = get_datetime(at) if at else now_datetime()
+    member = f"{whatsapp_account}|{at.date()}"
+    key = _rollup_key(member)
+
+    try:
+        pipe = frappe.cache.pipeline()
+        pipe.hincrby(key, metric, count)
+        if hourly:
+            pipe.hincrby(key, f"{metric}@{at.hour:02d}", count)
+        pipe.sadd(frappe.cache.make_key(DIRTY_SET_KEY), member)
+        pipe.execute()
+    except Exception:
+        # Never fail the hot path on analytics, the daily reconciliation
+        # recomputes the message counters anyway
+        pass
+
+
+def flush_rollups():
+    """Scheduled job to upsert pending Redis counters into the analytics tables."""
+    flush_dirty_counters(DIRTY_SET_KEY, _rollup_key, _apply_member_counters, "Analytics flush")
+
+
+def _apply_member_counters(member, counters):
+    whatsapp_account, date = member.rsplit("|", 1)
+    apply_counters(whatsapp_account, date, counters)
+
+
+def flush_dirty_counters(dirty_set_key, get_key, apply, label):
+    """
+    Move the Redis counter hashes of all dirty members into the database.
+
+    Each hash is renamed aside before it is read, so increments made during
+    the flush land in a fresh key. Members are committed one at a time; if
+    `apply` fails, the counters are added back to the live key and the
+    member stays dirty for the next run.
+
+    Args:
+        dirty_set_key: Redis set of members with pending counters
+        get_key: Returns the counter hash key of a member
+        apply: Writes the counters of a member, called as apply(member, counters)
+        label: Prefix of the error log message
+    """
+    dirty_key = frappe.cache.make_key(dirty_set_key)
+
+    for member in frappe.cache.smembers(dirty_key):
+        member = frappe.safe_decode(member)
+        # Remove before renaming, so increments landing after the rename
+        # mark the member dirty again
+        frappe.cache.srem(dirty_key, member)
+
+        key = get_key(member)
+        flushing_key = f"{key}:flushing:{frappe.generate_hash(length=8)}"
+        try:
+            frappe.cache.rename(key, flushing_key)
+        except Exception:
+            # Nothing left to flush
+            continue
+
+        counters = {
+            frappe.safe_decode(field): cint(value)
+            for field, value in frappe.cache.hgetall(flushing_key).items()
+        }
+
+        try:
+            apply(member, counters)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"{label} failed for {member}: {e}", "WhatsApp Analytics")
+            _restore_counters(dirty_key, member, key, counters)
+
+        frappe.cache.delete(flushing_key)
+
+
+def _restore_counters(dirty_key, member, key, counters):
+    """Merge counters that could not be flushed back into the live key."""
+    pipe = frappe.cache.pipeline()
+    for field, value in counters.items():
+        pipe.hincrby(key, field, value)
+    pipe.sadd(dirty_key, member)
+    pipe.execute()
+
+
+def apply_counters(whatsapp_account, date, counters):
+    """Add flushed counters onto the daily and hourly rows."""
+    daily = {}
+    hourly = {}
+    for field, value in counters.items():
+        if "@" in field:
+            metric, hour = field.split("@", 1)
+            hourly.setdefault(cint(hour), {})[metric] = value
+        else:
+            daily[field] = value
+
+    if daily:
+        upsert_counters(
+            "WhatsApp Analytics",
+            f"{date}-{whatsapp_account}",
+            {"date": date, "whatsapp_account": whatsapp_account},
+            daily,
+        )
+
+    for hour, values in hourly.items():
+        upsert_counters(
+            "WhatsApp Hourly Analytics",
+            get_hourly_analytics_name(date, hour, whatsapp_account),
+            {"date": date, "hour": hour, "whatsapp_account": whatsapp_account},
+            values,
+        )
+
+
+def upsert_counters(doctype, name, keys, values, increment=True):
+    """
+    Insert a counter row or update it in place with one statement.
+
+    Args:
+        doctype: Analytics DocType
+        name: Row name
+        keys: Identifying fields, only written on insert
+        values: {int_field: value}; unknown fields are ignored
+        increment: Add to the stored values instead of replacing them
+    """
+    int_fields = {df.fieldname for df in frappe.get_meta(doctype).fields if df.fieldtype == "Int"}
+    values = {field: cint(value) for field, value in values.items() if field in int_fields}
+    if not values:
+        return
+
+    timestamp = now()
+    row = {
+        "name": name,
+        "creation": timestamp,
+        "modified": timestamp,
+        "owner": "Administrator",
+        "modified_by": "Administrator",
+        **keys,
+        **values,
+    }
+
+    columns = ", ".join(f"`{column}`" for column in row)
+    placeholders = ", ".join(f"%({column})s" for column in row)
+    if increment:
+        updates = [f"`{field}` = `{field}` + VALUES(`{field}`)" for field in values]
+    else:
+        updates = [f"`{field}` = VALUES(`{field}`)" for field in values]
+    updates.append("`modified` = VALUES(`modified`)")
+
+    frappe.db.sql(f"""
+        INSERT INTO `tab{doctype}` ({columns})
+        VALUES ({placeholders})
+        ON DUPLICATE KEY UPDATE {", ".join(updates)}
+    """, row)
+
+
+def get_pending_counters(whatsapp_account, date):
+    """Counters bumped in Redis but not flushed yet."""
+    key = _rollup_key(f"{whatsapp_account}|{getdate(date)}")
+    return {
+        frappe.safe_decode(field): cint(value)
+        for field, value in frappe.cache.hgetall(key).items()
+    }
+
+
+@frappe.whitelist()
+def get_hourly_analytics(whatsapp_account, date=None):
+    """Per-hour message counters for a day, including unflushed events."""
+    date = getdate(date or today())
+
+    rows = frappe.get_all(
+        "WhatsApp Hourly Analytics",
+        filters={"whatsapp_account": whatsapp_account, "date": date},
+        fields=["hour", "messages_sent", "messages_received", "messages_failed"]
+    )
+    hours = {
+        hour: {"hour": hour, "messages_sent": 0, "messages_received": 0, "messages_failed": 0}
+        for hour in range(24)
+    }
+    for row in rows:
+        hours[cint(row.hour)].update(row)
+
+    for field, value in get_pending_counters(whatsapp_account, date).items():
+        if "@" not in field:
+            continue
+        metric, hour = field.split("@", 1)
+        if metric in hours[cint(hour)]:
+            hours[cint(hour)][metric] += value
+
+    return list(hours.values())
+
+
+def _rollup_key(member):
+    return frappe.cache.make_key(f"{ROLLUP_KEY_PREFIX}:{member}")
@@ -2,6 +2,8 @@ import json
 import frappe
 from frappe.utils import cint
 
+from frappe_whatsapp.utils import recipient_import
+
 
 @frappe.whitelist()
 def get_progress(name):
@@ -24,12 +26,12 @@ def import_recipients(list_name, doctype, mobile_field, name_field=None, filters
 
     if data_fields and isinstance(data_fields, str):
         data_fields = json.loads(data_fields)
-        
-    doc = frappe.get_doc("WhatsApp Recipient List", list_name)
-    count = doc.import_list_from_doctype(doctype, mobile_field, name_field, filters, limit, data_fields)
-    doc.save()
-    
-    return count
+
+    frappe.has_permission("WhatsApp Recipient List", "write", list_name, throw=True)
+    # Large lists should go through recipient_import.enqueue_recipient_import
+    return recipient_import.import_recipients(
+        list_name, doctype, mobile_field, name_field, filters, cint(limit) or None, data_fields
+    )
 
 @frappe.whitelist()
 def schedule_bulk_messages():
@@ -2,7 +2,11 @@
 import frappe
 from frappe.utils import now_datetime, get_datetime
 
+from frappe_whatsapp.utils.metrics import timed
+from frappe_whatsapp.utils.phone import get_default_country_code, is_valid_number, normalize_numbers
 
+
+@timed("whatsapp_job_seconds", job="process_campaigns")
 def process_campaigns():
     """
     Scheduled job to process active campaigns.
@@ -82,12 +86,25 @@ def populate_recipients(doc):
                 wct.tags IN %s
         """, (target_tags,), as_dict=1)
     
+    # Normalise all numbers in one pass so duplicates written differently collapse
+    if recipients:
+        numbers = normalize_numbers(
+            [r.mobile_no for r in recipients], get_default_country_code(doc.whatsapp_account)
+        )
+        unique = {}
+        for recipient, number in zip(recipients, numbers):
+            if is_valid_number(number) and number not in unique:
+                recipient.mobile_no = number
+                unique[number] = recipient
+        recipients = list(unique.values())
+
     # Batch add child table rows for better performance
     if recipients:
         doc.set("recipients", [])
         doc.extend("recipients", recipients)
 
 
+@timed("whatsapp_campaign_batch_seconds")
 def process_campaign_batch(campaign_name, batch_size=20):
     """Send a batch of messages for a running campaign."""
     try:
@@ -0,0 +1,192 @@
+"""Conversations per (account, contact) and keyset-paginated threads."""
+import frappe
+from frappe.utils import add_to_date, cint, get_datetime
+
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_conversation.whatsapp_conversation import (
+    get_conversation_name,
+)
+from frappe_whatsapp.utils import format_number
+from frappe_whatsapp.utils.message_archive import get_archived_messages
+from frappe_whatsapp.utils.phone import get_default_country_code
+
+# Free-form messages are allowed this long after the contact's last message
+SERVICE_WINDOW_HOURS = 24
+EXCERPT_LENGTH = 140
+THREAD_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+THREAD_FIELDS = (
+    "name", "type", "status", "from", "to", "profile_name", "message", "content_type",
+    "attach", "thumbnail", "message_id", "is_reply", "reply_to_message_id", "creation",
+)
+
+
+def update_conversation(message):
+    """
+    Fold a newly inserted message into its conversation with one upsert.
+
+    Incoming messages bump the unread count and extend the customer
+    service window; out-of-order inserts never move `last_*` backwards.
+    """
+    if not (message.whatsapp_account and message.contact):
+        return
+
+    at = get_datetime(message.creation)
+    incoming = message.type == "Incoming"
+
+    frappe.db.sql("""
+        INSERT INTO `tabWhatsApp Conversation`
+            (name, whatsapp_account, contact, profile_name, unread_count, service_window_expires,
+            last_message, last_message_type, last_activity, last_incoming_at, last_whatsapp_message,
+            creation, modified, owner, modified_by)
+        VALUES
+            (%(name)s, %(whatsapp_account)s, %(contact)s, %(profile_name)s, %(unread)s, %(window)s,
+            %(excerpt)s, %(content_type)s, %(at)s, %(incoming_at)s, %(message)s,
+            %(at)s, %(at)s, 'Administrator', 'Administrator')
+        ON DUPLICATE KEY UPDATE
+            profile_name = COALESCE(VALUES(profile_name), profile_name),
+            unread_count = unread_count + VALUES(unread_count),
+            service_window_expires = IF(
+                VALUES(last_incoming_at) > COALESCE(last_incoming_at, '1970-01-01'),
+                VALUES(service_window_expires), service_window_expires),
+            last_incoming_at = IF(
+                VALUES(last_incoming_at) > COALESCE(last_incoming_at, '1970-01-01'),
+                VALUES(last_incoming_at), last_incoming_at),
+            last_message = IF(VALUES(last_activity) >= last_activity, VALUES(last_message), last_message),
+            last_message_type = IF(VALUES(last_activity) >= last_activity, VALUES(last_message_type), last_message_type),
+            last_whatsapp_message = IF(VALUES(last_activity) >= last_activity, VALUES(last_whatsapp_message), last_whatsapp_message),
+            last_activity = GREATEST(last_activity, VALUES(last_activity)),
+            modified = VALUES(modified)
+    """, {
+        "name": get_conversation_name(message.whatsapp_account, message.contact),
+        "whatsapp_account": message.whatsapp_account,
+        "contact": message.contact,
+        "profile_name": (message.profile_name or None) if incoming else None,
+        "unread": 1 if incoming else 0,
+        "window": add_to_date(at, hours=SERVICE_WINDOW_HOURS) if incoming else None,
+        "excerpt": get_excerpt(message),
+        "content_type": message.content_type,
+        "at": at,
+        "incoming_at": at if incoming else None,
+        "message": message.name,
+    })
+
+
+def get_excerpt(message):
+    text = (message.message or "").strip()
+    if not text:
+        return f"[{message.content_type or 'message'}]"
+
+    return text if len(text) <= EXCERPT_LENGTH else text[:EXCERPT_LENGTH - 1] + "…"
+
+
+@frappe.whitelist()
+def get_thread(contact, whatsapp_account=None, before=None, limit=THREAD_PAGE_SIZE):
+    """
+    Messages exchanged with a contact, newest first.
+
+    Args:
+        contact: Phone number in any format
+        whatsapp_account: Only messages of this account
+        before: `next_cursor` of the previous page
+        limit: Page size
+
+    Returns:
+        dict with messages and next_cursor (None on the last page)
+    """
+    frappe.has_permission("WhatsApp Message", "read", throw=True)
+
+    limit = min(cint(limit) or THREAD_PAGE_SIZE, MAX_PAGE_SIZE)
+    conditions = ["contact = %(contact)s"]
+    values = {
+        "contact": format_number(contact, get_default_country_code(whatsapp_account)),
+        "limit": limit,
+    }
+
+    if whatsapp_account:
+        conditions.append("whatsapp_account = %(whatsapp_account)s")
+        values["whatsapp_account"] = whatsapp_account
+
+    if before:
+        values["cursor_creation"], values["cursor_name"] = decode_cursor(before)
+        conditions.append("""(creation < %(cursor_creation)s
+            OR (creation = %(cursor_creation)s AND name < %(cursor_name)s))""")
+
+    messages = frappe.db.sql("""
+        SELECT {fields}
+        FROM `tabWhatsApp Message`
+        WHERE {conditions}
+        ORDER BY creation DESC, name DESC
+        LIMIT %(limit)s
+    """.format(
+        fields=", ".join(f"`{field}`" for field in THREAD_FIELDS),
+        conditions=" AND ".join(conditions),
+    ), values, as_dict=True)
+
+    # Older history may have been archived; merge it in transparently
+    messages = sorted(
+        messages + get_archived_messages(conditions, values, THREAD_FIELDS, limit),
+        key=lambda message: (message.creation, message.name),
+        reverse=True,
+    )[:limit]
+
+    return {
+        "messages": messages,
+        "next_cursor": encode_cursor(messages[-1]) if len(messages) == limit else None,
+    }
+
+
+@frappe.whitelist()
+def get_conversations(whatsapp_account=None, before=None, limit=THREAD_PAGE_SIZE):
+    """Conversations by latest activity, keyset-paginated like `get_thread`."""
+    frappe.has_permission("WhatsApp Conversation", "read", throw=True)
+
+    limit = min(cint(limit) or THREAD_PAGE_SIZE, MAX_PAGE_SIZE)
+    filters = {}
+    if whatsapp_account:
+        filters["whatsapp_account"] = whatsapp_account
+
+    or_filters = None
+    if before:
+        last_activity, name = decode_cursor(before)
+        filters["last_activity"] = ["<=", last_activity]
+        or_filters = [
+            ["last_activity", "<", last_activity],
+            ["name", "<", name],
+        ]
+
+    conversations = frappe.get_all(
+        "WhatsApp Conversation",
+        filters=filters,
+        or_filters=or_filters,
+        fields=[
+            "name", "whatsapp_account", "contact", "profile_name", "unread_count",
+            "service_window_expires", "last_message", "last_message_type", "last_activity",
+        ],
+        order_by="last_activity desc, name desc",
+        limit=limit,
+    )
+
+    return {
+        "conversations": conversations,
+        "next_cursor": encode_cursor(conversations[-1], "last_activity") if len(conversations) == limit else None,
+    }
+
+
+@frappe.whitelist()
+def mark_conversation_read(contact, whatsapp_account):
+    """Reset the unread count of a conversation."""
+    name = get_conversation_name(
+        whatsapp_account, format_number(contact, get_default_country_code(whatsapp_account))
+    )
+    frappe.has_permission("WhatsApp Conversation", "write", throw=True)
+    frappe.db.set_value("WhatsApp Conversation", name, "unread_count", 0, update_modified=False)
+
+
+def encode_cursor(row, field="creation"):
+    return f"{get_datetime(row[field]).isoformat()}|{row['name']}"
+
+
+def decode_cursor(cursor):
+    timestamp, name = cursor.rsplit("|", 1)
+    return get_datetime(timestamp), name
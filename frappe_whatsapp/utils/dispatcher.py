@@ -0,0 +1,197 @@
+"""Batched, concurrent dispatcher for outgoing WhatsApp messages."""
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import frappe
+import requests
+from frappe.utils import add_to_date, now_datetime
+
+from frappe_whatsapp.utils.media_upload import MediaMissing
+from frappe_whatsapp.utils.metrics import increment, observe
+from frappe_whatsapp.utils.service_window import ServiceWindowClosed
+
+# Number of Graph API calls in flight at once for a single batch
+DISPATCH_POOL_SIZE = 8
+REQUEST_TIMEOUT = 30
+
+ERROR_THROTTLE = "Throttle"
+ERROR_PERMANENT = "Permanent"
+ERROR_TRANSIENT = "Transient"
+
+MAX_RETRIES = 5
+
+# Base wait (in minutes) per attempt; the actual wait is jittered between
+# half and the full value so that a burst of failures does not come back
+# as a burst of retries.
+BACKOFF_MINUTES = {
+    ERROR_THROTTLE: [1, 2, 5, 10, 20],
+    ERROR_TRANSIENT: [5, 15, 60, 240, 720],  # 5m, 15m, 1h, 4h, 12h
+}
+
+# Graph API error codes, see
+# https://developers.facebook.com/docs/whatsapp/cloud-api/support/error-codes
+THROTTLE_ERROR_CODES = {4, 80007, 130429, 131048, 131056, 133016}
+PERMANENT_ERROR_CODES = {
+    10, 100, 190, 200, 368,
+    131008, 131009, 131021, 131026, 131030, 131031, 131045, 131047,
+    131051, 131052, 132000, 132001, 132005, 132007, 132012, 132015,
+    132016, 133010,
+}
+
+
+def classify_error(status_code=None, error=None):
+    """
+    Classify a failed Graph API call.
+
+    Args:
+        status_code: HTTP status code of the response (None on network errors)
+        error: The `error` object from the response body, if any
+
+    Returns:
+        One of ERROR_THROTTLE, ERROR_PERMANENT or ERROR_TRANSIENT
+    """
+    code = (error or {}).get("code")
+    try:
+        code = int(code) if code is not None else None
+    except (TypeError, ValueError):
+        code = None
+
+    if status_code == 429 or code in THROTTLE_ERROR_CODES:
+        return ERROR_THROTTLE
+
+    if code in PERMANENT_ERROR_CODES:
+        return ERROR_PERMANENT
+
+    return ERROR_TRANSIENT
+
+
+def classify_exception(exc):
+    """Classify an exception raised by an inline send (see `WhatsAppMessage.send`)."""
+    if isinstance(exc, (ServiceWindowClosed, MediaMissing)):
+        return ERROR_PERMANENT
+
+    if isinstance(exc, requests.exceptions.RequestException) and exc.response is None:
+        return ERROR_TRANSIENT
+
+    response = frappe.flags.integration_request
+    if response is None or not hasattr(response, "json"):
+        return ERROR_TRANSIENT
+
+    try:
+        error = response.json().get("error", {})
+    except Exception:
+        error = {}
+
+    return classify_error(response.status_code, error)
+
+
+def get_backoff_seconds(error_class, attempt):
+    """Jittered wait before retry number `attempt` (0 based), None if not retryable."""
+    if error_class == ERROR_PERMANENT or attempt >= MAX_RETRIES:
+        return None
+
+    steps = BACKOFF_MINUTES.get(error_class, BACKOFF_MINUTES[ERROR_TRANSIENT])
+    base = steps[min(attempt, len(steps) - 1)] * 60
+    return random.uniform(base / 2, base)
+
+
+def get_next_retry_time(error_class, attempt):
+    """Datetime of the next retry, None if the message should not be retried."""
+    wait = get_backoff_seconds(error_class, attempt)
+    if wait is None:
+        return None
+
+    return add_to_date(now_datetime(), seconds=int(wait))
+
+
+def get_account_endpoint(account_name):
+    """Return (url, headers) of the messages endpoint for an account."""
+    account = frappe.get_doc("WhatsApp Account", account_name)
+    token = account.get_password("token")
+
+    url = f"{account.url}/{account.version}/{account.phone_id}/messages"
+    headers = {
+        "authorization": f"Bearer {token}",
+        "content-type": "application/json",
+    }
+    return url, headers
+
+
+def send_batch(docs, pool_size=DISPATCH_POOL_SIZE):
+    """
+    Send a batch of outgoing `WhatsApp Message` documents.
+
+    Payloads are built and results written on the calling thread, only the
+    HTTP calls run on the pool, so no database access happens off-thread.
+    Documents are updated in memory; the caller saves and commits them.
+
+    Returns:
+        dict with `sent` and `failed` counts
+    """
+    endpoints = {}
+    jobs = []
+
+    for doc in docs:
+        try:
+            if doc.whatsapp_account not in endpoints:
+                endpoints[doc.whatsapp_account] = get_account_endpoint(doc.whatsapp_account)
+            payload = doc.get_send_payload()
+        except Exception as e:
+            doc.mark_failed(str(e), ERROR_PERMANENT)
+            continue
+
+        if payload is None:
+            # Nothing to send (e.g. internal notes)
+            doc.mark_sent()
+            continue
+
+        url, headers = endpoints[doc.whatsapp_account]
+        jobs.append((doc, url, headers, payload))
+
+    result = {"sent": 0, "failed": 0}
+    if not jobs:
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(pool_size, len(jobs))) as pool:
+        responses = list(pool.map(lambda job: _post(*job[1:]), jobs))
+
+    for (doc, url, headers, payload), (status_code, body, error_message, elapsed) in zip(jobs, responses):
+        observe("whatsapp_send_seconds", elapsed, account=doc.whatsapp_account)
+        message_id = None
+        if status_code == 200 and body:
+            message_id = (body.get("messages") or [{}])[0].get("id")
+
+        if message_id:
+            doc.mark_sent(message_id)
+            doc.after_send()
+            result["sent"] += 1
+            continue
+
+        error = (body or {}).get("error", {})
+        error_class = classify_error(status_code, error)
+        increment("whatsapp_send_errors_total", account=doc.whatsapp_account, code=error.get("code") or status_code)
+        doc.mark_failed(error.get("message") or error_message or f"HTTP {status_code}", error_class)
+        result["failed"] += 1
+
+    return result
+
+
+def _post(url, headers, payload):
+    """Runs on the pool: POST one payload, return (status_code, body, error, seconds)."""
+    started = time.monotonic()
+    try:
+        response = requests.post(
+            url, headers=headers, data=json.dumps(payload), timeout=REQUEST_TIMEOUT
+        )
+    except requests.exceptions.RequestException as e:
+        return None, None, str(e), time.monotonic() - started
+
+    elapsed = time.monotonic() - started
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+
+    return response.status_code, body, None if response.ok else response.text[:500], elapsed
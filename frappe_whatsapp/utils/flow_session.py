@@ -0,0 +1,157 @@
+"""Flow endpoint session state, kept in Redis while a flow is open."""
+import json
+
+import frappe
+from frappe.utils import cint
+
+# Seconds a flow session lives after its last interaction,
+# override with `whatsapp_flow_session_ttl`
+SESSION_TTL = 60 * 60
+FLOW_DEFINITIONS_KEY = "whatsapp_flow_definitions"
+# Form values are stored as one hash field each so updates merge in Redis
+DATA_PREFIX = "data:"
+
+
+def start_session(flow_token, flow, whatsapp_message=None):
+    """Remember which flow (and message) a flow token belongs to."""
+    key = _session_key(flow_token)
+    pipe = frappe.cache.pipeline()
+    pipe.hset(key, mapping={"flow": flow or "", "whatsapp_message": whatsapp_message or ""})
+    pipe.expire(key, get_session_ttl())
+    pipe.execute()
+
+
+def update_session(flow_token, screen, form_data):
+    """
+    Merge submitted form values into the session in one round trip.
+
+    Returns:
+        the session after the update, see `get_session`
+    """
+    key = _session_key(flow_token)
+    mapping = {f"{DATA_PREFIX}{field}": json.dumps(value) for field, value in (form_data or {}).items()}
+    mapping["last_screen"] = screen or ""
+
+    pipe = frappe.cache.pipeline()
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, get_session_ttl())
+    pipe.hgetall(key)
+    return _parse_session(pipe.execute()[-1])
+
+
+def get_session(flow_token):
+    """
+    Session state of a flow token.
+
+    Returns:
+        dict with flow, whatsapp_message, last_screen and data, None if unknown
+    """
+    # Raw hash, the cache wrapper's hgetall expects pickled values
+    pipe = frappe.cache.pipeline()
+    pipe.hgetall(_session_key(flow_token))
+    return _parse_session(pipe.execute()[0])
+
+
+def persist_session(flow_token, session=None, completed=False):
+    """Write the session to WhatsApp Flow Data in the background."""
+    session = session or get_session(flow_token)
+    if not session:
+        return
+
+    frappe.enqueue(
+        "frappe_whatsapp.utils.flow_session.save_flow_session",
+        queue="short",
+        flow_token=flow_token,
+        session=session,
+        completed=completed,
+    )
+
+
+def save_flow_session(flow_token, session, completed=False):
+    """Background job: upsert the WhatsApp Flow Data row of a flow token."""
+    values = {
+        "last_screen": session.get("last_screen"),
+        "data": json.dumps(session.get("data") or {}),
+        "completed": 1 if completed else 0,
+    }
+
+    if frappe.db.exists("WhatsApp Flow Data", flow_token):
+        frappe.db.set_value("WhatsApp Flow Data", flow_token, values)
+        return
+
+    whatsapp_message = session.get("whatsapp_message") or frappe.db.get_value(
+        "WhatsApp Message", {"flow_token": flow_token}, "name"
+    )
+    frappe.get_doc({
+        "doctype": "WhatsApp Flow Data",
+        "flow_token": flow_token,
+        "flow": session.get("flow"),
+        "whatsapp_message": whatsapp_message,
+        **values,
+    }).insert(ignore_permissions=True)
+
+
+def complete_session(flow_token):
+    """Persist a finished flow and drop its session."""
+    session = get_session(flow_token)
+    if not session:
+        return
+
+    persist_session(flow_token, session, completed=True)
+    frappe.cache.delete(_session_key(flow_token))
+
+
+def get_flow_definition(flow):
+    """
+    Screen order of a flow, cached until the flow changes.
+
+    Returns:
+        dict with screens (ids in order) and terminal (ids), None if unknown
+    """
+    if not flow:
+        return None
+
+    def generator():
+        screens = frappe.get_all(
+            "WhatsApp Flow Screen",
+            filters={"parent": flow, "parenttype": "WhatsApp Flow"},
+            fields=["screen_id", "terminal"],
+            order_by="idx asc",
+        )
+        if not screens:
+            return None
+
+        return {
+            "screens": [s.screen_id for s in screens],
+            "terminal": [s.screen_id for s in screens if s.terminal],
+        }
+
+    return frappe.cache.hget(FLOW_DEFINITIONS_KEY, flow, generator=generator)
+
+
+def clear_flow_definition(flow):
+    frappe.cache.hdel(FLOW_DEFINITIONS_KEY, flow)
+
+
+def get_session_ttl():
+    return cint(frappe.conf.get("whatsapp_flow_session_ttl")) or SESSION_TTL
+
+
+def _session_key(flow_token):
+    return frappe.cache.make_key(f"whatsapp_flow_session:{flow_token}")
+
+
+def _parse_session(raw):
+    if not raw:
+        return None
+
+    session = {"flow": None, "whatsapp_message": None, "last_screen": None, "data": {}}
+    for field, value in raw.items():
+        field = frappe.safe_decode(field)
+        value = frappe.safe_decode(value)
+        if field.startswith(DATA_PREFIX):
+            session["data"][field[len(DATA_PREFIX):]] = json.loads(value)
+        else:
+            session[field] = value or None
+
+    return session
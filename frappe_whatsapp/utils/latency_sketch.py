@@ -0,0 +1,81 @@
+"""Mergeable latency sketches with logarithmic buckets (DDSketch style)."""
+import json
+import math
+
+# Quantiles are accurate to within this relative error
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+# Latencies below a second all land in bucket 0
+MIN_VALUE = 1.0
+
+
+def bucket_index(seconds):
+    """Bucket a latency in seconds falls into."""
+    if seconds <= MIN_VALUE:
+        return 0
+    return math.ceil(math.log(seconds) / LOG_GAMMA)
+
+
+def bucket_value(index):
+    """Representative latency of a bucket, within the relative accuracy."""
+    if index <= 0:
+        return 0.0
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+def new_sketch():
+    return {}
+
+
+def add(sketch, seconds, count=1):
+    index = bucket_index(seconds)
+    sketch[index] = sketch.get(index, 0) + count
+    return sketch
+
+
+def merge(sketch, other):
+    """Merge `other` into `sketch` and return it."""
+    for index, count in other.items():
+        index = int(index)
+        sketch[index] = sketch.get(index, 0) + int(count)
+    return sketch
+
+
+def count(sketch):
+    return sum(sketch.values())
+
+
+def quantile(sketch, q):
+    """
+    Approximate quantile of the sketch.
+
+    Args:
+        sketch: {bucket index: count}
+        q: Quantile between 0 and 1
+
+    Returns:
+        Latency in seconds, None for an empty sketch
+    """
+    total = count(sketch)
+    if not total:
+        return None
+
+    rank = max(1, math.ceil(q * total))
+    seen = 0
+    for index in sorted(sketch):
+        seen += sketch[index]
+        if seen >= rank:
+            return bucket_value(index)
+
+    return bucket_value(max(sketch))
+
+
+def dumps(sketch):
+    return json.dumps({str(index): n for index, n in sorted(sketch.items())}, separators=(",", ":"))
+
+
+def loads(value):
+    if not value:
+        return new_sketch()
+    return {int(index): int(n) for index, n in json.loads(value).items()}
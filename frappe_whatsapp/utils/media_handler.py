@@ -1,57 +1,252 @@
 """Media handler for WhatsApp messages with async download and optimization."""
+import hashlib
+import os
+
 import frappe
-from frappe.utils.file_manager import save_file
-from PIL import Image
+from frappe.utils import cint
+from PIL import Image, ImageOps
 from io import BytesIO
 import requests
 
+from frappe_whatsapp.utils.media_store import (
+    HANDLE_INBOUND,
+    add_reference,
+    get_file_path,
+    register_media,
+    save_media_handle,
+)
+
+# Largest inbound media we store (Meta allows up to 100MB documents)
+MAX_MEDIA_BYTES = 100 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Derivatives generated for inbound images
+DISPLAY_SIZE = (1600, 1600)
+DISPLAY_QUALITY = 82
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 70
+
+
+class MediaTooLarge(Exception):
+    """Raised when a media download exceeds the size limit."""
+    pass
+
 
 def download_media_async(message_doc_name, message_data, message_type, whatsapp_account_name):
     """
     Async wrapper for media download.
     This is enqueued from webhook.py.
+
+    The media is streamed to disk and attached to the message without
+    ever holding the whole file in memory.
     """
     try:
-        whatsapp_account = frappe.get_doc("WhatsApp Account", whatsapp_account_name)
-        token = whatsapp_account.get_password("token")
-        url = f"{whatsapp_account.url}/{whatsapp_account.version}/"
+        api_url, headers = get_media_endpoint(whatsapp_account_name)
         media_id = message_data["id"]
+        media_info = fetch_media_info(api_url, headers, media_id)
+
+        # Forwarded media is usually already stored, Meta reports its hash
+        media = add_reference(media_info.get("sha256"))
+        if not media:
+            stored = stream_media_to_file(
+                media_info.get("url"),
+                headers,
+                get_extension_from_mime(media_info.get("mime_type")),
+            )
+            media = register_media(stored, media_info.get("mime_type"))
+
+        attach_media(message_doc_name, whatsapp_account_name, media_id, media)
+        frappe.db.commit()
+
+        if message_type == "image":
+            derivatives = generate_image_derivatives(get_file_path(media.file_url))
+            set_image_derivatives(message_doc_name, media.file_url, derivatives)
+            frappe.db.commit()
 
-        headers = {'Authorization': 'Bearer ' + token}
-        response = requests.get(f'{url}{media_id}/', headers=headers, timeout=30)
-
-        if response.status_code == 200:
-            media_info = response.json()
-            media_url = media_info.get("url")
-            mime_type = media_info.get("mime_type")
-            file_extension = get_extension_from_mime(mime_type)
-
-            media_response = requests.get(media_url, headers=headers, timeout=60)
-            if media_response.status_code == 200:
-                content = media_response.content
-                
-                # Compress images
-                if message_type == "image" and should_compress(len(content)):
-                    content, file_extension = compress_image(content, mime_type)
-                
-                file_name = f"{frappe.generate_hash(length=10)}.{file_extension}"
-                
-                file_doc = frappe.get_doc({
-                    "doctype": "File",
-                    "file_name": file_name,
-                    "attached_to_doctype": "WhatsApp Message",
-                    "attached_to_name": message_doc_name,
-                    "content": content,
-                    "attached_to_field": "attach"
-                }).insert(ignore_permissions=True)
-
-                frappe.db.set_value("WhatsApp Message", message_doc_name, "attach", file_doc.file_url)
-                frappe.db.commit()
-                
     except Exception as e:
         frappe.log_error(f"Media download failed for {message_doc_name}: {str(e)}", "WhatsApp Media Error")
 
 
+def get_media_endpoint(whatsapp_account_name):
+    """
+    Graph API base URL and auth headers for media requests.
+
+    Returns:
+        tuple of (url, headers)
+    """
+    whatsapp_account = frappe.get_doc("WhatsApp Account", whatsapp_account_name)
+    token = whatsapp_account.get_password("token")
+    return f"{whatsapp_account.url}/{whatsapp_account.version}/", {'Authorization': 'Bearer ' + token}
+
+
+def fetch_media_info(api_url, headers, media_id):
+    """
+    Media metadata (url, mime_type, sha256, file_size) from Meta.
+    Makes no database calls, so it can run on worker threads.
+    """
+    response = requests.get(f'{api_url}{media_id}/', headers=headers, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def attach_media(message_doc_name, whatsapp_account_name, media_id, media):
+    """Link a stored media object to the message it arrived with."""
+    save_media_handle(media.sha256, whatsapp_account_name, media_id, HANDLE_INBOUND)
+    file_doc = create_file_record(media, message_doc_name)
+    frappe.db.set_value("WhatsApp Message", message_doc_name, "attach", file_doc.file_url)
+
+    return file_doc
+
+
+def stream_media_to_file(media_url, headers, file_extension, max_bytes=MAX_MEDIA_BYTES, files_dir=None):
+    """
+    Stream a media URL into the site's public files.
+
+    The body is written in chunks to a `.part` file, hashed on the fly and
+    renamed into place once complete.
+
+    Args:
+        media_url: URL returned by the media endpoint
+        headers: Authorization headers
+        file_extension: Extension for the stored file
+        max_bytes: Abort downloads larger than this
+        files_dir: Public files directory, required when called off the main thread
+
+    Returns:
+        dict with file_name, file_url, path, file_size, sha256 and content_hash (md5)
+
+    Raises:
+        MediaTooLarge: The media exceeds `max_bytes`
+    """
+    file_name = f"{frappe.generate_hash(length=10)}.{file_extension}"
+    path = os.path.join(files_dir or frappe.get_site_path("public", "files"), file_name)
+    part_path = f"{path}.part"
+
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    size = 0
+
+    try:
+        with requests.get(media_url, headers=headers, stream=True, timeout=(10, 60)) as response:
+            response.raise_for_status()
+
+            if cint(response.headers.get("Content-Length")) > max_bytes:
+                raise MediaTooLarge(f"Media is {response.headers['Content-Length']} bytes, limit is {max_bytes}")
+
+            with open(part_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise MediaTooLarge(f"Media exceeds the {max_bytes} byte limit")
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    md5.update(chunk)
+
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    return {
+        "file_name": file_name,
+        "file_url": f"/files/{file_name}",
+        "path": path,
+        "file_size": size,
+        "sha256": sha256.hexdigest(),
+        "content_hash": md5.hexdigest(),
+    }
+
+
+def create_file_record(stored, message_doc_name):
+    """
+    Insert a File pointing at an already written file.
+
+    File.insert would read the file back to hash it, so the row is written
+    directly with the hash computed during the download.
+    """
+    file_doc = frappe.new_doc("File")
+    file_doc.update({
+        "file_name": os.path.basename(stored["file_url"]),
+        "file_url": stored["file_url"],
+        "file_size": stored["file_size"],
+        "content_hash": stored["content_hash"],
+        "is_private": 0,
+        "folder": "Home/Attachments",
+        "attached_to_doctype": "WhatsApp Message",
+        "attached_to_name": message_doc_name,
+        "attached_to_field": "attach",
+    })
+    file_doc.set_new_name()
+    file_doc.db_insert()
+
+    return file_doc
+
+
+def generate_image_derivatives(path, display_size=DISPLAY_SIZE, thumbnail_size=THUMBNAIL_SIZE):
+    """
+    Write a display version and a thumbnail next to an image.
+
+    The image is decoded once: JPEGs are downscaled while decoding
+    (`Image.draft`), the display version is resized from that and the
+    thumbnail from the display version in memory. Derivatives that
+    already exist (deduplicated media) are not generated again.
+    Makes no database calls, so it can run on worker threads.
+
+    Args:
+        path: Absolute path of the original image
+
+    Returns:
+        dict with display and thumbnail paths
+    """
+    stem = os.path.splitext(path)[0]
+    derivatives = {
+        "display": f"{stem}_display.jpg",
+        "thumbnail": f"{stem}_thumb.jpg",
+    }
+    if all(os.path.exists(p) for p in derivatives.values()):
+        return derivatives
+
+    with Image.open(path) as original:
+        original.draft("RGB", display_size)
+        img = ImageOps.exif_transpose(original)
+
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+
+        img.thumbnail(display_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        _save_jpeg(img, derivatives["display"], DISPLAY_QUALITY)
+
+        img.thumbnail(thumbnail_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        _save_jpeg(img, derivatives["thumbnail"], THUMBNAIL_QUALITY)
+
+    return derivatives
+
+
+def remove_image_derivatives(path):
+    """Delete the derivatives of an image, if any."""
+    stem = os.path.splitext(path)[0]
+    for suffix in ("_display.jpg", "_thumb.jpg"):
+        if os.path.exists(stem + suffix):
+            os.remove(stem + suffix)
+
+
+def set_image_derivatives(message_doc_name, file_url, derivatives):
+    """Store derivative URLs on the message."""
+    base_url = file_url.rsplit("/", 1)[0]
+    frappe.db.set_value("WhatsApp Message", message_doc_name, {
+        "display_image": f"{base_url}/{os.path.basename(derivatives['display'])}",
+        "thumbnail": f"{base_url}/{os.path.basename(derivatives['thumbnail'])}",
+    }, update_modified=False)
+
+
+def _save_jpeg(img, path, quality):
+    part_path = f"{path}.part"
+    img.save(part_path, format="JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(part_path, path)
+
+
 def get_extension_from_mime(mime_type):
     """Get file extension from MIME type."""
     if not mime_type:
@@ -0,0 +1,166 @@
+"""Batched inbound media downloads on a dedicated queue."""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import frappe
+from frappe.utils import cint
+
+from frappe_whatsapp.utils.analytics_rollup import track_event
+from frappe_whatsapp.utils.media_handler import (
+    attach_media,
+    fetch_media_info,
+    generate_image_derivatives,
+    get_extension_from_mime,
+    get_media_endpoint,
+    set_image_derivatives,
+    stream_media_to_file,
+)
+from frappe_whatsapp.utils.media_store import add_reference, get_file_path, register_media
+from frappe_whatsapp.utils.metrics import observe
+
+# Add a worker for this queue in common_site_config.json ("workers") to
+# isolate media from webhook and bulk jobs; until then the long queue is used
+MEDIA_QUEUE = "whatsapp_media"
+FALLBACK_QUEUE = "long"
+# Concurrent downloads per batch job, override with `whatsapp_media_concurrency`
+MEDIA_CONCURRENCY = 4
+BATCH_TIMEOUT = 1800
+
+
+def get_media_queue():
+    """The dedicated media queue when a worker is configured for it."""
+    workers = frappe.conf.get("workers") or {}
+    return MEDIA_QUEUE if MEDIA_QUEUE in workers else FALLBACK_QUEUE
+
+
+def enqueue_media_downloads(items):
+    """
+    Download all media of one webhook in a single background job.
+
+    Args:
+        items: list of dicts with message, media_id and whatsapp_account
+    """
+    if not items:
+        return
+
+    frappe.enqueue(
+        "frappe_whatsapp.utils.media_pipeline.download_media_batch",
+        items=items,
+        queue=get_media_queue(),
+        timeout=BATCH_TIMEOUT,
+        enqueue_after_commit=True,
+    )
+
+
+def download_media_batch(items, max_workers=None):
+    """
+    Fetch metadata and download media for many messages concurrently.
+
+    Metadata requests run on a bounded thread pool; as each one completes
+    the main thread checks the media store for the content and either
+    links the stored file or submits the download to the same pool.
+    Images then get their display and thumbnail versions generated on the
+    pool as well. All database writes happen on the main thread.
+
+    Returns:
+        dict with downloaded, deduplicated and failed counts
+    """
+    max_workers = max_workers or cint(frappe.conf.get("whatsapp_media_concurrency")) or MEDIA_CONCURRENCY
+    files_dir = frappe.get_site_path("public", "files")
+    endpoints = {}
+    result = {"downloaded": 0, "deduplicated": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        info_futures = {}
+        for item in items:
+            account = item["whatsapp_account"]
+            if account not in endpoints:
+                endpoints[account] = get_media_endpoint(account)
+            api_url, headers = endpoints[account]
+            info_futures[pool.submit(_timed, fetch_media_info, api_url, headers, item["media_id"])] = item
+
+        download_futures = {}
+        derivative_futures = {}
+        for future in as_completed(info_futures):
+            item = info_futures[future]
+            try:
+                media_info, elapsed_ms = future.result()
+                item["elapsed_ms"] = elapsed_ms
+
+                media = add_reference(media_info.get("sha256"))
+                if media:
+                    _finish(item, media, "media_dedup_hits")
+                    _submit_derivatives(pool, derivative_futures, item, media)
+                    result["deduplicated"] += 1
+                    continue
+
+                headers = endpoints[item["whatsapp_account"]][1]
+                download = pool.submit(
+                    _timed,
+                    stream_media_to_file,
+                    media_info.get("url"),
+                    headers,
+                    get_extension_from_mime(media_info.get("mime_type")),
+                    files_dir=files_dir,
+                )
+                download_futures[download] = (item, media_info)
+            except Exception as e:
+                _fail(item, e)
+                result["failed"] += 1
+
+        for future in as_completed(download_futures):
+            item, media_info = download_futures[future]
+            try:
+                stored, elapsed_ms = future.result()
+                item["elapsed_ms"] += elapsed_ms
+
+                media = register_media(stored, media_info.get("mime_type"))
+                _finish(item, media, "media_downloads", stored["file_size"])
+                _submit_derivatives(pool, derivative_futures, item, media)
+                result["downloaded"] += 1
+            except Exception as e:
+                _fail(item, e)
+                result["failed"] += 1
+
+        for future in as_completed(derivative_futures):
+            item, media = derivative_futures[future]
+            try:
+                set_image_derivatives(item["message"], media.file_url, future.result())
+                frappe.db.commit()
+            except Exception as e:
+                frappe.db.rollback()
+                frappe.log_error(f"Image derivatives failed for {item['message']}: {e}", "WhatsApp Media Error")
+
+    return result
+
+
+def _submit_derivatives(pool, futures, item, media):
+    """Generate display and thumbnail versions of images on the pool."""
+    if item.get("message_type") != "image":
+        return
+
+    futures[pool.submit(generate_image_derivatives, get_file_path(media.file_url))] = (item, media)
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.monotonic()
+    value = fn(*args, **kwargs)
+    return value, int((time.monotonic() - started) * 1000)
+
+
+def _finish(item, media, metric, size=0):
+    attach_media(item["message"], item["whatsapp_account"], item["media_id"], media)
+    frappe.db.commit()
+
+    account = item["whatsapp_account"]
+    track_event(metric, account, hourly=False)
+    track_event("media_download_ms", account, count=item.get("elapsed_ms", 0), hourly=False)
+    observe("whatsapp_media_download_seconds", item.get("elapsed_ms", 0) / 1000, account=account)
+    if size:
+        track_event("media_download_kb", account, count=size // 1024, hourly=False)
+
+
+def _fail(item, error):
+    frappe.db.rollback()
+    frappe.log_error(f"Media download failed for {item['message']}: {error}", "WhatsApp Media Error")
+    track_event("media_download_failures", item["whatsapp_account"], hourly=False)
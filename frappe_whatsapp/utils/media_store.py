@@ -0,0 +1,233 @@
+"""Content-addressed media store shared by inbound and outbound media."""
+import hashlib
+import os
+
+import frappe
+from frappe.utils import add_to_date, cint, now, now_datetime
+
+HASH_CHUNK_SIZE = 1024 * 1024
+HASH_CACHE_SECONDS = 7 * 24 * 60 * 60
+
+HANDLE_MEDIA_ID = "Media ID"
+HANDLE_UPLOAD = "Upload Handle"
+HANDLE_INBOUND = "Inbound Media ID"
+
+# Meta keeps uploaded media for 30 days; leave a day of margin
+HANDLE_TTL_DAYS = {
+    HANDLE_MEDIA_ID: 29,
+    HANDLE_UPLOAD: 29,
+    HANDLE_INBOUND: None,
+}
+
+
+def hash_file(path):
+    """
+    Hash a file on disk without loading it into memory.
+
+    Returns:
+        tuple of (sha256, md5) hex digests
+    """
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+            md5.update(chunk)
+
+    return sha256.hexdigest(), md5.hexdigest()
+
+
+def get_media_object(sha256):
+    """Stored media object for a content hash, None if unknown or its file is gone."""
+    if not sha256:
+        return None
+
+    media = frappe.db.get_value(
+        "WhatsApp Media Object",
+        sha256,
+        ["sha256", "file_url", "file_size", "content_hash", "mime_type", "ref_count"],
+        as_dict=True
+    )
+    if media and not os.path.exists(get_file_path(media.file_url)):
+        return None
+
+    return media
+
+
+def add_reference(sha256):
+    """Reuse an already stored file, returns its media object or None."""
+    media = get_media_object(sha256)
+    if media:
+        frappe.db.sql("""
+            UPDATE `tabWhatsApp Media Object` SET ref_count = ref_count + 1 WHERE name = %s
+        """, sha256)
+        media.ref_count += 1
+
+    return media
+
+
+def register_media(stored, mime_type=None, add_ref=True):
+    """
+    Register a freshly written file in the store.
+
+    If the same content is already stored, the new copy is removed and the
+    existing file is used instead.
+
+    Args:
+        stored: dict with sha256, content_hash, file_url, file_size and path
+        mime_type: MIME type of the content
+        add_ref: Count a reference to the media
+
+    Returns:
+        media object of the canonical file
+    """
+    timestamp = now()
+    frappe.db.sql("""
+        INSERT INTO `tabWhatsApp Media Object`
+            (name, sha256, file_url, file_size, content_hash, mime_type, ref_count,
+            creation, modified, owner, modified_by)
+        VALUES
+            (%(sha256)s, %(sha256)s, %(file_url)s, %(file_size)s, %(content_hash)s, %(mime_type)s, %(ref)s,
+            %(timestamp)s, %(timestamp)s, 'Administrator', 'Administrator')
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + VALUES(ref_count)
+    """, {
+        "sha256": stored["sha256"],
+        "file_url": stored["file_url"],
+        "file_size": cint(stored.get("file_size")),
+        "content_hash": stored.get("content_hash"),
+        "mime_type": mime_type,
+        "ref": 1 if add_ref else 0,
+        "timestamp": timestamp,
+    })
+
+    media = frappe.db.get_value(
+        "WhatsApp Media Object",
+        stored["sha256"],
+        ["sha256", "file_url", "file_size", "content_hash", "mime_type", "ref_count"],
+        as_dict=True
+    )
+
+    if media.file_url != stored["file_url"]:
+        if not os.path.exists(get_file_path(media.file_url)):
+            # The stored file was removed, adopt the new copy
+            frappe.db.set_value("WhatsApp Media Object", media.sha256, "file_url", stored["file_url"])
+            media.file_url = stored["file_url"]
+        elif stored.get("path") and os.path.exists(stored["path"]):
+            os.remove(stored["path"])
+
+    return media
+
+
+def register_local_file(file_url):
+    """
+    Register an existing site file (e.g. a template sample) without counting a reference.
+
+    The hash is remembered per file version (size and mtime), so an
+    unchanged file is not read again.
+    """
+    path = get_file_path(file_url)
+    stat = os.stat(path)
+    cache_key = f"whatsapp_media_file_hash:{file_url}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    sha256 = frappe.cache.get_value(cache_key)
+    media = get_media_object(sha256) if sha256 else None
+    if media:
+        return media
+
+    sha256, content_hash = hash_file(path)
+    frappe.cache.set_value(cache_key, sha256, expires_in_sec=HASH_CACHE_SECONDS)
+
+    return register_media({
+        "sha256": sha256,
+        "content_hash": content_hash,
+        "file_url": file_url,
+        "file_size": stat.st_size,
+    }, add_ref=False)
+
+
+def release_media(file_url):
+    """Drop a reference to a stored file, deleting it when nothing uses it anymore."""
+    if not file_url:
+        return
+
+    media = frappe.db.get_value(
+        "WhatsApp Media Object", {"file_url": file_url}, ["name", "ref_count"], as_dict=True
+    )
+    if not media:
+        return
+
+    if cint(media.ref_count) > 1:
+        frappe.db.sql("""
+            UPDATE `tabWhatsApp Media Object` SET ref_count = ref_count - 1 WHERE name = %s
+        """, media.name)
+        return
+
+    frappe.db.delete("WhatsApp Media Handle", {"media_object": media.name})
+    frappe.db.delete("WhatsApp Media Object", {"name": media.name})
+    # Frappe removes the file from disk with its last File row,
+    # derivatives are ours to clean up
+    from frappe_whatsapp.utils.media_handler import remove_image_derivatives
+
+    remove_image_derivatives(get_file_path(file_url))
+
+
+def get_media_handle(sha256, whatsapp_account, handle_type=HANDLE_MEDIA_ID):
+    """
+    Unexpired Meta handle for the content on an account.
+
+    Returns:
+        tuple of (handle, expiry datetime), (None, None) if there is none
+    """
+    handles = frappe.get_all(
+        "WhatsApp Media Handle",
+        filters={
+            "media_object": sha256,
+            "whatsapp_account": whatsapp_account,
+            "handle_type": handle_type,
+        },
+        fields=["handle", "expires_on"],
+        order_by="creation desc",
+        limit=1,
+    )
+    if not handles:
+        return None, None
+
+    if handles[0].expires_on and handles[0].expires_on <= now_datetime():
+        return None, None
+
+    return handles[0].handle, handles[0].expires_on
+
+
+def save_media_handle(sha256, whatsapp_account, handle, handle_type=HANDLE_MEDIA_ID):
+    """Remember a handle Meta issued for the content, replacing older ones."""
+    frappe.db.delete("WhatsApp Media Handle", {
+        "media_object": sha256,
+        "whatsapp_account": whatsapp_account,
+        "handle_type": handle_type,
+    })
+
+    ttl_days = HANDLE_TTL_DAYS.get(handle_type)
+    frappe.get_doc({
+        "doctype": "WhatsApp Media Handle",
+        "media_object": sha256,
+        "whatsapp_account": whatsapp_account,
+        "handle_type": handle_type,
+        "handle": handle,
+        "expires_on": add_to_date(now_datetime(), days=ttl_days) if ttl_days else None,
+    }).insert(ignore_permissions=True)
+
+
+def get_media_by_handle(handle, handle_type=HANDLE_INBOUND):
+    """Stored media object a Meta media id or handle points at."""
+    sha256 = frappe.db.get_value(
+        "WhatsApp Media Handle", {"handle": handle, "handle_type": handle_type}, "media_object"
+    )
+    return get_media_object(sha256)
+
+
+def get_file_path(file_url):
+    """Absolute path of a /files or /private/files URL."""
+    if file_url.startswith("/private/"):
+        return frappe.get_site_path(file_url.lstrip("/"))
+
+    return frappe.get_site_path("public", file_url.lstrip("/"))
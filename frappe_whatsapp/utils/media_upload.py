@@ -0,0 +1,178 @@
+"""Upload outbound media to Meta once per account and reuse the media id."""
+import mimetypes
+import os
+import time
+
+import frappe
+import requests
+from frappe import _
+from frappe.utils import add_to_date, get_datetime, now_datetime
+
+from frappe_whatsapp.utils.media_store import (
+    HANDLE_MEDIA_ID,
+    HANDLE_TTL_DAYS,
+    get_file_path,
+    get_media_handle,
+    register_local_file,
+    save_media_handle,
+)
+
+MEDIA_ID_CACHE_KEY = "whatsapp_media_id"
+UPLOAD_LOCK_SECONDS = 60
+# How long a sender waits for another worker's upload before falling back to a link
+UPLOAD_WAIT_SECONDS = 20
+UPLOAD_TIMEOUT = 120
+
+
+class MediaMissing(Exception):
+    """A media message or media template header has no file to send."""
+
+
+def get_media_id(whatsapp_account, file_url):
+    """
+    Meta media id for a site file, uploading it on first use.
+
+    Lookups go Redis cache -> WhatsApp Media Library -> media store handles,
+    and only then to an upload to `/{phone_id}/media`.
+
+    Args:
+        whatsapp_account: WhatsApp Account name
+        file_url: /files or /private/files URL of the media
+
+    Returns:
+        media id, or None when the file should be sent as a link instead
+    """
+    if not whatsapp_account or not file_url or file_url.startswith("http"):
+        return None
+
+    cache_key = _cache_key(whatsapp_account, file_url)
+    media_id = frappe.cache.get_value(cache_key)
+    if media_id:
+        return media_id
+
+    media_id, expires_on = get_stored_media_id(whatsapp_account, file_url)
+    if media_id:
+        _cache_media_id(cache_key, media_id, expires_on)
+        return media_id
+
+    lock_key = frappe.cache.make_key(f"{MEDIA_ID_CACHE_KEY}:lock:{whatsapp_account}:{file_url}")
+    if not frappe.cache.set(lock_key, 1, nx=True, ex=UPLOAD_LOCK_SECONDS):
+        return wait_for_upload(cache_key)
+
+    try:
+        media_id, expires_on = upload_media(whatsapp_account, file_url)
+        _cache_media_id(cache_key, media_id, expires_on)
+        return media_id
+    except Exception as e:
+        frappe.log_error(f"Media upload failed for {file_url}: {e}", "WhatsApp Media Upload")
+        return None
+    finally:
+        frappe.cache.delete(lock_key)
+
+
+def get_media_reference(whatsapp_account, file_url):
+    """
+    Media object for a send payload.
+
+    Returns:
+        {"id": media_id} for uploadable site files, {"link": url} otherwise
+    """
+    if not file_url:
+        raise MediaMissing(_("No media file to send"))
+
+    media_id = get_media_id(whatsapp_account, file_url)
+    if media_id:
+        return {"id": media_id}
+
+    if file_url.startswith("http"):
+        return {"link": file_url}
+
+    return {"link": f"{frappe.utils.get_url()}{file_url}"}
+
+
+def get_stored_media_id(whatsapp_account, file_url):
+    """Unexpired media id from the media library or the media store."""
+    library = frappe.get_all(
+        "WhatsApp Media Library",
+        filters={
+            "file": file_url,
+            "whatsapp_account": whatsapp_account,
+            "meta_media_id": ["is", "set"],
+            "meta_media_expires_on": [">", now_datetime()],
+        },
+        fields=["meta_media_id", "meta_media_expires_on"],
+        limit=1,
+    )
+    if library:
+        return library[0].meta_media_id, library[0].meta_media_expires_on
+
+    if not os.path.exists(get_file_path(file_url)):
+        return None, None
+
+    media = register_local_file(file_url)
+    return get_media_handle(media.sha256, whatsapp_account, HANDLE_MEDIA_ID)
+
+
+def upload_media(whatsapp_account, file_url):
+    """
+    Upload a site file to the account's phone number.
+
+    Returns:
+        tuple of (media id, expiry datetime)
+    """
+    account = frappe.get_doc("WhatsApp Account", whatsapp_account)
+    token = account.get_password("token")
+    path = get_file_path(file_url)
+    mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    with open(path, "rb") as f:
+        response = requests.post(
+            f"{account.url}/{account.version}/{account.phone_id}/media",
+            headers={"Authorization": "Bearer " + token},
+            data={"messaging_product": "whatsapp", "type": mime_type},
+            files={"file": (os.path.basename(path), f, mime_type)},
+            timeout=UPLOAD_TIMEOUT,
+        )
+    response.raise_for_status()
+    media_id = response.json()["id"]
+    expires_on = add_to_date(now_datetime(), days=HANDLE_TTL_DAYS[HANDLE_MEDIA_ID])
+
+    media = register_local_file(file_url)
+    save_media_handle(media.sha256, whatsapp_account, media_id, HANDLE_MEDIA_ID)
+
+    for name in frappe.get_all(
+        "WhatsApp Media Library",
+        filters={"file": file_url, "whatsapp_account": whatsapp_account},
+        pluck="name",
+    ):
+        frappe.db.set_value("WhatsApp Media Library", name, {
+            "meta_media_id": media_id,
+            "meta_media_expires_on": expires_on,
+        })
+
+    return media_id, expires_on
+
+
+def wait_for_upload(cache_key):
+    """Wait for a concurrent upload of the same file, None if it does not finish in time."""
+    deadline = time.monotonic() + UPLOAD_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        media_id = frappe.cache.get_value(cache_key)
+        if media_id:
+            return media_id
+        time.sleep(0.5)
+
+    return None
+
+
+def _cache_media_id(cache_key, media_id, expires_on=None):
+    if expires_on:
+        ttl = int((get_datetime(expires_on) - now_datetime()).total_seconds())
+    else:
+        ttl = 24 * 60 * 60
+    if ttl > 0:
+        frappe.cache.set_value(cache_key, media_id, expires_in_sec=ttl)
+
+
+def _cache_key(whatsapp_account, file_url):
+    return f"{MEDIA_ID_CACHE_KEY}:{whatsapp_account}:{file_url}"
@@ -0,0 +1,127 @@
+"""Archival of settled messages out of the hot WhatsApp Message table."""
+import json
+import time
+
+import frappe
+from frappe.utils import add_days, cint, get_datetime, now, now_datetime
+
+# Statuses after which Meta sends no further updates for a message
+TERMINAL_STATUSES = ("Success", "sent", "delivered", "read", "failed", "Failed")
+
+ARCHIVE_CHUNK_SIZE = 1000
+# Pause between chunks, so archival never saturates the database
+ARCHIVE_PAUSE_SECONDS = 0.5
+# Stay well inside the long queue timeout; the next run continues
+ARCHIVE_MAX_SECONDS = 20 * 60
+
+ARCHIVE_COLUMNS = (
+    "name", "whatsapp_account", "contact", "type", "status", "message_id",
+    "reference_doctype", "reference_name", "archived_on", "data",
+    "creation", "modified", "owner", "modified_by",
+)
+
+
+def archive_messages():
+    """Move settled messages past the configured age to the archive (scheduled daily)."""
+    days = cint(frappe.db.get_single_value("WhatsApp Settings", "archive_messages_after_days"))
+    if days <= 0:
+        return 0
+
+    return archive_messages_before(add_days(now_datetime(), -days))
+
+
+def archive_messages_before(cutoff, chunk_size=ARCHIVE_CHUNK_SIZE, max_seconds=ARCHIVE_MAX_SECONDS):
+    """
+    Move settled messages created before `cutoff`, oldest first.
+
+    Each chunk is copied and deleted in one transaction. Messages with a
+    pending retry or scheduled send stay in WhatsApp Message.
+
+    Returns:
+        number of messages archived
+    """
+    started = time.monotonic()
+    archived = 0
+
+    while time.monotonic() - started < max_seconds:
+        messages = frappe.db.sql("""
+            SELECT *
+            FROM `tabWhatsApp Message`
+            WHERE creation < %(cutoff)s
+                AND (type = 'Incoming' OR status IN %(statuses)s)
+                AND IFNULL(status, '') != 'Retrying'
+                AND IFNULL(scheduling_status, '') != 'Pending'
+            ORDER BY creation ASC
+            LIMIT %(limit)s
+        """, {"cutoff": cutoff, "statuses": TERMINAL_STATUSES, "limit": chunk_size}, as_dict=True)
+        if not messages:
+            break
+
+        write_archive(messages)
+        frappe.db.sql(
+            "DELETE FROM `tabWhatsApp Message` WHERE name IN %(names)s",
+            {"names": [message.name for message in messages]},
+        )
+        frappe.db.commit()
+
+        archived += len(messages)
+        if len(messages) < chunk_size:
+            break
+        time.sleep(ARCHIVE_PAUSE_SECONDS)
+
+    return archived
+
+
+def write_archive(messages):
+    archived_on = now()
+    frappe.db.bulk_insert(
+        "WhatsApp Message Archive",
+        fields=list(ARCHIVE_COLUMNS),
+        values=[
+            (
+                message.name, message.whatsapp_account, message.contact, message.type,
+                message.status, message.message_id, message.reference_doctype,
+                message.reference_name, archived_on, json.dumps(message, default=str),
+                message.creation, message.modified, message.owner, message.modified_by,
+            )
+            for message in messages
+        ],
+        ignore_duplicates=True,
+    )
+
+
+@frappe.whitelist()
+def get_message(name):
+    """A message by name, whether it is still in WhatsApp Message or archived."""
+    frappe.has_permission("WhatsApp Message", "read", throw=True)
+
+    message = frappe.db.get_value("WhatsApp Message", name, "*", as_dict=True)
+    if message:
+        return message
+
+    data = frappe.db.get_value("WhatsApp Message Archive", name, "data")
+    return frappe._dict(json.loads(data)) if data else None
+
+
+def get_archived_messages(conditions, values, fields, limit):
+    """
+    Archived messages matching SQL `conditions` on the archive's indexed
+    columns (contact, whatsapp_account, creation, name), newest first.
+    """
+    rows = frappe.db.sql("""
+        SELECT data
+        FROM `tabWhatsApp Message Archive`
+        WHERE {conditions}
+        ORDER BY creation DESC, name DESC
+        LIMIT %(limit)s
+    """.format(conditions=" AND ".join(conditions)), dict(values, limit=limit), as_dict=True)
+
+    messages = []
+    for row in rows:
+        data = json.loads(row.data)
+        message = frappe._dict({field: data.get(field) for field in fields})
+        if message.get("creation"):
+            message.creation = get_datetime(message.creation)
+        messages.append(message)
+
+    return messages
@@ -0,0 +1,42 @@
+"""Fast check for webhook deliveries of messages that were already stored."""
+import frappe
+
+SEEN_KEY_PREFIX = "whatsapp_seen_message"
+# Meta retries mostly within hours; the unique (whatsapp_account, message_id)
+# index catches anything older
+SEEN_TTL = 24 * 60 * 60
+
+
+def is_message_seen(whatsapp_account, message_id):
+    """Whether the message was stored already, with a single Redis read."""
+    if not message_id:
+        return False
+
+    return frappe.cache.get(_get_key(whatsapp_account, message_id)) is not None
+
+
+def mark_message_seen(whatsapp_account, message_id):
+    if message_id:
+        frappe.cache.set(_get_key(whatsapp_account, message_id), 1, ex=SEEN_TTL)
+
+
+def insert_incoming_message(msg_data):
+    """
+    Insert an incoming message unless it exists already.
+
+    Returns:
+        the new WhatsApp Message, None for a repeated delivery
+    """
+    try:
+        doc = frappe.get_doc(msg_data).insert(ignore_permissions=True)
+    except frappe.UniqueValidationError:
+        return None
+
+    whatsapp_account, message_id = doc.whatsapp_account, doc.message_id
+    # Only remember what was committed, a failed webhook must stay retryable
+    frappe.db.after_commit.add(lambda: mark_message_seen(whatsapp_account, message_id))
+    return doc
+
+
+def _get_key(whatsapp_account, message_id):
+    return frappe.cache.make_key(f"{SEEN_KEY_PREFIX}:{whatsapp_account}:{message_id}")
@@ -0,0 +1,211 @@
+"""Hot-path counters and latency histograms, exposed in Prometheus text format."""
+import hmac
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import frappe
+from frappe.utils import cint, flt, now_datetime
+from werkzeug.wrappers import Response
+
+METRICS_KEY = "whatsapp_metrics"
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# name: (type, help)
+METRICS = {
+    "whatsapp_send_seconds": ("histogram", "Graph API send latency per account"),
+    "whatsapp_send_errors_total": ("counter", "Failed sends per account and Graph API error code"),
+    "whatsapp_retries_scheduled_total": ("counter", "Retries scheduled per account and error class"),
+    "whatsapp_webhook_seconds": ("histogram", "Webhook processing time"),
+    "whatsapp_webhooks_total": ("counter", "Processed webhooks per outcome"),
+    "whatsapp_status_updates_total": ("counter", "Applied message status updates per status"),
+    "whatsapp_media_download_seconds": ("histogram", "Media metadata and download time per account"),
+    "whatsapp_campaign_batch_seconds": ("histogram", "Campaign batch processing time"),
+    "whatsapp_job_seconds": ("histogram", "Scheduled job run time"),
+}
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LE_LABEL = re.compile(r'(^|,)le="([^"]*)"')
+
+
+def increment(name, value=1, **labels):
+    """Add `value` to a counter."""
+    _write([("hincrbyfloat", _sample(name, labels), value)])
+
+
+def observe(name, seconds, **labels):
+    """Record one observation in a histogram."""
+    # Every bucket is written, so all series exist from the first observation
+    ops = [
+        ("hincrbyfloat", _sample(f"{name}_bucket", dict(labels, le=bound)), int(seconds <= bound))
+        for bound in LATENCY_BUCKETS
+    ]
+    ops.append(("hincrbyfloat", _sample(f"{name}_bucket", dict(labels, le="+Inf")), 1))
+    ops.append(("hincrbyfloat", _sample(f"{name}_sum", labels), seconds))
+    ops.append(("hincrbyfloat", _sample(f"{name}_count", labels), 1))
+    _write(ops)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the run time of the block, whether or not it raises."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - started, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of `timer`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _write(ops):
+    try:
+        key = frappe.cache.make_key(METRICS_KEY)
+        pipe = frappe.cache.pipeline()
+        for op, field, value in ops:
+            getattr(pipe, op)(key, field, value)
+        pipe.execute()
+    except Exception:
+        # Never fail the hot path on metrics
+        pass
+
+
+def _sample(name, labels):
+    if not labels:
+        return name
+
+    pairs = ",".join(f'{label}="{_escape(value)}"' for label, value in sorted(labels.items()))
+    return f"{name}{{{pairs}}}"
+
+
+def _escape(value):
+    return str("" if value is None else value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@frappe.whitelist(allow_guest=True)
+def metrics():
+    """
+    Prometheus scrape endpoint.
+
+    Authorised by `Authorization: Bearer <whatsapp_metrics_token>` (site
+    config) or a System Manager session.
+    """
+    if not is_authorised():
+        return Response("Forbidden", status=403)
+
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def is_authorised():
+    token = frappe.conf.get("whatsapp_metrics_token")
+    header = frappe.get_request_header("Authorization") or ""
+    if token and hmac.compare_digest(header.encode(), f"Bearer {token}".encode()):
+        return True
+
+    return frappe.session.user != "Guest" and "System Manager" in frappe.get_roles()
+
+
+def render_metrics():
+    """All recorded metrics plus the current backlog gauges, as exposition text."""
+    pipe = frappe.cache.pipeline()
+    pipe.hgetall(frappe.cache.make_key(METRICS_KEY))
+    samples = {
+        frappe.safe_decode(field): flt(frappe.safe_decode(value))
+        for field, value in (pipe.execute()[0] or {}).items()
+    }
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        matching = sorted(
+            ((sample, value) for sample, value in samples.items() if _base_name(sample, metric_type) == name),
+            key=lambda item: _sort_key(item[0]),
+        )
+        if not matching:
+            continue
+
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(f"{sample} {_format_value(value)}" for sample, value in matching)
+
+    for name, help_text, values in get_gauges():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f"{_sample(name, labels)} {_format_value(value)}" for labels, value in values)
+
+    return "\n".join(lines) + "\n"
+
+
+def get_gauges():
+    """Backlog gauges read at scrape time: (name, help, [(labels, value)])."""
+    from frappe.utils.background_jobs import get_queues
+
+    queues = []
+    for queue in get_queues():
+        queues.append(({"queue": queue.name.rsplit(":", 1)[-1]}, queue.count))
+
+    pending_retries = frappe.db.sql("""
+        SELECT whatsapp_account, COUNT(*)
+        FROM `tabWhatsApp Message`
+        WHERE status = 'Retrying'
+        GROUP BY whatsapp_account
+    """)
+    overdue_scheduled = frappe.db.count(
+        "WhatsApp Message",
+        {"scheduling_status": "Pending", "scheduled_time": ["<", now_datetime()]},
+    )
+
+    return [
+        ("whatsapp_queue_length", "Jobs waiting per background queue", queues),
+        (
+            "whatsapp_pending_retries",
+            "Messages waiting for a retry per account",
+            [({"whatsapp_account": account}, count) for account, count in pending_retries],
+        ),
+        ("whatsapp_overdue_scheduled_messages", "Scheduled messages past their send time", [({}, overdue_scheduled)]),
+    ]
+
+
+def _base_name(sample, metric_type):
+    name = sample.split("{", 1)[0]
+    if metric_type == "histogram":
+        for suffix in ("_bucket", "_sum", "_count"):
+            if name.endswith(suffix):
+                return name[: -len(suffix)]
+
+    return name
+
+
+def _sort_key(sample):
+    """Group the samples of one series, with buckets in ascending `le` order."""
+    name, _, labels = sample.partition("{")
+    le = LE_LABEL.search(labels)
+    bound = 0
+    if le:
+        bound = float("inf") if le.group(2) == "+Inf" else flt(le.group(2))
+    suffix = next((rank for rank, suffix in enumerate(("_bucket", "_sum", "_count")) if name.endswith(suffix)), 0)
+    return LE_LABEL.sub("", labels).lstrip(",").rstrip("}"), suffix, bound
+
+
+def _format_value(value):
+    return str(cint(value)) if flt(value).is_integer() else repr(flt(value))
+
+
+@frappe.whitelist()
+def reset_metrics():
+    """Clear all recorded counters and histograms."""
+    frappe.only_for("System Manager")
+    frappe.cache.delete(frappe.cache.make_key(METRICS_KEY))
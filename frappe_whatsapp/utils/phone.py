@@ -0,0 +1,88 @@
+"""Phone number normalisation to E.164, in WhatsApp's format (no leading '+')."""
+import re
+from functools import lru_cache
+
+import frappe
+
+# E.164 numbers have at most 15 digits; 8 is the shortest in practice
+MIN_DIGITS = 8
+MAX_DIGITS = 15
+NORMALIZE_CACHE_SIZE = 100_000
+
+NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_number(number, default_country_code=None):
+    """
+    Normalise a phone number to E.164 digits without the '+'.
+
+    `+62 812-3456`, `0062 8123456` and, with default country 62,
+    `0812 3456` all become `628123456`. Numbers without an international
+    or trunk prefix are taken to already include their country code.
+
+    Args:
+        number: Phone number as entered
+        default_country_code: Country code for numbers with a trunk '0' prefix
+
+    Returns:
+        normalised number, None if it has no digits
+    """
+    if number is None:
+        return None
+    if not isinstance(number, str):
+        # Spreadsheets and integer fields hand over numbers
+        number = f"{number:.0f}" if isinstance(number, float) else str(number)
+
+    return _normalize(number, default_country_code or None)
+
+
+def normalize_numbers(numbers, default_country_code=None):
+    """
+    Normalise many numbers in one pass, in order.
+
+    Repeated inputs are normalised once, so lists with duplicates
+    (e.g. an import of 100k rows) cost one lookup per distinct number.
+    """
+    country_code = default_country_code or None
+    seen = {}
+    result = []
+    for number in numbers:
+        if number not in seen:
+            seen[number] = normalize_number(number, country_code)
+        result.append(seen[number])
+
+    return result
+
+
+def is_valid_number(number):
+    """Whether a normalised number has a plausible E.164 length."""
+    return bool(number) and number[0] != "0" and MIN_DIGITS <= len(number) <= MAX_DIGITS
+
+
+def get_default_country_code(whatsapp_account=None):
+    """Default country code of an account, or of the default outgoing account."""
+    if not whatsapp_account:
+        whatsapp_account = frappe.db.get_value("WhatsApp Account", {"is_default_outgoing": 1}, "name")
+    if not whatsapp_account:
+        return None
+
+    return frappe.get_cached_value("WhatsApp Account", whatsapp_account, "default_country_code") or None
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(number, default_country_code):
+    number = number.strip()
+    digits = NON_DIGITS.sub("", number)
+    if not digits:
+        return None
+
+    if number.startswith("+"):
+        return digits
+    if digits.startswith("00"):
+        # International call prefix
+        return digits[2:]
+    if digits.startswith("0") and default_country_code:
+        # Trunk prefix of a national number
+        return NON_DIGITS.sub("", default_country_code) + digits.lstrip("0")
+
+    return digits
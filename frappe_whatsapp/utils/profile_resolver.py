@@ -0,0 +1,66 @@
+"""Number to WhatsApp Profile resolution for the message hot path."""
+import frappe
+from frappe.utils import now
+
+# Redis hash of normalised number -> last known profile name
+# ("" when the profile exists but its name is unknown here)
+PROFILE_CACHE_KEY = "whatsapp_profile_names"
+
+
+def resolve_profile(number, profile_name=None, whatsapp_account=None):
+    """
+    Make sure a profile exists for `number` and carries `profile_name`.
+
+    A cache hit with the same name costs no database access; otherwise the
+    profile is created or renamed with a single upsert on the unique
+    number index.
+
+    Args:
+        number: Normalised number (see `utils.format_number`)
+        profile_name: WhatsApp display name, if known
+        whatsapp_account: Account to record on new profiles
+    """
+    if not number:
+        return
+
+    cached = frappe.cache.hget(PROFILE_CACHE_KEY, number)
+    if cached is not None and (not profile_name or cached == profile_name):
+        return
+
+    upsert_profile(number, profile_name, whatsapp_account)
+
+    # Only cache what was committed
+    value = profile_name or cached or ""
+    frappe.db.after_commit.add(lambda: frappe.cache.hset(PROFILE_CACHE_KEY, number, value))
+
+
+def upsert_profile(number, profile_name=None, whatsapp_account=None):
+    """Insert the profile, or update its name (and title) if it exists."""
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.sql("""
+        INSERT INTO `tabWhatsApp Profiles`
+            (name, number, profile_name, title, whatsapp_account,
+            creation, modified, owner, modified_by)
+        VALUES
+            (%(name)s, %(number)s, %(profile_name)s, %(title)s, %(whatsapp_account)s,
+            %(timestamp)s, %(timestamp)s, %(user)s, %(user)s)
+        ON DUPLICATE KEY UPDATE
+            profile_name = IF(VALUES(profile_name) IS NULL, profile_name, VALUES(profile_name)),
+            title = CONCAT_WS(' - ', NULLIF(profile_name, ''), number),
+            modified = IF(VALUES(profile_name) IS NULL, modified, VALUES(modified))
+    """, {
+        "name": frappe.generate_hash(length=10),
+        "number": number,
+        "profile_name": profile_name or None,
+        "title": " - ".join(filter(None, [profile_name, number])),
+        "whatsapp_account": whatsapp_account,
+        "timestamp": timestamp,
+        "user": user,
+    })
+
+
+def clear_profile_cache(*numbers):
+    for number in numbers:
+        if number:
+            frappe.cache.hdel(PROFILE_CACHE_KEY, number)
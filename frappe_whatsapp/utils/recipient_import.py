@@ -0,0 +1,315 @@
+"""Chunked import of recipient lists from DocTypes and CSV/XLSX files."""
+import csv
+import json
+import os
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now
+
+from frappe_whatsapp.utils.phone import NON_DIGITS, get_default_country_code, is_valid_number, normalize_numbers
+
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_QUEUE = "long"
+IMPORT_TIMEOUT = 3600
+IMPORT_PROGRESS_EVENT = "whatsapp_recipient_import_progress"
+
+RECIPIENT_FIELDS = (
+    "recipient_list", "mobile_number", "recipient_name", "recipient_data",
+    "creation", "modified", "owner", "modified_by",
+)
+
+
+@frappe.whitelist()
+def enqueue_recipient_import(list_name, doctype=None, mobile_field=None, name_field=None,
+                             filters=None, limit=None, data_fields=None, file_url=None):
+    """
+    Import recipients into a list in the background.
+
+    Rows come from `doctype` (optionally filtered) or from an uploaded
+    CSV/XLSX `file_url` whose header row names the columns.
+    """
+    frappe.has_permission("WhatsApp Recipient List", "write", list_name, throw=True)
+    if not mobile_field:
+        frappe.throw(_("Mobile Number Field is required"))
+    if not doctype and not file_url:
+        frappe.throw(_("Select a DocType or a file to import from"))
+
+    if filters and isinstance(filters, str):
+        filters = json.loads(filters)
+    if data_fields and isinstance(data_fields, str):
+        data_fields = json.loads(data_fields)
+
+    frappe.enqueue(
+        "frappe_whatsapp.utils.recipient_import.import_recipients",
+        queue=IMPORT_QUEUE,
+        timeout=IMPORT_TIMEOUT,
+        list_name=list_name,
+        doctype=doctype,
+        mobile_field=mobile_field,
+        name_field=name_field,
+        filters=filters,
+        limit=cint(limit) or None,
+        data_fields=data_fields,
+        file_url=file_url,
+        user=frappe.session.user,
+    )
+
+
+def import_recipients(list_name, doctype=None, mobile_field=None, name_field=None, filters=None,
+                      limit=None, data_fields=None, file_url=None, user=None):
+    """
+    Replace a list's recipients with the rows of a DocType or file.
+
+    Rows are streamed in chunks and written with multi-row inserts, one
+    commit per chunk, so memory stays flat however long the list is. The
+    previous recipients are only removed once every chunk is written; if
+    the import fails, the new rows are removed and the list is unchanged.
+
+    Numbers are normalised with the default country code of the list's
+    WhatsApp Account; numbers that are still not valid are rejected.
+
+    Returns:
+        number of recipients imported
+    """
+    if file_url:
+        rows = iter_file_rows(file_url)
+    else:
+        data_fields = data_fields or []
+        fields = get_doctype_import_fields(doctype, mobile_field, name_field, data_fields)
+        rows = iter_doctype_rows(doctype, fields, filters, limit)
+
+    # Imported rows are autoincrement, so everything up to here is the old list
+    replaced_up_to = get_last_recipient_name(list_name)
+    country_code = get_default_country_code(
+        frappe.db.get_value("WhatsApp Recipient List", list_name, "whatsapp_account")
+    )
+    count = rejected = 0
+    buffer = []
+    try:
+        for row in rows:
+            recipient = make_recipient(list_name, row, mobile_field, name_field, data_fields)
+            if not recipient:
+                rejected += 1
+                continue
+
+            buffer.append(recipient)
+            if len(buffer) >= IMPORT_CHUNK_SIZE:
+                written = write_recipients(buffer, country_code)
+                count += written
+                rejected += len(buffer) - written
+                buffer = []
+                publish_import_progress(list_name, count, user, rejected=rejected)
+
+        if buffer:
+            written = write_recipients(buffer, country_code)
+            count += written
+            rejected += len(buffer) - written
+    except Exception:
+        frappe.db.rollback()
+        frappe.db.delete("WhatsApp List Recipient", {
+            "recipient_list": list_name,
+            "name": [">", replaced_up_to],
+        })
+        frappe.db.commit()
+        raise
+
+    remove_replaced_recipients(list_name, replaced_up_to)
+    frappe.db.set_value("WhatsApp Recipient List", list_name, "imported_recipients", count)
+    frappe.db.commit()
+    publish_import_progress(list_name, count, user, done=True, rejected=rejected)
+
+    return count
+
+
+def get_doctype_import_fields(doctype, mobile_field, name_field=None, data_fields=None):
+    fields = [mobile_field]
+    if name_field:
+        fields.append(name_field)
+    if data_fields:
+        for field in frappe.get_meta(doctype).fields:
+            if field.fieldname not in fields and field.fieldname in data_fields:
+                fields.append(field.fieldname)
+
+    return fields
+
+
+def iter_doctype_rows(doctype, fields, filters=None, limit=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Yield records of a DocType, paging on name instead of OFFSET."""
+    last_name = None
+    remaining = limit
+
+    while remaining is None or remaining > 0:
+        page_size = min(chunk_size, remaining) if remaining is not None else chunk_size
+
+        records = frappe.get_all(
+            doctype,
+            filters=with_keyset(doctype, filters, last_name),
+            fields=fields + ["name as _keyset_name"],
+            order_by="name asc",
+            limit=page_size,
+        )
+        if not records:
+            break
+
+        yield from records
+
+        last_name = records[-1]._keyset_name
+        if remaining is not None:
+            remaining -= len(records)
+        if len(records) < page_size:
+            break
+
+
+def with_keyset(doctype, filters, last_name):
+    """Add a `name > last_name` condition to dict or list filters."""
+    if last_name is None:
+        return filters
+
+    condition = [doctype, "name", ">", last_name]
+    if not filters:
+        return [condition]
+    if isinstance(filters, dict):
+        filters = [
+            [doctype, key, *(value if isinstance(value, (list, tuple)) else ["=", value])]
+            for key, value in filters.items()
+        ]
+
+    return list(filters) + [condition]
+
+
+def iter_file_rows(file_url):
+    """Yield rows of an uploaded CSV or XLSX file as dicts keyed by the header row."""
+    path = frappe.get_doc("File", {"file_url": file_url}).get_full_path()
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+            for values in rows:
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+
+    elif extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                yield {(key or "").strip(): value for key, value in row.items()}
+
+    else:
+        frappe.throw(_("Only CSV and XLSX files can be imported"))
+
+
+def make_recipient(list_name, row, mobile_field, name_field=None, data_fields=None):
+    """Values of one WhatsApp List Recipient row, None if the row has no usable number."""
+    mobile = row.get(mobile_field)
+    if mobile is None or not NON_DIGITS.sub("", str(mobile)):
+        return None
+
+    if data_fields is None:
+        # Files without explicit data fields pass every other column on
+        data_fields = [key for key in row if key not in (mobile_field, name_field) and not key.startswith("_")]
+
+    recipient_data = {}
+    for field in data_fields or []:
+        if row.get(field):
+            # Use field name as the variable name in recipient data
+            recipient_data[field.lower().replace(" ", "_")] = row.get(field)
+
+    return (
+        list_name,
+        mobile,
+        row.get(name_field) if name_field else None,
+        json.dumps(recipient_data, default=str),
+    )
+
+
+def write_recipients(rows, country_code=None):
+    """
+    Normalise the numbers of a chunk and insert it in one multi-row insert.
+
+    Returns:
+        number of rows written, rows with invalid numbers are dropped
+    """
+    timestamp = now()
+    user = frappe.session.user
+    numbers = normalize_numbers([row[1] for row in rows], country_code)
+    values = [
+        (row[0], number) + row[2:] + (timestamp, timestamp, user, user)
+        for row, number in zip(rows, numbers)
+        if is_valid_number(number)
+    ]
+    if values:
+        frappe.db.bulk_insert("WhatsApp List Recipient", RECIPIENT_FIELDS, values)
+    frappe.db.commit()
+    return len(values)
+
+
+def get_last_recipient_name(list_name):
+    """Highest imported recipient name of a list, 0 if it has none."""
+    return cint(frappe.db.sql(
+        "SELECT MAX(name) FROM `tabWhatsApp List Recipient` WHERE recipient_list = %s", list_name
+    )[0][0])
+
+
+def remove_replaced_recipients(list_name, replaced_up_to):
+    """Remove table recipients and imported recipients up to `replaced_up_to` of a list."""
+    frappe.db.delete("WhatsApp List Recipient", {
+        "recipient_list": list_name,
+        "name": ["<=", replaced_up_to],
+    })
+    frappe.db.delete("WhatsApp Recipient", {
+        "parent": list_name,
+        "parenttype": "WhatsApp Recipient List",
+    })
+
+
+def count_list_recipients(list_name):
+    return frappe.db.count("WhatsApp Recipient", {
+        "parent": list_name,
+        "parenttype": "WhatsApp Recipient List",
+    }) + frappe.db.count("WhatsApp List Recipient", {"recipient_list": list_name})
+
+
+def iter_list_recipients(list_name, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Yield every recipient of a list: table rows first, then imported rows
+    read in keyset pages on the (recipient_list, name) index.
+    """
+    fields = ["mobile_number", "name", "recipient_name", "recipient_data"]
+    yield from frappe.get_all(
+        "WhatsApp Recipient",
+        filters={"parent": list_name, "parenttype": "WhatsApp Recipient List"},
+        fields=fields,
+        order_by="idx asc",
+    )
+
+    last_name = 0
+    while True:
+        recipients = frappe.get_all(
+            "WhatsApp List Recipient",
+            filters={"recipient_list": list_name, "name": [">", last_name]},
+            fields=fields,
+            order_by="name asc",
+            limit=chunk_size,
+        )
+        if not recipients:
+            break
+
+        yield from recipients
+        last_name = recipients[-1].name
+
+
+def publish_import_progress(list_name, count, user=None, done=False, rejected=0):
+    frappe.publish_realtime(
+        IMPORT_PROGRESS_EVENT,
+        {"list_name": list_name, "count": count, "rejected": rejected, "done": done},
+        doctype="WhatsApp Recipient List",
+        docname=list_name,
+        user=user,
+        after_commit=False,
+    )
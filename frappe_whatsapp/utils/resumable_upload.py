@@ -0,0 +1,93 @@
+"""Streaming uploads through Meta's Resumable Upload API."""
+import os
+import time
+
+import magic
+import requests
+
+REQUEST_TIMEOUT = (10, 300)
+MAX_ATTEMPTS = 5
+# Seconds to wait before retry n (doubles each attempt)
+RETRY_BASE_SECONDS = 1
+
+
+def upload_file(base_url, app_id, token, path, file_type=None):
+    """
+    Upload a file and return its handle (used as template header samples).
+
+    The file is streamed from disk, never read into memory. If the
+    transfer breaks, the committed offset is read back from the session
+    and the upload continues from there.
+
+    Args:
+        base_url: Graph API base, e.g. "https://graph.facebook.com/v18.0"
+        app_id: Meta App ID owning the upload session
+        token: Access token
+        path: Absolute path of the file
+        file_type: MIME type, detected from the content if not given
+
+    Returns:
+        upload handle ("h")
+    """
+    file_length = os.path.getsize(path)
+    file_type = file_type or magic.Magic(mime=True).from_file(path)
+    session_id = start_upload_session(base_url, app_id, token, file_length, file_type)
+
+    offset = 0
+    attempt = 0
+    while True:
+        try:
+            return upload_from_offset(base_url, session_id, token, path, offset)
+        except requests.RequestException as e:
+            attempt += 1
+            status_code = e.response.status_code if e.response is not None else None
+            if attempt >= MAX_ATTEMPTS or (status_code and status_code < 500):
+                raise
+
+            time.sleep(RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+            offset = get_upload_offset(base_url, session_id, token)
+
+
+def start_upload_session(base_url, app_id, token, file_length, file_type):
+    """Open an upload session, returns its id ("upload:...")."""
+    response = requests.post(
+        f"{base_url}/{app_id}/uploads",
+        params={
+            "file_length": file_length,
+            "file_type": file_type,
+            "access_token": token,
+        },
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+def upload_from_offset(base_url, session_id, token, path, offset):
+    """Stream the file from `offset` to the end, returns the handle once complete."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        # requests streams file objects and sends the remaining length
+        response = requests.post(
+            f"{base_url}/{session_id}",
+            headers={
+                "Authorization": f"OAuth {token}",
+                "file_offset": str(offset),
+            },
+            data=f,
+            timeout=REQUEST_TIMEOUT,
+        )
+
+    response.raise_for_status()
+    return response.json()["h"]
+
+
+def get_upload_offset(base_url, session_id, token):
+    """Bytes of the file Meta has committed for the session."""
+    response = requests.get(
+        f"{base_url}/{session_id}",
+        headers={"Authorization": f"OAuth {token}"},
+        timeout=REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    return int(response.json().get("file_offset", 0))
@@ -0,0 +1,146 @@
+"""Retry engine for failed outgoing WhatsApp messages."""
+import random
+import time
+
+import frappe
+from frappe.utils import add_to_date, cint, now_datetime
+
+from frappe_whatsapp.utils.dispatcher import send_batch
+from frappe_whatsapp.utils.metrics import timed
+
+RETRY_BATCH_SIZE = 100
+# A claimed row is owned by the claiming job until the lease runs out
+LEASE_SECONDS = 300
+# Stop claiming new batches after this long, so a tick never overlaps the next
+TIME_BUDGET_SECONDS = 50
+
+
+@timed("whatsapp_job_seconds", job="process_retries")
+def process_retries():
+    """
+    Scheduled job to retry failed messages that are due.
+
+    Due rows are claimed in bounded batches under a lease, so overlapping
+    scheduler ticks never pick up the same message, and each batch is sent
+    through the concurrent dispatcher.
+    """
+    started = time.monotonic()
+    totals = {"sent": 0, "failed": 0, "deferred": 0}
+
+    while time.monotonic() - started < TIME_BUDGET_SECONDS:
+        names = claim_due_messages(RETRY_BATCH_SIZE)
+        if not names:
+            break
+
+        result = retry_claimed_messages(names)
+        for key in totals:
+            totals[key] += result.get(key, 0)
+
+        if len(names) < RETRY_BATCH_SIZE:
+            break
+
+    return totals
+
+
+def claim_due_messages(limit=RETRY_BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+    """
+    Claim up to `limit` due messages and return their names.
+
+    The claim is a single UPDATE, committed straight away, so concurrent
+    workers see the lease and skip the rows.
+    """
+    now = now_datetime()
+    token = frappe.generate_hash(length=16)
+
+    frappe.db.sql("""
+        UPDATE `tabWhatsApp Message`
+        SET retry_lease_token = %(token)s, retry_lease_until = %(lease_until)s
+        WHERE status = 'Retrying'
+            AND next_retry_time <= %(now)s
+            AND (retry_lease_until IS NULL OR retry_lease_until < %(now)s)
+        ORDER BY next_retry_time
+        LIMIT %(limit)s
+    """, {
+        "token": token,
+        "lease_until": add_to_date(now, seconds=lease_seconds),
+        "now": now,
+        "limit": cint(limit),
+    })
+    frappe.db.commit()
+
+    return frappe.get_all(
+        "WhatsApp Message",
+        filters={"retry_lease_token": token},
+        order_by="next_retry_time asc",
+        pluck="name"
+    )
+
+
+def retry_claimed_messages(names):
+    """Send claimed messages within each account's retry budget."""
+    docs = [frappe.get_doc("WhatsApp Message", name) for name in names]
+
+    by_account = {}
+    for doc in docs:
+        by_account.setdefault(doc.whatsapp_account, []).append(doc)
+
+    to_send = []
+    deferred = []
+    for account, account_docs in by_account.items():
+        granted = acquire_retry_budget(account, len(account_docs))
+        to_send.extend(account_docs[:granted])
+        deferred.extend(account_docs[granted:])
+
+    result = send_batch(to_send) if to_send else {"sent": 0, "failed": 0}
+
+    for doc in to_send:
+        try:
+            doc.save(ignore_permissions=True)
+        except Exception as e:
+            frappe.log_error(f"Retry failed for {doc.name}: {str(e)}", "WhatsApp Retry Error")
+
+    if deferred:
+        defer_messages([doc.name for doc in deferred])
+
+    frappe.db.commit()
+
+    result["deferred"] = len(deferred)
+    return result
+
+
+def acquire_retry_budget(account_name, requested):
+    """
+    Take up to `requested` retries from the account's per-minute budget.
+
+    Returns:
+        Number of retries granted
+    """
+    limit = cint(frappe.get_cached_value("WhatsApp Account", account_name, "retry_budget_per_minute"))
+    if limit <= 0:
+        return requested
+
+    key = frappe.cache.make_key(f"whatsapp_retry_budget:{account_name}:{int(time.time() // 60)}")
+    used = cint(frappe.cache.incrby(key, requested))
+    if used == requested:
+        frappe.cache.expire(key, 120)
+
+    granted = max(0, min(requested, limit - (used - requested)))
+    if granted < requested:
+        frappe.cache.decrby(key, requested - granted)
+
+    return granted
+
+
+def defer_messages(names):
+    """Push messages over budget into the next minute and release their lease."""
+    for name in names:
+        frappe.db.set_value(
+            "WhatsApp Message",
+            name,
+            {
+                "next_retry_time": add_to_date(now_datetime(), seconds=60 + random.randint(0, 60)),
+                "retry_lease_token": None,
+                "retry_lease_until": None,
+            },
+            update_modified=False,
+        )
@@ -1,54 +1,192 @@
 """Scheduler for WhatsApp messages."""
+import time
+from datetime import datetime
+
 import frappe
-from frappe.utils import now_datetime, get_datetime
+from frappe.utils import add_to_date, now_datetime, get_datetime
+
+from frappe_whatsapp.utils.dispatcher import send_batch
+from frappe_whatsapp.utils.metrics import timed
+
+SCHEDULE_QUEUE_KEY = "whatsapp_scheduled_messages"
+# How long one poller run keeps popping due messages (runs every minute)
+POLL_SECONDS = 55
+DISPATCH_BATCH_SIZE = 50
+# Pending rows this far past their time were missed by the queue
+# (e.g. Redis was flushed) and are picked up from the table instead
+DB_FALLBACK_GRACE_SECONDS = 120
+# Leave the rest of the run to the delay queue
+DB_FALLBACK_TIME_BUDGET_SECONDS = 30
+
+EPOCH = datetime(1970, 1, 1)
 
 
+@timed("whatsapp_job_seconds", job="process_scheduled_messages")
 def process_scheduled_messages():
     """
     Scheduled job to process pending scheduled messages.
-    Should run every minute or very frequently.
+    Runs every minute and polls the delay queue with second-level precision.
     """
-    current_time = now_datetime()
-    
-    # Find active messages scheduled for now or past
-    messages = frappe.get_all(
-        "WhatsApp Message",
-        filters={
+    started = time.monotonic()
+    poll_seconds = 0 if frappe.flags.in_test else POLL_SECONDS
+
+    dispatch_overdue_from_db()
+
+    while True:
+        while dispatch_due_messages() == DISPATCH_BATCH_SIZE:
+            pass
+
+        remaining = poll_seconds - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+
+        next_due = get_next_due_score()
+        wait = 1 if next_due is None else next_due - _to_score(now_datetime())
+        time.sleep(min(max(wait, 0.1), 1, remaining))
+
+
+def dispatch_due_messages(limit=DISPATCH_BATCH_SIZE):
+    """Pop due messages off the queue and send them, returns number popped."""
+    names = pop_due_messages(limit)
+    if names:
+        dispatch_scheduled_messages(names)
+
+    return len(names)
+
+
+def dispatch_overdue_from_db():
+    """Durable backup: send pending rows the queue should have sent by now."""
+    started = time.monotonic()
+    cutoff = add_to_date(now_datetime(), seconds=-DB_FALLBACK_GRACE_SECONDS)
+    # Rows that could not be claimed are not fetched again in this run
+    tried = []
+
+    while time.monotonic() - started < DB_FALLBACK_TIME_BUDGET_SECONDS:
+        filters = {
             "is_scheduled": 1,
-            "scheduled_time": ["<=", current_time],
             "scheduling_status": "Pending",
-            "status": ["!=", "Sent"] # Double check status
-        },
-        fields=["name"]
-    )
-    
-    for msg in messages:
+            "scheduled_time": ["<=", cutoff],
+        }
+        if tried:
+            filters["name"] = ["not in", tried]
+
+        names = frappe.get_all(
+            "WhatsApp Message",
+            filters=filters,
+            order_by="scheduled_time asc",
+            limit=DISPATCH_BATCH_SIZE,
+            pluck="name"
+        )
+        if not names:
+            break
+
+        tried.extend(names)
+        for name in names:
+            remove_from_schedule_queue(name)
+        dispatch_scheduled_messages(names)
+
+        if len(names) < DISPATCH_BATCH_SIZE:
+            break
+
+
+def dispatch_scheduled_messages(names):
+    """Send the given scheduled messages through the batched dispatcher."""
+    claimed = claim_scheduled_messages(names)
+
+    docs = []
+    for name in claimed:
+        try:
+            docs.append(frappe.get_doc("WhatsApp Message", name))
+        except Exception as e:
+            frappe.db.set_value(
+                "WhatsApp Message", name, {"status": "Failed", "last_error": str(e)}, update_modified=False
+            )
+            frappe.log_error(f"Failed to send scheduled message {name}: {e}", "WhatsApp Scheduler")
+
+    if docs:
+        send_batch(docs)
+
+    for doc in docs:
         try:
-            doc = frappe.get_doc("WhatsApp Message", msg.name)
-            
-            # Verify status again
-            if doc.scheduling_status != "Pending":
-                continue
-                
-            # Send message
-            doc.send()
-            
-            # Update status
-            doc.scheduling_status = "Sent"
             doc.save(ignore_permissions=True)
-            frappe.db.commit()
-            
         except Exception as e:
-            frappe.log_error(f"Failed to send scheduled message {msg.name}: {e}", "WhatsApp Scheduler")
-            
-            # Mark as failed in logs but maybe retry later?
-            # For now just log error.
+            frappe.log_error(f"Failed to save scheduled message {doc.name}: {e}", "WhatsApp Scheduler")
+
+    frappe.db.commit()
+
+
+def claim_scheduled_messages(names):
+    """
+    Mark pending rows as sent before sending them and return their names.
+
+    The claim is committed straight away, so a concurrent run, or a later
+    pass after a failed save, never sends the same message again.
+    """
+    # Lock the rows so a concurrent run waits and then sees them claimed
+    pending = frappe.db.sql_list("""
+        SELECT name FROM `tabWhatsApp Message`
+        WHERE name IN %(names)s
+            AND is_scheduled = 1
+            AND scheduling_status = 'Pending'
+        FOR UPDATE
+    """, {"names": names})
+
+    if pending:
+        frappe.db.sql("""
+            UPDATE `tabWhatsApp Message`
+            SET scheduling_status = 'Sent'
+            WHERE name IN %(names)s AND scheduling_status = 'Pending'
+        """, {"names": pending})
+    frappe.db.commit()
+
+    return pending
+
+
+def get_queue_key():
+    return frappe.cache.make_key(SCHEDULE_QUEUE_KEY)
+
+
+def add_to_schedule_queue(message_name, scheduled_time):
+    """Add (or move) a message in the delay queue."""
+    frappe.cache.zadd(get_queue_key(), {message_name: _to_score(scheduled_time)})
+
+
+def remove_from_schedule_queue(message_name):
+    frappe.cache.zrem(get_queue_key(), message_name)
+
+
+def pop_due_messages(limit=DISPATCH_BATCH_SIZE):
+    """
+    Pop up to `limit` due messages from the delay queue.
+
+    A member belongs to whichever poller removes it, so two pollers never
+    pop the same message.
+    """
+    key = get_queue_key()
+    due = frappe.cache.zrangebyscore(key, "-inf", _to_score(now_datetime()), start=0, num=limit)
+
+    return [
+        frappe.safe_decode(name)
+        for name in due
+        if frappe.cache.zrem(key, name)
+    ]
+
+
+def get_next_due_score():
+    """Score of the earliest queued message, None when the queue is empty."""
+    head = frappe.cache.zrange(get_queue_key(), 0, 0, withscores=True)
+    return head[0][1] if head else None
+
+
+def _to_score(value):
+    """Seconds since epoch of a naive datetime in system time."""
+    return (get_datetime(value) - EPOCH).total_seconds()
 
 
 @frappe.whitelist()
 def schedule_message(to, message, scheduled_time, whatsapp_account=None):
     """API to schedule a message."""
-    
+
     if get_datetime(scheduled_time) <= now_datetime():
         frappe.throw("Scheduled time must be in the future")
 
@@ -63,7 +201,8 @@ def schedule_message(to, message, scheduled_time, whatsapp_account=None):
         "scheduling_status": "Pending",
         "status": "Queued"
     })
-    
+
+    # Queued by WhatsAppMessage.on_update once the insert commits
     doc.insert(ignore_permissions=True)
     return doc.name
 
@@ -72,12 +211,13 @@ def schedule_message(to, message, scheduled_time, whatsapp_account=None):
 def cancel_scheduled_message(message_name):
     """Cancel a pending scheduled message."""
     doc = frappe.get_doc("WhatsApp Message", message_name)
-    
+
     if not doc.is_scheduled or doc.scheduling_status != "Pending":
         frappe.throw("Message is not in pending schedule state")
-        
+
     doc.scheduling_status = "Cancelled"
     doc.status = "Cancelled"
     doc.save(ignore_permissions=True)
-    
+    remove_from_schedule_queue(doc.name)
+
     return True
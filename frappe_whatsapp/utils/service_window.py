@@ -0,0 +1,84 @@
+"""24-hour customer service window per (account, contact), tracked in Redis."""
+import time
+
+import frappe
+from frappe.utils import cint, get_datetime, now_datetime
+
+from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_conversation.whatsapp_conversation import (
+    get_conversation_name,
+)
+from frappe_whatsapp.utils.conversation import SERVICE_WINDOW_HOURS
+
+WINDOW_KEY_PREFIX = "whatsapp_service_window"
+WINDOW_SECONDS = SERVICE_WINDOW_HOURS * 60 * 60
+# How long a closed window is remembered before the conversation is read again
+CLOSED_CACHE_SECONDS = 300
+
+
+class ServiceWindowClosed(Exception):
+    """A free-form message was sent outside the customer service window."""
+
+
+def record_inbound(whatsapp_account, number, timestamp=None):
+    """
+    Open (or extend) the window after a message from the contact.
+
+    Args:
+        whatsapp_account: Account that received the message
+        number: Normalised number of the contact
+        timestamp: Unix time the contact sent the message, defaults to now
+    """
+    if not (whatsapp_account and number):
+        return
+
+    now = time.time()
+    expires = (cint(timestamp) or now) + WINDOW_SECONDS
+    if expires <= now:
+        return
+
+    key = _get_key(whatsapp_account, number)
+    # Webhooks may arrive out of order; never shorten an open window
+    if cint(frappe.cache.get(key)) >= expires:
+        return
+
+    frappe.cache.set(key, int(expires), ex=int(expires - now) + 1)
+
+
+def is_window_open(whatsapp_account, number):
+    """
+    Whether free-form messages to `number` are allowed right now.
+
+    One Redis read; the conversation is only consulted when the tracker
+    has no entry (e.g. after a cache flush) and the result is cached.
+    """
+    if not (whatsapp_account and number):
+        return False
+
+    key = _get_key(whatsapp_account, number)
+    expires = frappe.cache.get(key)
+    if expires is None:
+        expires = _load_window(whatsapp_account, number, key)
+
+    return cint(expires) > time.time()
+
+
+def _load_window(whatsapp_account, number, key):
+    window = frappe.db.get_value(
+        "WhatsApp Conversation",
+        get_conversation_name(whatsapp_account, number),
+        "service_window_expires",
+    )
+    remaining = (get_datetime(window) - now_datetime()).total_seconds() if window else 0
+
+    if remaining > 0:
+        expires = int(time.time() + remaining)
+        frappe.cache.set(key, expires, ex=int(remaining) + 1)
+    else:
+        expires = 0
+        frappe.cache.set(key, expires, ex=CLOSED_CACHE_SECONDS)
+
+    return expires
+
+
+def _get_key(whatsapp_account, number):
+    return frappe.cache.make_key(f"{WINDOW_KEY_PREFIX}:{whatsapp_account}:{number}")
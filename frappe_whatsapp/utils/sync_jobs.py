@@ -0,0 +1,232 @@
+"""Background sync of templates and flows from Meta."""
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import frappe
+import requests
+
+from frappe_whatsapp.utils.template_sync import sync_account_templates
+
+SYNC_PROGRESS_EVENT = "whatsapp_sync_progress"
+SYNC_QUEUE = "long"
+SYNC_TIMEOUT = 3600
+# Concurrent flow asset downloads per account
+FLOW_ASSET_POOL_SIZE = 8
+REQUEST_TIMEOUT = 30
+
+
+@frappe.whitelist()
+def enqueue_template_sync(whatsapp_account=None):
+    """Start one template sync job per account, returns the accounts queued."""
+    frappe.only_for("System Manager")
+    return _fan_out("templates", whatsapp_account)
+
+
+@frappe.whitelist()
+def enqueue_flow_sync(whatsapp_account=None):
+    """Start one flow sync job per account, returns the accounts queued."""
+    frappe.only_for("System Manager")
+    return _fan_out("flows", whatsapp_account)
+
+
+def scheduled_sync():
+    """Scheduled job to refresh templates and flows of accounts with daily sync enabled."""
+    accounts = frappe.get_all(
+        "WhatsApp Account",
+        filters={"status": "Active", "sync_from_meta_daily": 1},
+        pluck="name",
+    )
+    for account in accounts:
+        _enqueue_sync("templates", account, user=None)
+        _enqueue_sync("flows", account, user=None)
+
+
+def run_sync(kind, whatsapp_account, user=None):
+    """Background job: sync one account and stream progress to `user`."""
+    def progress(counts):
+        publish_progress(kind, whatsapp_account, counts, user=user)
+
+    try:
+        if kind == "templates":
+            counts = sync_account_templates(whatsapp_account, progress=progress)
+        else:
+            counts = sync_account_flows(whatsapp_account, progress=progress)
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"{kind.title()} sync failed for {whatsapp_account}: {e}", "WhatsApp Sync")
+        publish_progress(kind, whatsapp_account, {}, user=user, done=True, error=str(e))
+        return
+
+    publish_progress(kind, whatsapp_account, counts, user=user, done=True)
+    return counts
+
+
+def publish_progress(kind, whatsapp_account, counts, user=None, done=False, error=None):
+    if not user:
+        return
+
+    frappe.publish_realtime(
+        SYNC_PROGRESS_EVENT,
+        {
+            "kind": kind,
+            "whatsapp_account": whatsapp_account,
+            "counts": counts,
+            "done": done,
+            "error": error,
+        },
+        user=user,
+        after_commit=False,
+    )
+
+
+def sync_account_flows(whatsapp_account, progress=None, pool_size=FLOW_ASSET_POOL_SIZE):
+    """
+    Import new flows and update existing ones for an account.
+
+    Flow JSON assets (two requests per flow) are fetched concurrently on a
+    bounded pool; each flow is written on the main thread as soon as its
+    assets arrive, with one commit per flow.
+
+    Returns:
+        dict with imported, updated and skipped counts
+    """
+    from frappe_whatsapp.frappe_whatsapp.doctype.whatsapp_flow.whatsapp_flow import (
+        parse_flow_json_to_screens,
+    )
+
+    account = frappe.get_doc("WhatsApp Account", whatsapp_account)
+    base_url = f"{account.url}/{account.version}"
+    headers = {"Authorization": f"Bearer {account.get_password('token')}"}
+
+    flows = list_flows(base_url, account.business_id, headers)
+    existing = dict(frappe.get_all(
+        "WhatsApp Flow",
+        filters={"flow_id": ["in", [flow["id"] for flow in flows] or [""]]},
+        fields=["flow_id", "name"],
+        as_list=True,
+    ))
+    result = {"imported": 0, "updated": 0, "skipped": 0, "total": len(flows)}
+
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        futures = {pool.submit(fetch_flow_json, base_url, headers, flow["id"]): flow for flow in flows}
+
+        for future in as_completed(futures):
+            flow = futures[future]
+            try:
+                flow_json = future.result()
+            except Exception as e:
+                frappe.log_error(f"Failed to fetch flow JSON for {flow['id']}: {e}", "WhatsApp Sync")
+                flow_json = None
+
+            try:
+                if flow["id"] in existing:
+                    flow_doc = frappe.get_doc("WhatsApp Flow", existing[flow["id"]])
+                    result_key = "updated"
+                else:
+                    flow_doc = frappe.get_doc({
+                        "doctype": "WhatsApp Flow",
+                        "flow_name": flow.get("name") or f"Flow {flow['id']}",
+                        "whatsapp_account": whatsapp_account,
+                        "flow_id": flow["id"],
+                    })
+                    result_key = "imported"
+
+                flow_doc.status = flow.get("status", "Draft").title()
+                if flow.get("categories"):
+                    flow_doc.category = flow["categories"][0]
+                elif flow_doc.is_new():
+                    flow_doc.category = "OTHER"
+
+                if flow_json:
+                    flow_doc.flow_json = json.dumps(flow_json, indent=2)
+                    flow_doc.data_api_version = flow_json.get("version", "6.0")
+                    flow_doc.screens = []
+                    flow_doc.fields = []
+                    parse_flow_json_to_screens(flow_doc, flow_json)
+
+                flow_doc.flags.ignore_validate = True
+                flow_doc.save(ignore_permissions=True)
+                frappe.db.commit()
+                result[result_key] += 1
+            except Exception as e:
+                frappe.db.rollback()
+                frappe.log_error(f"Failed to sync flow {flow['id']}: {e}", "WhatsApp Sync")
+                result["skipped"] += 1
+
+            if progress:
+                progress(result)
+
+    return result
+
+
+def list_flows(base_url, business_id, headers):
+    """All flows of a WABA, following pagination."""
+    flows = []
+    url = f"{base_url}/{business_id}/flows"
+    params = {"fields": "id,name,status,categories", "limit": 100}
+
+    with requests.Session() as session:
+        while url:
+            response = session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            page = response.json()
+            flows.extend(page.get("data", []))
+            url = page.get("paging", {}).get("next")
+            params = None
+
+    return flows
+
+
+def fetch_flow_json(base_url, headers, flow_id):
+    """
+    Download a flow's flow.json asset, None if it has none.
+    Makes no database calls, so it can run on worker threads.
+    """
+    response = requests.get(f"{base_url}/{flow_id}/assets", headers=headers, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+
+    for asset in response.json().get("data", []):
+        if asset.get("name") == "flow.json" and asset.get("download_url"):
+            asset_response = requests.get(asset["download_url"], headers=headers, timeout=REQUEST_TIMEOUT)
+            if asset_response.status_code == 200:
+                return asset_response.json()
+
+    return None
+
+
+def _fan_out(kind, whatsapp_account=None):
+    if whatsapp_account:
+        accounts = [whatsapp_account]
+    else:
+        accounts = frappe.get_all("WhatsApp Account", filters={"status": "Active"}, pluck="name")
+
+    return [
+        account for account in accounts
+        if _enqueue_sync(kind, account, user=frappe.session.user)
+    ]
+
+
+def _enqueue_sync(kind, whatsapp_account, user=None):
+    """Enqueue a sync unless one is already queued or running for the account."""
+    lock_key = frappe.cache.make_key(f"whatsapp_sync:{kind}:{whatsapp_account}")
+    if not frappe.cache.set(lock_key, 1, nx=True, ex=SYNC_TIMEOUT):
+        return False
+
+    frappe.enqueue(
+        "frappe_whatsapp.utils.sync_jobs._run_locked_sync",
+        queue=SYNC_QUEUE,
+        timeout=SYNC_TIMEOUT,
+        kind=kind,
+        whatsapp_account=whatsapp_account,
+        user=user,
+        lock_key=lock_key,
+    )
+    return True
+
+
+def _run_locked_sync(kind, whatsapp_account, user=None, lock_key=None):
+    try:
+        return run_sync(kind, whatsapp_account, user=user)
+    finally:
+        if lock_key:
+            frappe.cache.delete(lock_key)
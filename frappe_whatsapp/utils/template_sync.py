@@ -0,0 +1,234 @@
+"""Incremental sync of message templates from Meta."""
+import hashlib
+import json
+
+import frappe
+import requests
+
+# Only the template fields the sync stores
+TEMPLATE_FIELDS = "id,name,status,language,category,components"
+PAGE_LIMIT = 100
+REQUEST_TIMEOUT = 30
+
+BUTTON_TYPES = {
+    "URL": "Visit Website",
+    "PHONE_NUMBER": "Call Phone",
+    "QUICK_REPLY": "Quick Reply",
+    "FLOW": "Flow"
+}
+
+
+class TemplateSyncError(Exception):
+    """Raised when Meta rejects a template listing request."""
+    pass
+
+
+def sync_templates(accounts=None):
+    """
+    Sync templates of all active accounts (or the given ones).
+
+    Returns:
+        dict of account name -> counts, or the error message for failed accounts
+    """
+    if accounts is None:
+        accounts = frappe.get_all("WhatsApp Account", filters={"status": "Active"}, pluck="name")
+
+    results = {}
+    for account_name in accounts:
+        try:
+            results[account_name] = sync_account_templates(account_name)
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(f"Template sync failed for {account_name}: {e}", "WhatsApp Template Sync")
+            results[account_name] = {"error": str(e)}
+
+    return results
+
+
+def sync_account_templates(account_name, progress=None):
+    """
+    Page through an account's templates and write only what changed.
+
+    Each page is fetched with a field projection, diffed against the
+    stored content hashes and written in one transaction.
+
+    Args:
+        account_name: WhatsApp Account name
+        progress: Optional callback, called with the counts after each page
+
+    Returns:
+        dict with inserted, updated, unchanged and pages counts
+    """
+    account = frappe.get_doc("WhatsApp Account", account_name)
+    headers = {"authorization": f"Bearer {account.get_password('token')}"}
+    url = f"{account.url}/{account.version}/{account.business_id}/message_templates"
+    params = {"fields": TEMPLATE_FIELDS, "limit": PAGE_LIMIT}
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "pages": 0}
+
+    with requests.Session() as session:
+        while url:
+            page = get_page(session, url, params, headers)
+
+            for key, value in apply_template_page(account_name, page.get("data", [])).items():
+                counts[key] += value
+            counts["pages"] += 1
+            frappe.db.commit()
+
+            if progress:
+                progress(counts)
+
+            # The next link already carries the query parameters
+            url = page.get("paging", {}).get("next")
+            params = None
+
+    return counts
+
+
+def get_page(session, url, params, headers):
+    response = session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+    if not response.ok:
+        try:
+            error = response.json().get("error", {})
+            message = error.get("error_user_msg", error.get("message"))
+        except ValueError:
+            message = None
+        raise TemplateSyncError(message or f"Meta returned HTTP {response.status_code}")
+
+    return response.json()
+
+
+def apply_template_page(account_name, templates):
+    """Insert new templates and update changed ones, returns the counts."""
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not templates:
+        return counts
+
+    stored = frappe.get_all(
+        "WhatsApp Templates",
+        filters={"id": ["in", [t["id"] for t in templates]]},
+        fields=["name", "id", "meta_hash"],
+    )
+    by_id = {row.id: row for row in stored}
+
+    # Templates created locally before their id was known
+    by_name = {}
+    missing = [t["name"] for t in templates if t["id"] not in by_id]
+    if missing:
+        for row in frappe.get_all(
+            "WhatsApp Templates",
+            filters={"actual_name": ["in", missing]},
+            fields=["name", "actual_name", "language_code", "meta_hash"],
+        ):
+            by_name[(row.actual_name, row.language_code)] = row
+
+    for template in templates:
+        meta_hash = get_template_hash(account_name, template)
+        row = by_id.get(template["id"]) or by_name.get((template["name"], template["language"]))
+
+        if row and row.meta_hash == meta_hash:
+            counts["unchanged"] += 1
+            continue
+
+        values, buttons = parse_template(template)
+        values.update({"whatsapp_account": account_name, "meta_hash": meta_hash})
+
+        if row:
+            frappe.db.set_value("WhatsApp Templates", row.name, values)
+            if buttons is not None:
+                replace_buttons(row.name, buttons)
+            counts["updated"] += 1
+        else:
+            insert_template(template, values, buttons or [])
+            counts["inserted"] += 1
+
+    return counts
+
+
+def parse_template(template):
+    """
+    Map a Meta template to WhatsApp Templates values.
+
+    Returns:
+        tuple of (values, buttons); buttons is None when the template has no
+        BUTTONS component, so stored buttons are left alone
+    """
+    values = {
+        "status": template["status"],
+        "language_code": template["language"],
+        "category": template["category"],
+        "id": template["id"],
+    }
+    buttons = None
+
+    for component in template.get("components", []):
+        if component["type"] == "HEADER":
+            values["header_type"] = component["format"]
+            if component["format"] == "TEXT":
+                values["header"] = component["text"]
+
+        elif component["type"] == "FOOTER":
+            values["footer"] = component["text"]
+
+        elif component["type"] == "BODY":
+            values["template"] = component["text"]
+            if component.get("example", {}).get("body_text"):
+                values["sample_values"] = ",".join(component["example"]["body_text"][0])
+
+        elif component["type"] == "BUTTONS":
+            buttons = [parse_button(button, i) for i, button in enumerate(component.get("buttons", []), start=1)]
+
+    return values, buttons
+
+
+def parse_button(button, sequence):
+    btn = {
+        "button_type": BUTTON_TYPES[button["type"]],
+        "button_label": button.get("text"),
+        "sequence": sequence,
+    }
+
+    if button["type"] == "URL":
+        btn["website_url"] = button.get("url")
+        btn["url_type"] = "Dynamic" if "{{" in (btn["website_url"] or "") else "Static"
+        if button.get("example"):
+            btn["example_url"] = ",".join(button["example"])
+    elif button["type"] == "PHONE_NUMBER":
+        btn["phone_number"] = button.get("phone_number")
+    elif button["type"] == "FLOW":
+        btn["flow"] = button.get("flow")
+
+    return btn
+
+
+def insert_template(template, values, buttons):
+    """Insert a template without hooks (they would post it back to Meta)."""
+    doc = frappe.new_doc("WhatsApp Templates")
+    doc.template_name = template["name"]
+    doc.actual_name = template["name"]
+    doc.update(values)
+    for button in buttons:
+        doc.append("buttons", button)
+
+    doc.db_insert()
+    for child in doc.buttons:
+        child.parent = doc.name
+        child.db_insert()
+
+
+def replace_buttons(template_name, buttons):
+    frappe.db.delete("WhatsApp Button", {"parent": template_name, "parenttype": "WhatsApp Templates"})
+    for idx, button in enumerate(buttons, start=1):
+        frappe.get_doc({
+            "doctype": "WhatsApp Button",
+            "parent": template_name,
+            "parenttype": "WhatsApp Templates",
+            "parentfield": "buttons",
+            "idx": idx,
+            **button,
+        }).db_insert()
+
+
+def get_template_hash(account_name, template):
+    """Content hash of a template as returned by Meta."""
+    content = json.dumps([account_name, template], sort_keys=True, separators=(",", ":"))
+    return hashlib.md5(content.encode()).hexdigest()
@@ -9,6 +9,17 @@ from werkzeug.wrappers import Response
 import frappe.utils
 
 from frappe_whatsapp.utils import get_whatsapp_account
+from frappe_whatsapp.utils.analytics_cube import track_status_change
+from frappe_whatsapp.utils.analytics_rollup import track_event
+from frappe_whatsapp.utils.flow_session import complete_session
+from frappe_whatsapp.utils.media_pipeline import enqueue_media_downloads
+from frappe_whatsapp.utils.message_dedupe import insert_incoming_message, is_message_seen
+from frappe_whatsapp.utils.metrics import increment, timer
+from frappe_whatsapp.utils.phone import normalize_number
+from frappe_whatsapp.utils.service_window import record_inbound
+from frappe_whatsapp.utils.webhook_log import insert_webhook_log, should_log_webhook
+
+DELIVERY_STATUS_ORDER = ("sent", "delivered", "read")
 
 
 def verify_webhook_signature(payload_bytes, signature_header):
@@ -75,13 +86,11 @@ def webhook():
 			frappe.log_error("Invalid webhook signature", "WhatsApp Security")
 			
 			# Log failed attempt
-			frappe.get_doc({
-				"doctype": "WhatsApp Webhook Log",
-				"timestamp": frappe.utils.now(),
-				"request_data": payload_bytes.decode('utf-8', errors='ignore'),
-				"headers": json.dumps(dict(frappe.request.headers)),
-				"error": "Invalid Signature"
-			}).insert(ignore_permissions=True)
+			insert_webhook_log(
+				payload_bytes.decode('utf-8', errors='ignore'),
+				dict(frappe.request.headers),
+				error="Invalid Signature"
+			)
 			
 			return Response("Forbidden", status=403)
 	
@@ -101,26 +110,35 @@ def webhook():
 @frappe.whitelist()
 def process_webhook_data(data):
 	"""Process webhook data in background."""
+	headers = dict(frappe.local.request.headers) if getattr(frappe.local, 'request', None) else {}
+	log_name = None
+	if should_log_webhook():
+		try:
+			log_name = insert_webhook_log(data, headers)
+			frappe.db.commit()
+		except Exception:
+			# Logging must never block processing
+			frappe.db.rollback()
+
 	try:
-		frappe.get_doc({
-			"doctype": "WhatsApp Webhook Log",
-			"timestamp": frappe.utils.now(),
-			"request_data": json.dumps(data),
-			"headers": json.dumps(frappe.local.request.headers) if hasattr(frappe.local, 'request') else "{}"
-		}).insert(ignore_permissions=True)
+		with timer("whatsapp_webhook_seconds"):
+			process_webhook_payload(data)
+		increment("whatsapp_webhooks_total", outcome="processed")
 	except Exception:
-		# Fallback or ignore if log fails, main priority is processing
-		pass
-		
-	# Legacy logging just in case (optional, we can remove)
-	# frappe.get_doc({
-	# 	"doctype": "WhatsApp Notification Log",
-	# 	"template": "Webhook",
-	# 	"meta_data": json.dumps(data)
-	# }).insert(ignore_permissions=True)
-	
-	frappe.db.commit()
-
+		increment("whatsapp_webhooks_total", outcome="failed")
+		# Failures are always kept, whatever the log mode
+		error = frappe.get_traceback()
+		frappe.db.rollback()
+		if log_name:
+			frappe.db.set_value("WhatsApp Webhook Log", log_name, "error", error, update_modified=False)
+		else:
+			insert_webhook_log(data, headers, error=error)
+		frappe.db.commit()
+		raise
+
+
+def process_webhook_payload(data):
+	"""Create messages and apply status updates of one webhook payload."""
 	messages = []
 	phone_id = None
 	try:
@@ -144,8 +162,14 @@ def process_webhook_data(data):
 		return
 
 	if messages:
+		media_items = []
 		for message in messages:
-			process_single_message(message, whatsapp_account, sender_profile_name)
+			media_item = process_single_message(message, whatsapp_account, sender_profile_name)
+			if media_item:
+				media_items.append(media_item)
+
+		# One job downloads all media of the webhook concurrently
+		enqueue_media_downloads(media_items)
 	else:
 		changes = None
 		try:
@@ -158,15 +182,23 @@ def process_webhook_data(data):
 
 
 def process_single_message(message, whatsapp_account, sender_profile_name):
-	"""Logic to process a single message from webhook."""
+	"""Logic to process a single message from webhook.
+
+	Returns the media download item for media messages, None otherwise.
+	"""
+	# Repeated deliveries of a stored message stop here, before any database work
+	if is_message_seen(whatsapp_account.name, message['id']):
+		return None
+
 	message_type = message['type']
+	media_item = None
 	is_reply = True if message.get('context') and 'forwarded' not in message.get('context') else False
 	reply_to_message_id = message['context']['id'] if is_reply else None
 	
 	msg_data = {
 		"doctype": "WhatsApp Message",
 		"type": "Incoming",
-		"from": message['from'],
+		"from": normalize_number(message['from']),
 		"message_id": message['id'],
 		"reply_to_message_id": reply_to_message_id,
 		"is_reply": is_reply,
@@ -174,16 +206,17 @@ def process_single_message(message, whatsapp_account, sender_profile_name):
 		"whatsapp_account": whatsapp_account.name,
 		"content_type": message_type
 	}
+	record_inbound(whatsapp_account.name, msg_data["from"], message.get("timestamp"))
 
 	if message_type == 'text':
 		msg_data["message"] = message['text']['body']
-		frappe.get_doc(msg_data).insert(ignore_permissions=True)
+		insert_incoming_message(msg_data)
 	
 	elif message_type == 'reaction':
 		msg_data["message"] = message['reaction']['emoji']
 		msg_data["reply_to_message_id"] = message['reaction']['message_id']
 		msg_data["content_type"] = "reaction"
-		frappe.get_doc(msg_data).insert(ignore_permissions=True)
+		insert_incoming_message(msg_data)
 	
 	elif message_type == 'interactive':
 		interactive_data = message['interactive']
@@ -192,7 +225,7 @@ def process_single_message(message, whatsapp_account, sender_profile_name):
 		if interactive_type in ['button_reply', 'list_reply']:
 			msg_data["message"] = interactive_data[interactive_type]['id']
 			msg_data["content_type"] = "button"
-			frappe.get_doc(msg_data).insert(ignore_permissions=True)
+			insert_incoming_message(msg_data)
 		
 		elif interactive_type == 'nfm_reply':
 			nfm_reply = interactive_data['nfm_reply']
@@ -202,81 +235,53 @@ def process_single_message(message, whatsapp_account, sender_profile_name):
 			except json.JSONDecodeError:
 				flow_response = {}
 
+			if flow_response.get("flow_token"):
+				complete_session(flow_response["flow_token"])
+
 			summary_parts = [f"{k}: {v}" for k, v in flow_response.items() if v]
 			msg_data.update({
 				"message": ", ".join(summary_parts) if summary_parts else "Flow completed",
 				"content_type": "flow",
 				"flow_response": json.dumps(flow_response)
 			})
-			frappe.get_doc(msg_data).insert(ignore_permissions=True)
-
-			frappe.publish_realtime("whatsapp_flow_response", {
-				"phone": message['from'],
-				"message_id": message['id'],
-				"flow_response": flow_response,
-				"whatsapp_account": whatsapp_account.name
-			})
+			if insert_incoming_message(msg_data):
+				frappe.publish_realtime("whatsapp_flow_response", {
+					"phone": message['from'],
+					"message_id": message['id'],
+					"flow_response": flow_response,
+					"whatsapp_account": whatsapp_account.name
+				})
 
 	elif message_type in ["image", "audio", "video", "document"]:
-		# Download in background as well (nested enqueue might be overkill, but let's keep it here for now)
 		msg_data["message"] = message[message_type].get("caption", "")
-		msg_doc = frappe.get_doc(msg_data).insert(ignore_permissions=True)
-		
-		# Separate task for media download to not block message insertion
-		frappe.enqueue(
-			"frappe_whatsapp.utils.webhook.download_media",
-			message_doc_name=msg_doc.name,
-			message_data=message[message_type],
-			message_type=message_type,
-			whatsapp_account_name=whatsapp_account.name,
-			queue="long"
-		)
+		msg_doc = insert_incoming_message(msg_data)
+
+		# Downloaded by the media pipeline, so media never blocks message insertion
+		if msg_doc:
+			media_item = {
+				"message": msg_doc.name,
+				"media_id": message[message_type]["id"],
+				"message_type": message_type,
+				"whatsapp_account": whatsapp_account.name,
+			}
 
 	elif message_type == "button":
 		msg_data["message"] = message['button']['text']
-		frappe.get_doc(msg_data).insert(ignore_permissions=True)
+		insert_incoming_message(msg_data)
 	
 	else:
 		msg_data["message"] = message[message_type].get(message_type) if isinstance(message[message_type], dict) else message[message_type]
-		frappe.get_doc(msg_data).insert(ignore_permissions=True)
+		insert_incoming_message(msg_data)
 
 	frappe.db.commit()
+	return media_item
 
 
 def download_media(message_doc_name, message_data, message_type, whatsapp_account_name):
 	"""Download media from Meta and attach to message."""
-	try:
-		whatsapp_account = frappe.get_doc("WhatsApp Account", whatsapp_account_name)
-		token = whatsapp_account.get_password("token")
-		url = f"{whatsapp_account.url}/{whatsapp_account.version}/"
-		media_id = message_data["id"]
-
-		headers = {'Authorization': 'Bearer ' + token}
-		response = requests.get(f'{url}{media_id}/', headers=headers)
-
-		if response.status_code == 200:
-			media_info = response.json()
-			media_url = media_info.get("url")
-			mime_type = media_info.get("mime_type")
-			file_extension = mime_type.split('/')[1] if '/' in mime_type else 'bin'
-
-			media_response = requests.get(media_url, headers=headers)
-			if media_response.status_code == 200:
-				file_name = f"{frappe.generate_hash(length=10)}.{file_extension}"
-				
-				file_doc = frappe.get_doc({
-					"doctype": "File",
-					"file_name": file_name,
-					"attached_to_doctype": "WhatsApp Message",
-					"attached_to_name": message_doc_name,
-					"content": media_response.content,
-					"attached_to_field": "attach"
-				}).insert(ignore_permissions=True)
-
-				frappe.db.set_value("WhatsApp Message", message_doc_name, "attach", file_doc.file_url)
-				frappe.db.commit()
-	except Exception as e:
-		frappe.log_error(f"Media download failed for {message_doc_name}: {str(e)}", "WhatsApp Media Error")
+	from frappe_whatsapp.utils.media_handler import download_media_async
+
+	download_media_async(message_doc_name, message_data, message_type, whatsapp_account_name)
 
 
 def update_status(data):
@@ -287,6 +292,17 @@ def update_status(data):
 	elif data.get("field") == "messages":
 		update_message_status(data['value'])
 
+def is_status_forward(current, status):
+	"""Whether `status` moves a message on in the sent -> delivered -> read order."""
+	if status == current:
+		return False
+	if status not in DELIVERY_STATUS_ORDER:
+		return True
+
+	return DELIVERY_STATUS_ORDER.index(status) > (
+		DELIVERY_STATUS_ORDER.index(current) if current in DELIVERY_STATUS_ORDER else -1
+	)
+
 def update_template_status(data):
 	"""Update template status."""
 	# Refactored to QueryBuilder
@@ -303,8 +319,19 @@ def update_message_status(data):
 	status = data['statuses'][0]['status']
 	conversation = data['statuses'][0].get('conversation', {}).get('id')
 	name = frappe.db.get_value("WhatsApp Message", filters={"message_id": id})
+	if not name:
+		# Unknown or already archived message
+		return
 
 	doc = frappe.get_doc("WhatsApp Message", name)
+	if not is_status_forward(doc.status, status):
+		# Late, repeated or replayed webhook: never move backwards or count it twice
+		return
+
+	increment("whatsapp_status_updates_total", status=status)
+	if status == "failed" and doc.status != "failed":
+		track_event("messages_failed", doc.whatsapp_account, at=doc.creation)
+	track_status_change(doc, status, data['statuses'][0].get('timestamp'))
 	doc.status = status
 	if conversation:
 		doc.conversation_id = conversation
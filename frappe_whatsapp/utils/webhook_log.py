@@ -0,0 +1,129 @@
+"""Storage, sampling and retention of WhatsApp Webhook Log."""
+import base64
+import gzip
+import json
+import random
+
+import frappe
+from frappe.utils import add_days, cint, flt, now, now_datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOG_ALL = "All"
+LOG_FAILURES = "Failures Only"
+LOG_SAMPLE = "Sample"
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+# Rows removed per DELETE, so purging never holds long locks
+PURGE_CHUNK_SIZE = 5000
+
+
+def should_log_webhook():
+    """Whether a webhook is logged before it is processed (failures always are)."""
+    settings = get_log_settings()
+    if settings.mode == LOG_FAILURES:
+        return False
+    if settings.mode == LOG_SAMPLE:
+        return random.random() * 100 < settings.sample_rate
+
+    return True
+
+
+def insert_webhook_log(data, headers=None, error=None):
+    """
+    Store a webhook, compressed if enabled in WhatsApp Settings.
+
+    Args:
+        data: Webhook payload (dict or raw string)
+        headers: Request headers
+        error: Why the webhook failed, if it did
+
+    Returns:
+        name of the log
+    """
+    request_data = data if isinstance(data, str) else json.dumps(data)
+    headers = json.dumps(headers or {})
+
+    log = frappe.new_doc("WhatsApp Webhook Log")
+    log.timestamp = now()
+    log.error = error
+    if get_log_settings().compress:
+        log.compression, log.compressed_data = compress_payload(
+            json.dumps({"request_data": request_data, "headers": headers})
+        )
+    else:
+        log.request_data = request_data
+        log.headers = headers
+
+    log.insert(ignore_permissions=True)
+    return log.name
+
+
+def load_stored_payload(log):
+    """
+    Request data and headers of a log row or document, decompressed if needed.
+
+    Returns:
+        (request_data, headers) as parsed JSON
+    """
+    if log.compression:
+        stored = json.loads(decompress_payload(log.compression, log.compressed_data))
+        return frappe.parse_json(stored["request_data"]), frappe.parse_json(stored["headers"])
+
+    return frappe.parse_json(log.request_data), frappe.parse_json(log.get("headers") or "{}")
+
+
+def compress_payload(text):
+    """Compress text with zstd if available, gzip otherwise; returns (algorithm, base64)."""
+    raw = text.encode()
+    if zstandard:
+        return COMPRESSION_ZSTD, base64.b64encode(zstandard.ZstdCompressor().compress(raw)).decode()
+
+    return COMPRESSION_GZIP, base64.b64encode(gzip.compress(raw)).decode()
+
+
+def decompress_payload(algorithm, blob):
+    raw = base64.b64decode(blob)
+    if algorithm == COMPRESSION_ZSTD:
+        if not zstandard:
+            frappe.throw("Install zstandard to read this webhook log")
+        return zstandard.ZstdDecompressor().decompress(raw).decode()
+
+    return gzip.decompress(raw).decode()
+
+
+def purge_webhook_logs():
+    """Delete webhook logs past the retention period in bounded chunks (scheduled daily)."""
+    retention_days = get_log_settings().retention_days
+    if not retention_days:
+        return 0
+
+    cutoff = add_days(now_datetime(), -retention_days)
+    deleted = 0
+    while True:
+        frappe.db.sql("""
+            DELETE FROM `tabWhatsApp Webhook Log`
+            WHERE timestamp < %(cutoff)s
+            LIMIT %(limit)s
+        """, {"cutoff": cutoff, "limit": PURGE_CHUNK_SIZE})
+        count = cint(frappe.db.sql("SELECT ROW_COUNT()")[0][0])
+        frappe.db.commit()
+
+        deleted += count
+        if count < PURGE_CHUNK_SIZE:
+            return deleted
+
+
+def get_log_settings():
+    settings = frappe.get_cached_doc("WhatsApp Settings")
+    return frappe._dict(
+        mode=settings.get("webhook_log_mode") or LOG_ALL,
+        sample_rate=flt(settings.get("webhook_log_sample_rate")),
+        retention_days=cint(settings.get("webhook_log_retention_days")),
+        compress=cint(settings.get("compress_webhook_logs")),
+    )
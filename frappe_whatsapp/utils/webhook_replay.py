@@ -0,0 +1,256 @@
+"""Bulk replay of stored webhooks, e.g. to recover from a processing outage."""
+import copy
+import time
+
+import frappe
+from frappe.utils import cint, get_datetime
+
+from frappe_whatsapp.utils.webhook import process_webhook_payload
+from frappe_whatsapp.utils.webhook_log import load_stored_payload
+
+REPLAY_PROGRESS_EVENT = "whatsapp_webhook_replay_progress"
+REPLAY_QUEUE = "long"
+REPLAY_TIMEOUT = 4 * 60 * 60
+REPLAY_CHUNK_SIZE = 500
+REPLAY_LOCK_KEY = "whatsapp_webhook_replay"
+
+LOG_FIELDS = ("name", "timestamp", "request_data", "headers", "compression", "compressed_data")
+
+
+@frappe.whitelist()
+def enqueue_webhook_replay(from_time=None, to_time=None, only_failed=0, include_replayed=0):
+    """
+    Replay stored webhooks in the background, oldest first.
+
+    Args:
+        from_time: Replay logs received at or after this time
+        to_time: Replay logs received at or before this time
+        only_failed: Only logs that recorded an error
+        include_replayed: Also logs that were replayed before
+
+    Returns:
+        True if the job was queued, False if a replay is already running
+    """
+    frappe.only_for("System Manager")
+
+    lock_key = frappe.cache.make_key(REPLAY_LOCK_KEY)
+    if not frappe.cache.set(lock_key, 1, nx=True, ex=REPLAY_TIMEOUT):
+        return False
+
+    frappe.enqueue(
+        "frappe_whatsapp.utils.webhook_replay._run_locked_replay",
+        queue=REPLAY_QUEUE,
+        timeout=REPLAY_TIMEOUT,
+        from_time=from_time,
+        to_time=to_time,
+        only_failed=cint(only_failed),
+        include_replayed=cint(include_replayed),
+        user=frappe.session.user,
+        lock_key=lock_key,
+    )
+    return True
+
+
+def replay_webhook_logs(from_time=None, to_time=None, only_failed=False, include_replayed=False,
+                        user=None, chunk_size=REPLAY_CHUNK_SIZE):
+    """
+    Feed matching logs through the webhook processor in arrival order.
+
+    Logs are streamed in keyset pages on (timestamp, name). Incoming
+    messages that already exist (by message_id) are dropped, so replaying
+    a range twice, or a range that was partly processed, creates no
+    duplicates.
+
+    Returns:
+        dict with total, replayed, duplicates, failed and logs_per_second
+    """
+    conditions, values = _get_conditions(from_time, to_time, only_failed, include_replayed)
+    counts = frappe._dict(
+        total=cint(frappe.db.sql(
+            f"SELECT COUNT(*) FROM `tabWhatsApp Webhook Log` WHERE {' AND '.join(conditions)}", values
+        )[0][0]),
+        replayed=0,
+        duplicates=0,
+        failed=0,
+        logs_per_second=0,
+    )
+    started = time.monotonic()
+
+    for logs in iter_log_chunks(conditions, values, chunk_size):
+        payloads = []
+        for log in logs:
+            try:
+                payloads.append((log.name, load_stored_payload(log)[0]))
+            except Exception as e:
+                counts.failed += 1
+                frappe.log_error(f"Cannot read webhook log {log.name}: {e}", "WhatsApp Webhook Replay")
+
+        known_ids = get_existing_message_ids(
+            message_id for _name, data in payloads for message_id in get_message_ids(data)
+        )
+        replayed = []
+        for name, data in payloads:
+            result = replay_payload(data, known_ids)
+            if result is None:
+                counts.failed += 1
+                continue
+
+            counts.duplicates += result
+            replayed.append(name)
+
+        if replayed:
+            frappe.db.set_value(
+                "WhatsApp Webhook Log", {"name": ["in", replayed]}, "is_replayed", 1, update_modified=False
+            )
+        frappe.db.commit()
+
+        counts.replayed += len(replayed)
+        counts.logs_per_second = round(
+            (counts.replayed + counts.failed) / max(time.monotonic() - started, 0.001), 1
+        )
+        publish_replay_progress(counts, user=user)
+
+    publish_replay_progress(counts, user=user, done=True)
+    return counts
+
+
+def replay_payload(data, known_ids):
+    """
+    Process one webhook payload, skipping messages in `known_ids`.
+
+    Ids of processed messages are added to `known_ids`. The changes are
+    committed on success and rolled back on failure.
+
+    Returns:
+        number of duplicate messages dropped, None if processing failed
+    """
+    message_ids = get_message_ids(data)
+    duplicates = [message_id for message_id in message_ids if message_id in known_ids]
+    if message_ids and len(duplicates) == len(message_ids):
+        return len(duplicates)
+
+    if duplicates:
+        data = drop_messages(data, set(duplicates))
+
+    try:
+        process_webhook_payload(data)
+        # Commit each payload, so a later failure cannot roll back earlier ones
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="WhatsApp Webhook Replay")
+        return None
+
+    known_ids.update(message_ids)
+    return len(duplicates)
+
+
+def iter_log_chunks(conditions, values, chunk_size=REPLAY_CHUNK_SIZE):
+    """Yield lists of matching logs ordered by (timestamp, name), without OFFSET."""
+    last = None
+    while True:
+        page_conditions = list(conditions)
+        page_values = dict(values, limit=chunk_size)
+        if last:
+            page_conditions.append("""(timestamp > %(last_timestamp)s
+                OR (timestamp = %(last_timestamp)s AND name > %(last_name)s))""")
+            page_values.update(last_timestamp=last.timestamp, last_name=last.name)
+
+        logs = frappe.db.sql("""
+            SELECT {fields}
+            FROM `tabWhatsApp Webhook Log`
+            WHERE {conditions}
+            ORDER BY timestamp ASC, name ASC
+            LIMIT %(limit)s
+        """.format(
+            fields=", ".join(f"`{field}`" for field in LOG_FIELDS),
+            conditions=" AND ".join(page_conditions),
+        ), page_values, as_dict=True)
+        if not logs:
+            return
+
+        yield logs
+
+        last = logs[-1]
+        if len(logs) < chunk_size:
+            return
+
+
+def get_message_ids(data):
+    """Ids of the incoming messages in a webhook payload."""
+    return [
+        message.get("id")
+        for entry in data.get("entry", [])
+        for change in entry.get("changes", [])
+        for message in change.get("value", {}).get("messages", [])
+        if message.get("id")
+    ]
+
+
+def get_existing_message_ids(message_ids):
+    message_ids = list(set(message_ids))
+    if not message_ids:
+        return set()
+
+    # Archived messages count as received too
+    return {
+        message_id
+        for doctype in ("WhatsApp Message", "WhatsApp Message Archive")
+        for message_id in frappe.get_all(
+            doctype, filters={"message_id": ["in", message_ids]}, pluck="message_id"
+        )
+    }
+
+
+def drop_messages(data, message_ids):
+    data = copy.deepcopy(data)
+    for entry in data.get("entry", []):
+        for change in entry.get("changes", []):
+            value = change.get("value", {})
+            if "messages" in value:
+                value["messages"] = [
+                    message for message in value["messages"] if message.get("id") not in message_ids
+                ]
+
+    return data
+
+
+def publish_replay_progress(counts, user=None, done=False):
+    if not user:
+        return
+
+    frappe.publish_realtime(
+        REPLAY_PROGRESS_EVENT,
+        dict(counts, done=done),
+        user=user,
+        after_commit=False,
+    )
+
+
+def _get_conditions(from_time, to_time, only_failed, include_replayed):
+    conditions = [
+        "(request_data IS NOT NULL OR compressed_data IS NOT NULL)",
+        # Never replay payloads that failed signature verification
+        "IFNULL(error, '') != 'Invalid Signature'",
+    ]
+    values = {}
+    if from_time:
+        conditions.append("timestamp >= %(from_time)s")
+        values["from_time"] = get_datetime(from_time)
+    if to_time:
+        conditions.append("timestamp <= %(to_time)s")
+        values["to_time"] = get_datetime(to_time)
+    if only_failed:
+        conditions.append("IFNULL(error, '') != ''")
+    if not include_replayed:
+        conditions.append("is_replayed = 0")
+
+    return conditions, values
+
+
+def _run_locked_replay(lock_key=None, **kwargs):
+    try:
+        return replay_webhook_logs(**kwargs)
+    finally:
+        if lock_key:
+            frappe.cache.delete(lock_key)